@@ -0,0 +1,219 @@
+"""Admission control: token-bucket rate limits and per-route concurrency caps.
+
+A burst of logins (bcrypt) or multi-document writes can saturate a worker
+and slow every other route. Two mechanisms shed that load early:
+
+- ``RateLimiter``: a token bucket per key (client IP for anonymous routes,
+  user id for authenticated ones). A caller over its rate gets 429 with a
+  ``Retry-After`` saying when the next token arrives. Buckets live in the
+  worker (``MemoryRateLimitBackend``) or, with RATE_LIMIT_BACKEND=redis, in
+  one Redis-protocol server shared by every worker and host, so the limit
+  holds per deployment rather than per process.
+- ``ConcurrencyLimiter``: a semaphore per route group. Up to ``limit``
+  requests run at once and at most ``max_waiting`` more queue for a slot for
+  up to ``wait_timeout`` seconds. Anything beyond gets 503 with
+  ``Retry-After`` immediately instead of growing an unbounded queue.
+
+Both raise ``HTTPException``, so they plug into routes as dependencies.
+ADMISSION_CONTROL=0 disables both (used by the load test).
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from metrics import Counter, registry
+
+ADMISSION_REJECTED = registry.register(Counter(
+    "http_admission_rejected_total", "Requests shed by rate limits (429) and concurrency caps (503)"))
+
+DEFAULT_MAX_KEYS = 100_000
+
+# Refill, take and report the wait in one round trip; TIME keeps every worker on Redis' clock
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+def client_ip(request: Request) -> str:
+    # uvicorn's proxy_headers already resolved X-Forwarded-For from trusted proxies.
+    # Only proxies in FORWARDED_ALLOW_IPS (serve.py) are trusted; if the load balancer
+    # is not among them, this is its address and every client shares one auth bucket.
+    return request.client.host if request.client else "unknown"
+
+
+class MemoryRateLimitBackend:
+    """Per-process buckets, LRU-bounded so scanning many IPs cannot grow memory."""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; returns 0 when allowed, else seconds until enough refill."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+class RedisRateLimitBackend:
+    """Buckets shared by all workers (any Redis-protocol server with Lua scripting)."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from exc
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        return float(await self._script(keys=[self.prefix + key], args=[rate, burst, cost]))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def _retry_after(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class RateLimiter:
+    """``rate`` requests per second per key, with bursts of up to ``burst``."""
+
+    def __init__(self, backend, name: str, rate: float, burst: float, enabled: bool = True):
+        self.backend = backend
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.enabled = enabled and rate > 0
+
+    async def check(self, key: str) -> None:
+        if not self.enabled:
+            return
+        wait = await self.backend.take(f"{self.name}:{key}", self.rate, self.burst)
+        if wait > 0:
+            ADMISSION_REJECTED.inc(limit=self.name, reason="rate")
+            raise HTTPException(status_code=429, detail="Too many requests, slow down", headers=_retry_after(wait))
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` requests at once, ``max_waiting`` queued for ``wait_timeout`` seconds."""
+
+    def __init__(self, name: str, limit: int, max_waiting: int, wait_timeout: float,
+                 retry_after: float = 1.0, enabled: bool = True):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self.enabled = enabled and limit > 0
+        self._semaphore = asyncio.Semaphore(limit) if self.enabled else None
+        self.running = 0
+        self.waiting = 0
+
+    def _reject(self) -> HTTPException:
+        ADMISSION_REJECTED.inc(limit=self.name, reason="concurrency")
+        return HTTPException(status_code=503, detail="Server busy, try again shortly",
+                             headers=_retry_after(self.retry_after))
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self.enabled:
+            yield
+            return
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise self._reject()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "running": self.running, "waiting": self.waiting}
+
+
+def _float_env(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def admission_enabled() -> bool:
+    return os.environ.get("ADMISSION_CONTROL", "1") != "0"
+
+
+def rate_limit_backend_from_env():
+    if os.environ.get("RATE_LIMIT_BACKEND", "memory") == "redis":
+        return RedisRateLimitBackend(os.environ.get("RATE_LIMIT_URL", "redis://localhost:6379/0"))
+    return MemoryRateLimitBackend(int(os.environ.get("RATE_LIMIT_MAX_KEYS", DEFAULT_MAX_KEYS)))
+
+
+def rate_limiter_from_env(backend, name: str, per_minute: float, burst: float) -> RateLimiter:
+    """Reads <NAME>_RATE_PER_MINUTE and <NAME>_RATE_BURST; a rate of 0 disables the limit."""
+    prefix = name.upper()
+    return RateLimiter(
+        backend, name,
+        rate=_float_env(f"{prefix}_RATE_PER_MINUTE", per_minute) / 60,
+        burst=_float_env(f"{prefix}_RATE_BURST", burst),
+        enabled=admission_enabled(),
+    )
+
+
+def concurrency_limiter_from_env(name: str, limit: int, max_waiting: int,
+                                 wait_timeout: Optional[float] = None) -> ConcurrencyLimiter:
+    """Reads <NAME>_MAX_CONCURRENCY, <NAME>_MAX_WAITING and ADMISSION_WAIT_TIMEOUT_SECONDS."""
+    prefix = name.upper()
+    return ConcurrencyLimiter(
+        name,
+        limit=int(os.environ.get(f"{prefix}_MAX_CONCURRENCY", limit)),
+        max_waiting=int(os.environ.get(f"{prefix}_MAX_WAITING", max_waiting)),
+        wait_timeout=wait_timeout if wait_timeout is not None else _float_env("ADMISSION_WAIT_TIMEOUT_SECONDS", 5.0),
+        enabled=admission_enabled(),
+    )
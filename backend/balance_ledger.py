@@ -0,0 +1,280 @@
+"""Append-only history of every user balance change.
+
+Each change to ``users.balance`` also writes one ``balance_transactions``
+row: the signup credit (``opening``), an ``investment`` debit or a
+``distribution`` credit. Amounts are signed, so a user's balance is the sum
+of their rows. Row ids are derived from what caused the change
+(``<kind>:<ref_id>:<user_id>``), which makes writing them idempotent: a
+retried distribution never records a payout twice. With
+MONGO_TRANSACTIONS=1 the row commits with the balance change. Without it,
+the row is written right after, and a crash in between shows up in
+reconciliation.
+
+``balance_snapshots`` hold each user's balance as of a snapshot run, so
+balance-as-of and statement queries read one snapshot plus the indexed tail
+of rows since then instead of replaying the whole history. A run only
+covers rows older than SNAPSHOT_SETTLE_SECONDS, so writes still in flight
+(timestamped just before they land) are never skipped.
+
+Run from the backend folder:
+
+    python balance_ledger.py --backfill    # opening rows for users without history
+    python balance_ledger.py --snapshot    # take a snapshot now
+    python balance_ledger.py --reconcile   # exit 1 if any users.balance disagrees with the ledger
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+SNAPSHOT_SETTLE_SECONDS = 60
+SNAPSHOT_BATCH_SIZE = 1000
+# Balances are float sums applied in a different order than the ledger's; ignore sub-paisa drift
+RECONCILE_TOLERANCE = 0.01
+MAX_REPORTED_MISMATCHES = 100
+
+_DUPLICATE_KEY = 11000
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def ledger_entry(user_id: str, amount: float, kind: str, ref_id: str,
+                 created_at: Optional[str] = None, channel_id: Optional[str] = None) -> dict:
+    return {
+        "id": f"{kind}:{ref_id}:{user_id}",
+        "user_id": user_id,
+        "amount": amount,
+        "kind": kind,
+        "ref_id": ref_id,
+        "channel_id": channel_id,
+        "created_at": created_at or _now(),
+    }
+
+
+async def record_transactions(db, entries: List[dict], session=None) -> None:
+    """Append ``entries``; rows already recorded by an earlier attempt are skipped."""
+    if not entries:
+        return
+    try:
+        await db.balance_transactions.insert_many(entries, ordered=False, session=session)
+    except BulkWriteError as exc:
+        if any(error["code"] != _DUPLICATE_KEY for error in exc.details["writeErrors"]):
+            raise
+    for entry in entries:
+        entry.pop("_id", None)
+
+
+async def balance_as_of(db, user_id: str, at: str) -> float:
+    """The user's balance at ``at``: the latest snapshot before it plus the rows since."""
+    snapshot = await db.balance_snapshots.find_one(
+        {"user_id": user_id, "as_of": {"$lte": at}}, {"_id": 0, "balance": 1, "as_of": 1}, sort=[("as_of", -1)],
+    )
+    since = snapshot["as_of"] if snapshot else ""
+    tail = await db.balance_transactions.aggregate([
+        {"$match": {"user_id": user_id, "created_at": {"$gt": since, "$lte": at}}},
+        {"$group": {"_id": None, "amount": {"$sum": "$amount"}}},
+    ]).to_list(1)
+    return (snapshot["balance"] if snapshot else 0.0) + (tail[0]["amount"] if tail else 0.0)
+
+
+async def statement(db, user_id: str, start: str, end: str) -> dict:
+    """Opening and closing balance over (start, end] with credit and debit totals by kind."""
+    opening = await balance_as_of(db, user_id, start)
+    by_kind = await db.balance_transactions.aggregate([
+        {"$match": {"user_id": user_id, "created_at": {"$gt": start, "$lte": end}}},
+        {"$group": {
+            "_id": "$kind",
+            "credits": {"$sum": {"$cond": [{"$gt": ["$amount", 0]}, "$amount", 0]}},
+            "debits": {"$sum": {"$cond": [{"$lt": ["$amount", 0]}, {"$abs": "$amount"}, 0]}},
+            "count": {"$sum": 1},
+        }},
+    ]).to_list(None)
+    credits = sum(row["credits"] for row in by_kind)
+    debits = sum(row["debits"] for row in by_kind)
+    return {
+        "start": start,
+        "end": end,
+        "opening_balance": opening,
+        "closing_balance": opening + credits - debits,
+        "credits": credits,
+        "debits": debits,
+        "transaction_count": sum(row["count"] for row in by_kind),
+        "by_kind": {row["_id"]: {k: row[k] for k in ("credits", "debits", "count")} for row in by_kind},
+    }
+
+
+async def _previous_balances(db, user_ids: List[str], since: str) -> dict:
+    rows = await db.balance_snapshots.aggregate([
+        {"$match": {"user_id": {"$in": user_ids}, "as_of": {"$lte": since}}},
+        {"$sort": {"user_id": 1, "as_of": -1}},
+        {"$group": {"_id": "$user_id", "balance": {"$first": "$balance"}}},
+    ]).to_list(None)
+    return {row["_id"]: row["balance"] for row in rows}
+
+
+async def snapshot_balances(db, as_of: Optional[str] = None) -> dict:
+    """Snapshot every user with rows since the last completed run; returns the run."""
+    as_of = as_of or (datetime.now(timezone.utc) - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)).isoformat()
+    previous = await db.balance_snapshot_runs.find_one(
+        {"status": "completed"}, {"_id": 0, "as_of": 1}, sort=[("as_of", -1)],
+    )
+    # Snapshots left by a crashed run are still correct, so only completed runs bound the tail
+    since = previous["as_of"] if previous else ""
+    if as_of <= since:
+        return {"as_of": since, "users": 0, "status": "skipped"}
+    run = {"as_of": as_of, "since": since, "status": "running", "users": 0, "started_at": _now()}
+    await db.balance_snapshot_runs.insert_one(run)
+
+    deltas = db.balance_transactions.aggregate([
+        {"$match": {"created_at": {"$gt": since, "$lte": as_of}}},
+        {"$group": {"_id": "$user_id", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+    ], allowDiskUse=True)
+
+    async def flush(batch):
+        previous_balances = await _previous_balances(db, [row["_id"] for row in batch], since)
+        await db.balance_snapshots.bulk_write([
+            _upsert_snapshot(row["_id"], as_of, previous_balances.get(row["_id"], 0.0) + row["amount"], row["count"])
+            for row in batch
+        ], ordered=False)
+        run["users"] += len(batch)
+
+    batch = []
+    async for row in deltas:
+        batch.append(row)
+        if len(batch) >= SNAPSHOT_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    await db.balance_snapshot_runs.update_one(
+        {"as_of": as_of}, {"$set": {"status": "completed", "users": run["users"], "completed_at": _now()}},
+    )
+    run.pop("_id", None)
+    run["status"] = "completed"
+    return run
+
+
+def _upsert_snapshot(user_id: str, as_of: str, balance: float, transactions: int) -> ReplaceOne:
+    return ReplaceOne(
+        {"user_id": user_id, "as_of": as_of},
+        {"user_id": user_id, "as_of": as_of, "balance": balance, "transactions_since_previous": transactions},
+        upsert=True,
+    )
+
+
+async def reconcile(db, tolerance: float = RECONCILE_TOLERANCE) -> dict:
+    """Compare every users.balance with the sum of its ledger rows.
+
+    Users and per-user ledger sums are both streamed in user id order and
+    merge-joined, so memory stays flat however many users there are. A
+    write racing the scan can show up as a transient mismatch; re-run to
+    confirm one.
+    """
+    users = db.users.find({}, {"_id": 0, "id": 1, "balance": 1}).sort("id", 1)
+    sums = db.balance_transactions.aggregate([
+        {"$group": {"_id": "$user_id", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ], allowDiskUse=True)
+
+    report = {"users": 0, "matched": 0, "mismatched": 0, "orphaned_ledgers": 0, "mismatches": []}
+
+    def mismatch(user_id: str, balance: Optional[float], ledger: float, count: int) -> None:
+        report["mismatched"] += 1
+        if len(report["mismatches"]) < MAX_REPORTED_MISMATCHES:
+            report["mismatches"].append({"user_id": user_id, "balance": balance, "ledger": ledger, "transactions": count})
+
+    ledger = await anext(sums, None)
+    async for user in users:
+        report["users"] += 1
+        # Ledger rows for ids with no user document
+        while ledger is not None and ledger["_id"] < user["id"]:
+            report["orphaned_ledgers"] += 1
+            ledger = await anext(sums, None)
+        if ledger is not None and ledger["_id"] == user["id"]:
+            total, count = ledger["amount"], ledger["count"]
+            ledger = await anext(sums, None)
+        else:
+            total, count = 0.0, 0
+        balance = user.get("balance", 0.0)
+        if abs(balance - total) > tolerance:
+            mismatch(user["id"], balance, total, count)
+        else:
+            report["matched"] += 1
+    while ledger is not None:
+        report["orphaned_ledgers"] += 1
+        ledger = await anext(sums, None)
+    return report
+
+
+async def backfill_openings(db, batch_size: int = SNAPSHOT_BATCH_SIZE) -> int:
+    """Give users that predate the ledger an ``opening`` row for their current balance."""
+    created = 0
+
+    async def flush(batch):
+        nonlocal created
+        with_history = set(await db.balance_transactions.distinct("user_id", {"user_id": {"$in": [u["id"] for u in batch]}}))
+        entries = [
+            ledger_entry(user["id"], user.get("balance", 0.0), "opening", user["id"], user.get("created_at"))
+            for user in batch if user["id"] not in with_history
+        ]
+        await record_transactions(db, entries)
+        created += len(entries)
+
+    batch = []
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "balance": 1, "created_at": 1}):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return created
+
+
+def _print_report(report: dict) -> None:
+    for row in report["mismatches"]:
+        print(f"MISMATCH user {row['user_id']}: balance {row['balance']} vs ledger {row['ledger']} "
+              f"({row['transactions']} transactions)")
+    print(f"{report['matched']}/{report['users']} users match their ledger, "
+          f"{report['orphaned_ledgers']} ledgers without a user")
+
+
+async def _main(args) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.backfill:
+            print(f"recorded {await backfill_openings(db)} opening transactions")
+        if args.snapshot:
+            run = await snapshot_balances(db)
+            print(f"snapshot as of {run['as_of']}: {run['users']} users")
+        if args.reconcile:
+            report = await reconcile(db)
+            _print_report(report)
+            return 1 if report["mismatched"] else 0
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the balance transaction ledger")
+    parser.add_argument("--backfill", action="store_true", help="record opening rows for users without history")
+    parser.add_argument("--snapshot", action="store_true", help="snapshot balances as of now")
+    parser.add_argument("--reconcile", action="store_true", help="verify users.balance against the ledger")
+    args = parser.parse_args()
+    if not (args.backfill or args.snapshot or args.reconcile):
+        parser.error("choose at least one of --backfill, --snapshot, --reconcile")
+    sys.exit(asyncio.run(_main(args)))
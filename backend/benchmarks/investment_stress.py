@@ -0,0 +1,82 @@
+"""Concurrency stress test for the atomic investment path.
+
+Run from the backend folder against a throwaway database on a local mongod
+(start it with --replSet and set MONGO_TRANSACTIONS=1 to cover the
+transactional path):
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.investment_stress --investments 500
+
+Many investors race to put money into one channel, and each investor tries
+to spend more than their balance. The run fails if any balance goes
+negative, or if total_raised, the sum of investments and the total debited
+disagree.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from investment_engine import USE_TRANSACTIONS, InsufficientBalance, place_investment
+
+STARTING_BALANCE = 10000.0
+AMOUNT = 700.0
+
+
+async def main(investors: int, investments: int, db_name: str) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    await client.drop_database(db_name)
+    db = client[db_name]
+    try:
+        channel = {
+            "id": str(uuid.uuid4()), "name": "stress", "goal_amount": 1e9,
+            "equity_percentage": 10.0, "total_raised": 0.0,
+        }
+        await db.channels.insert_one(dict(channel))
+        users = [{"id": str(uuid.uuid4()), "name": f"investor-{i}", "balance": STARTING_BALANCE} for i in range(investors)]
+        await db.users.insert_many([dict(u) for u in users])
+
+        rejected = 0
+
+        async def invest(i):
+            nonlocal rejected
+            try:
+                await place_investment(client, db, channel, users[i % investors], AMOUNT)
+            except InsufficientBalance:
+                rejected += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(invest(i) for i in range(investments)))
+        elapsed = time.perf_counter() - started
+
+        stored_channel = await db.channels.find_one({"id": channel["id"]})
+        invested = await db.investments.count_documents({}) * AMOUNT
+        balances = [u["balance"] async for u in db.users.find({}, {"balance": 1})]
+        debited = investors * STARTING_BALANCE - sum(balances)
+
+        print(f"transactions={'on' if USE_TRANSACTIONS else 'off'} investments={investments} "
+              f"rejected={rejected} elapsed={elapsed:.2f}s rate={investments / elapsed:.0f}/s")
+        print(f"total_raised={stored_channel['total_raised']} invested={invested} debited={debited} "
+              f"min_balance={min(balances)}")
+
+        ok = (
+            min(balances) >= 0
+            and stored_channel["total_raised"] == invested == debited
+        )
+        print("OK" if ok else "FAILED: lost update or overdraft")
+        return 0 if ok else 1
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="investment concurrency stress test")
+    parser.add_argument("--investors", type=int, default=20)
+    parser.add_argument("--investments", type=int, default=500)
+    parser.add_argument("--db", default="investment_stress")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.investors, args.investments, args.db)))
@@ -0,0 +1,388 @@
+"""Concurrent load test of the API with latency percentiles and baselines.
+
+Run from the backend folder. Against a local mongod, in-process (ASGI, no
+network) or under a real uvicorn worker:
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.load_test
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.load_test --target uvicorn
+
+Without a mongod, ``--mongo mock`` runs in-process on mongomock-motor
+(``pip install mongomock-motor``). That is useful for finding Python-side
+regressions, but its numbers say nothing about real database latency.
+
+The database named by --db is dropped, seeded with --users, --channels and
+--investments, and dropped again at the end. These scenarios then run in
+order, each one sending --requests requests from --concurrency workers:
+
+- login: a login storm (bcrypt dominates; see BCRYPT_ROUNDS)
+- browse: the dashboard: two channel pages, stats, a channel overview
+- invest: bursts of small investments spread over all channels
+- distribute: profit distributions over the largest channel, timed from
+  enqueue until the background job completes
+
+Rate limits and concurrency caps (admission.py) are switched off so the
+run measures capacity rather than shedding; ``--admission`` keeps them on
+to see how the API sheds an overload (429/503 count as errors).
+
+Each endpoint's count, errors, RPS and p50/p95/p99 latency are printed.
+``--save FILE`` writes them as a JSON baseline, and ``--compare FILE`` exits
+non-zero when p95 latency or RPS regresses by more than --tolerance, or when
+new errors appear.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+SCENARIOS = ("login", "browse", "invest", "distribute")
+PASSWORD = "load-test-password"
+STARTING_BALANCE = 1e9
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.elapsed = {}
+
+    async def request(self, client: httpx.AsyncClient, scenario: str, endpoint: str, method: str, url: str, **kwargs):
+        key = f"{scenario} {endpoint}"
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[key] += 1
+            self.latencies[key].append(time.perf_counter() - started)
+            return None
+        self.latencies[key].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[key] += 1
+        return response
+
+    def record(self, scenario: str, endpoint: str, seconds: float, ok: bool = True) -> None:
+        key = f"{scenario} {endpoint}"
+        self.latencies[key].append(seconds)
+        if not ok:
+            self.errors[key] += 1
+
+    def summary(self) -> dict:
+        results = {}
+        for key, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            scenario = key.split(" ", 1)[0]
+            results[key] = {
+                "count": len(values),
+                "errors": self.errors[key],
+                "rps": len(values) / self.elapsed[scenario] if self.elapsed.get(scenario) else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        return results
+
+
+async def run_workers(count: int, concurrency: int, task) -> float:
+    """Call ``task(i)`` for i in range(count) on ``concurrency`` workers; returns elapsed seconds."""
+    queue = iter(range(count))
+
+    async def worker():
+        for i in queue:
+            await task(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def seed(server, users: int, channels: int, investments: int) -> dict:
+    """Create creators, investors, channels and investments directly in the database."""
+    from equity_ledger import record_channel_created
+    from investment_engine import place_investment
+
+    db = server.db
+    password_hash = await server.password_hasher.hash(PASSWORD)
+    creator_count = max(1, users // 10)
+    people = []
+    for i in range(users):
+        people.append({
+            "id": str(uuid.uuid4()),
+            "email": f"load{i}@example.com",
+            "password_hash": password_hash,
+            "name": f"Load User {i}",
+            "user_type": "creator" if i < creator_count else "investor",
+            "balance": STARTING_BALANCE,
+            "created_at": _now(),
+        })
+    await db.users.insert_many([dict(p) for p in people])
+    creators = people[:creator_count]
+    investors = people[creator_count:] or creators
+
+    channel_docs = []
+    for i in range(channels):
+        creator = creators[i % len(creators)]
+        doc = {
+            "id": str(uuid.uuid4()), "name": f"Load Channel {i}", "description": "Seeded for load testing. " * 10,
+            "creator_id": creator["id"], "creator_name": creator["name"], "category": "Technology",
+            "goal_amount": 1e7, "total_raised": 0.0, "equity_percentage": 20.0, "cover_image": None,
+            "status": "active", "created_at": _now(),
+        }
+        await db.channels.insert_one({**doc, "funding_progress": 0.0})
+        await record_channel_created(db, doc)
+        channel_docs.append(doc)
+
+    # Every investor holds a stake in channel 0, which the distribute scenario pays out
+    sem = asyncio.Semaphore(20)
+
+    async def invest(i):
+        channel = channel_docs[0] if i < len(investors) else random.choice(channel_docs)
+        async with sem:
+            await place_investment(server.client, db, channel, investors[i % len(investors)], 500.0)
+
+    await asyncio.gather(*(invest(i) for i in range(max(investments, len(investors)))))
+    return {
+        "creators": creators,
+        "investors": investors,
+        "channels": channel_docs,
+        "tokens": {p["id"]: server.create_access_token({"sub": p["id"]}) for p in people},
+    }
+
+
+def _auth(data: dict, user: dict) -> dict:
+    return {"Authorization": f"Bearer {data['tokens'][user['id']]}"}
+
+
+async def scenario_login(client, rec, data, requests, concurrency):
+    people = data["creators"] + data["investors"]
+
+    async def task(i):
+        user = random.choice(people)
+        await rec.request(client, "login", "POST /auth/login", "POST", "/auth/login",
+                          json={"email": user["email"], "password": PASSWORD})
+
+    return await run_workers(requests, concurrency, task)
+
+
+async def scenario_browse(client, rec, data, requests, concurrency):
+    # One "request" here is a full dashboard visit of four calls
+    async def task(i):
+        headers = _auth(data, random.choice(data["investors"]))
+        first = await rec.request(client, "browse", "GET /channels", "GET", "/channels",
+                                  params={"limit": 24}, headers=headers)
+        cursor = first.headers.get("x-next-cursor") if first is not None else None
+        if cursor:
+            await rec.request(client, "browse", "GET /channels?cursor", "GET", "/channels",
+                              params={"limit": 24, "cursor": cursor}, headers=headers)
+        await rec.request(client, "browse", "GET /stats", "GET", "/stats", headers=headers)
+        channel = random.choice(data["channels"])
+        await rec.request(client, "browse", "GET /channels/{id}/overview", "GET",
+                          f"/channels/{channel['id']}/overview", headers=headers)
+
+    return await run_workers(max(1, requests // 4), concurrency, task)
+
+
+async def scenario_invest(client, rec, data, requests, concurrency):
+    async def task(i):
+        investor = random.choice(data["investors"])
+        channel = random.choice(data["channels"])
+        await rec.request(client, "invest", "POST /investments", "POST", "/investments",
+                          json={"channel_id": channel["id"], "amount": 500.0}, headers=_auth(data, investor))
+
+    return await run_workers(requests, concurrency, task)
+
+
+async def scenario_distribute(client, rec, data, distributions, poll_interval=0.05):
+    channel = data["channels"][0]
+    creator = next(c for c in data["creators"] if c["id"] == channel["creator_id"])
+    headers = _auth(data, creator)
+    started = time.perf_counter()
+    for _ in range(distributions):
+        enqueued = time.perf_counter()
+        response = await rec.request(client, "distribute", "POST /profits/distribute", "POST", "/profits/distribute",
+                                     json={"channel_id": channel["id"], "total_profit": 1e6}, headers=headers)
+        if response is None or response.status_code != 202:
+            continue
+        job_id = response.json()["id"]
+        while True:
+            job = (await client.get(f"/jobs/{job_id}", headers=headers)).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(poll_interval)
+        rec.record("distribute", f"job ({len(data['investors'])} investors)", time.perf_counter() - enqueued,
+                   ok=job["status"] == "completed")
+    return time.perf_counter() - started
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def in_process_client(server):
+    # Run the app's startup/shutdown (index bootstrap, job workers) around the run
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test/api", timeout=60) as client:
+            yield client
+
+
+@asynccontextmanager
+async def uvicorn_client():
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}/api", timeout=60,
+                                     limits=httpx.Limits(max_connections=1000)) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/stats")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            yield client
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float, scenarios) -> list:
+    regressions = []
+    for key, base in baseline["results"].items():
+        if key.split(" ", 1)[0] not in scenarios:
+            continue
+        current = results.get(key)
+        if current is None:
+            regressions.append(f"{key}: missing from this run")
+            continue
+        # Sub-millisecond endpoints jitter by more than any sane tolerance
+        slower = current["p95_ms"] - base["p95_ms"]
+        if slower > min_delta_ms and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {current['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{key}: {current['rps']:.1f} rps vs baseline {base['rps']:.1f} rps")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{key}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario endpoint':52} {'count':>7} {'errors':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for key, r in results.items():
+        print(f"{key:52} {r['count']:7} {r['errors']:6} {r['rps']:9.1f} "
+              f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f}")
+
+
+async def main(args) -> int:
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = args.db
+    if not args.admission:
+        os.environ["ADMISSION_CONTROL"] = "0"
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.mongo == "mock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--mongo mock needs mongomock-motor: pip install mongomock-motor")
+        mock = AsyncMongoMockClient()
+        server.database.client = server.client = mock
+        server.database.db = server.database.list_db = server.db = server.list_db = mock[args.db]
+        server.job_queue.db = server.db
+    await server.client.drop_database(args.db)
+
+    started = time.perf_counter()
+    data = await seed(server, args.users, args.channels, args.investments)
+    print(f"seeded {args.users} users, {args.channels} channels, {args.investments} investments "
+          f"in {time.perf_counter() - started:.1f}s ({args.target}, {args.mongo} mongo)")
+
+    rec = Recorder()
+    connect = in_process_client(server) if args.target == "inprocess" else uvicorn_client()
+    try:
+        async with connect as client:
+            for name in args.scenarios:
+                if name == "distribute":
+                    rec.elapsed[name] = await scenario_distribute(client, rec, data, args.distributions)
+                else:
+                    runner = globals()[f"scenario_{name}"]
+                    rec.elapsed[name] = await runner(client, rec, data, args.requests, args.concurrency)
+    finally:
+        await server.client.drop_database(args.db)
+
+    results = rec.summary()
+    print_results(results)
+    meta = {key: getattr(args, key) for key in
+            ("target", "mongo", "users", "channels", "investments", "requests", "concurrency", "distributions")}
+    if args.save:
+        Path(args.save).write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"baseline written to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline["meta"] != meta:
+            print(f"warning: baseline was recorded with {baseline['meta']}")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms, args.scenarios)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--mongo", choices=("local", "mock"), default="local")
+    parser.add_argument("--db", default="load_test")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--investments", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distributions", type=int, default=3)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--admission", action="store_true", help="keep rate limits and concurrency caps on")
+    parser.add_argument("--save", metavar="FILE", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="fail on regressions against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore p95 regressions smaller than this")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.target == "uvicorn" and args.mongo == "mock":
+        parser.error("--target uvicorn needs a real mongod (--mongo local)")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,72 @@
+"""Event-loop latency while bcrypt runs inline vs. on the PasswordHasher pool.
+
+Run from the backend folder:  python -m benchmarks.password_hashing --logins 32
+A probe task sleeps TICK seconds in a loop and records how late it wakes up;
+that lag is what every other in-flight request on the worker would suffer.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from passwords import PasswordHasher, _crypt_context
+
+TICK = 0.005
+
+
+async def _probe(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def _measure(login) -> dict:
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(_probe(stop, lags))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await login()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags.sort()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_p50_ms": round(statistics.median(lags) * 1000, 2),
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1] * 1000, 2),
+        "loop_lag_max_ms": round(lags[-1] * 1000, 2),
+    }
+
+
+async def main(logins: int, rounds: int, concurrency: int) -> None:
+    stored = _crypt_context(rounds).hash("benchmark-password")
+
+    async def inline_login():
+        context = _crypt_context(rounds)
+
+        async def one():
+            context.verify("benchmark-password", stored)
+
+        await asyncio.gather(*(one() for _ in range(logins)))
+
+    hasher = PasswordHasher(rounds=rounds, max_concurrency=concurrency)
+
+    async def pooled_login():
+        await asyncio.gather(*(hasher.verify_and_update("benchmark-password", stored) for _ in range(logins)))
+
+    print(f"{logins} concurrent logins, bcrypt cost {rounds}, pool size {concurrency}")
+    print("inline:", await _measure(inline_login))
+    print("pooled:", await _measure(pooled_login))
+    print("pool stats:", hasher.stats())
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bcrypt event-loop latency benchmark")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds, args.concurrency))
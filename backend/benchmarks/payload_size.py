@@ -0,0 +1,104 @@
+"""Wire and response size of each list view, full vs summary vs a fields= pick.
+
+Run from the backend folder:  python -m benchmarks.payload_size --rows 100
+
+For one page of documents this reports the BSON bytes the server sends, the
+time the driver spends decoding them, and the JSON response body size. The
+projection is applied here the way the server would apply it, so no database
+is needed. --cover-kb sets the size of the inline cover images (data URIs)
+that some channels carry.
+"""
+import argparse
+import base64
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import bson  # noqa: E402
+
+from fast_json import FastJSONResponse  # noqa: E402
+from server import CHANNEL_VIEWS, INVESTMENT_VIEWS, SUMMARY_DESCRIPTION_LENGTH  # noqa: E402
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _id() -> str:
+    return str(uuid.uuid4())
+
+
+def _channel(i: int, cover_kb: int) -> dict:
+    cover = "https://example.com/cover.jpg"
+    if cover_kb and i % 2 == 0:
+        cover = "data:image/jpeg;base64," + base64.b64encode(os.urandom(cover_kb * 768)).decode()
+    return {
+        "id": _id(), "name": f"Channel {i}", "description": "A creator channel about making things. " * 30,
+        "creator_id": _id(), "creator_name": "Creator", "category": "Technology", "goal_amount": 100000.0,
+        "total_raised": 2500.0 * i, "funding_progress": 0.025 * i, "equity_percentage": 10.0,
+        "cover_image": cover, "status": "active", "created_at": _now(),
+    }
+
+
+def _investment(i: int, cover_kb: int) -> dict:
+    return {
+        "id": _id(), "channel_id": _id(), "channel_name": "Channel", "investor_id": _id(),
+        "investor_name": f"Investor {i}", "amount": 500.0 + i, "equity_percentage": 0.05, "investment_date": _now(),
+    }
+
+
+def apply_projection(doc: dict, projection: dict) -> dict:
+    """Mirror the server-side projection (inclusion fields and the $substrCP summary)."""
+    out = {}
+    for field, spec in projection.items():
+        if field == "_id" or field not in doc:
+            continue
+        if isinstance(spec, dict) and "$substrCP" in spec:
+            _, start, length = spec["$substrCP"]
+            out[field] = doc[field][start:start + length]
+        elif spec:
+            out[field] = doc[field]
+    return out
+
+
+def _decode_seconds(raw: bytes, repeat: int = 20) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        bson.decode_all(raw)
+    return (time.perf_counter() - started) / repeat
+
+
+VIEWS = {
+    "GET /channels, /channels/my/created": (CHANNEL_VIEWS, _channel, "name,total_raised,goal_amount"),
+    "GET /investments/my": (INVESTMENT_VIEWS, _investment, "channel_name,amount"),
+}
+
+
+def main(rows: int, cover_kb: int) -> None:
+    print(f"{rows} rows per page, inline covers {cover_kb} KB, summary descriptions {SUMMARY_DESCRIPTION_LENGTH} chars")
+    print(f"{'endpoint':40} {'view':24} {'BSON bytes':>12} {'decode ms':>10} {'JSON bytes':>12} {'vs full':>8}")
+    for endpoint, (views, make, pick) in VIEWS.items():
+        docs = [make(i, cover_kb) for i in range(rows)]
+        full_json = None
+        for label, (view, fields) in {
+            "full": ("full", None), "summary": ("summary", None), f"fields={pick}": ("full", pick),
+        }.items():
+            projection, _ = views.projection(view, fields)
+            page = [apply_projection(doc, projection) for doc in docs]
+            raw = b"".join(bson.encode(doc) for doc in page)
+            body = FastJSONResponse(page).body
+            full_json = full_json or len(body)
+            print(f"{endpoint:40} {label[:24]:24} {len(raw):12,} {_decode_seconds(raw) * 1000:10.2f} "
+                  f"{len(body):12,} {len(body) / full_json:8.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="list view payload size benchmark")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--cover-kb", type=int, default=0)
+    args = parser.parse_args()
+    main(args.rows, args.cover_kb)
@@ -0,0 +1,97 @@
+"""Serialization throughput of each list endpoint's payload, default vs fast path.
+
+Run from the backend folder:  python -m benchmarks.serialization --rows 1000
+
+"default" mirrors what FastAPI does with response_model: validate every row
+into the model, jsonable_encoder the result, then json.dumps. "fast" is the
+FAST_JSON_RESPONSES path (FastJSONResponse on projected documents), and
+"dump_json" is pydantic-core's TypeAdapter.dump_json for comparison.
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from fast_json import FastJSONResponse  # noqa: E402
+from server import Channel, Investment, ProfitDistribution, TeamMember  # noqa: E402
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _id() -> str:
+    return str(uuid.uuid4())
+
+
+SAMPLES = {
+    "GET /channels": (Channel, lambda i: {
+        "id": _id(), "name": f"Channel {i}", "description": "A creator channel " * 8, "creator_id": _id(),
+        "creator_name": "Creator", "category": "tech", "goal_amount": 100000.0, "total_raised": 2500.0 * i,
+        "equity_percentage": 10.0, "cover_image": "https://example.com/cover.jpg", "status": "active",
+        "created_at": _now(),
+    }),
+    "GET /channels/{id}/team": (TeamMember, lambda i: {
+        "id": _id(), "channel_id": _id(), "user_id": _id(), "user_name": f"Member {i}",
+        "user_email": f"member{i}@example.com", "role": "Editor", "profit_split_percentage": 5.0, "joined_at": _now(),
+    }),
+    "GET /investments/my, /channels/{id}/investors": (Investment, lambda i: {
+        "id": _id(), "channel_id": _id(), "channel_name": "Channel", "investor_id": _id(),
+        "investor_name": f"Investor {i}", "amount": 500.0 + i, "equity_percentage": 0.05, "investment_date": _now(),
+    }),
+    "GET /profits/{id}": (ProfitDistribution, lambda i: {
+        "id": _id(), "channel_id": _id(), "channel_name": "Channel", "total_profit": 10000.0,
+        "distribution_date": _now(), "recipient_count": 10, "status": "completed",
+        "distributions": [
+            {"user_id": _id(), "user_name": f"User {j}", "amount": 1000.0, "type": "investor", "percentage": 1.0}
+            for j in range(10)
+        ],
+    }),
+}
+
+
+def _rate(fn, rows: int, seconds: float) -> float:
+    iterations = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn()
+        iterations += 1
+    return iterations * rows / (time.perf_counter() - started)
+
+
+def main(rows: int, seconds: float) -> None:
+    print(f"{'endpoint':48} {'default':>12} {'fast':>12} {'dump_json':>12}  rows/s ({rows} rows per response)")
+    for endpoint, (model, make) in SAMPLES.items():
+        docs = [make(i) for i in range(rows)]
+        adapter = TypeAdapter(List[model])
+
+        def default():
+            validated = [model.model_validate(doc) for doc in docs]
+            return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+        def fast():
+            return FastJSONResponse(docs).body
+
+        def dump_json():
+            return adapter.dump_json(adapter.validate_python(docs))
+
+        results = [_rate(fn, rows, seconds) for fn in (default, fast, dump_json)]
+        print(f"{endpoint:48} " + " ".join(f"{r:12,.0f}" for r in results)
+              + f"  ({results[1] / results[0]:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="list endpoint serialization benchmark")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    main(args.rows, args.seconds)
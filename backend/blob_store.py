@@ -0,0 +1,235 @@
+"""Content-addressed image storage for channel covers.
+
+An uploaded image is stored once under ``<sha256>.<ext>``, so re-uploading
+the same bytes is free, and WebP thumbnails are derived from it as
+``<sha256>-w<width>.webp``. Keys never change content, which lets
+``GET /api/images/{key}`` be cached by browsers and CDNs forever. Channel
+documents keep only the key (``cover_image_key``).
+
+Backends share one small async interface (``exists``/``put``/``get``):
+
+- ``LocalBlobStore``: files under BLOB_STORE_PATH (default backend/blobs),
+  for development and single-host deployments.
+- ``S3BlobStore``: any S3-compatible bucket (BLOB_S3_BUCKET, optional
+  BLOB_S3_PREFIX and BLOB_S3_ENDPOINT_URL for MinIO, R2 and the like).
+
+``python blob_store.py --migrate-covers`` moves inline ``data:`` cover
+images of existing channels into the store.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover - only needed with BLOB_STORE_BACKEND=s3
+    boto3 = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - pillow is in requirements.txt
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (480, 1280)
+# Larger images are rejected from their header, before any pixel is decoded
+MAX_IMAGE_PIXELS = 40_000_000
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}(?:\.(?:jpg|png|gif|webp)|-w\d+\.webp)")
+
+# Leading bytes of each accepted format; the client's content type is not trusted
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def sniff_extension(data: bytes) -> str:
+    for signature, extension in _SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    raise InvalidImage("Cover images must be JPEG, PNG, GIF or WebP")
+
+
+def content_type_for(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def thumbnail_key(key: str, width: int) -> str:
+    return f"{key.split('.', 1)[0]}-w{width}.webp"
+
+
+def make_thumbnails(data: bytes, widths=THUMBNAIL_WIDTHS) -> Dict[int, bytes]:
+    """WebP renditions no wider than each width (images are never upscaled)."""
+    if Image is None:
+        logger.warning("Pillow is not installed; storing cover images without thumbnails")
+        return {}
+    widths = sorted(widths, reverse=True)
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.size[0] * image.size[1] > MAX_IMAGE_PIXELS:
+                raise InvalidImage(f"Cover images may have at most {MAX_IMAGE_PIXELS:,} pixels")
+            # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale while still covering the largest width
+            image.draft("RGB", (widths[0], widths[0] * 4))
+            image.load()
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise InvalidImage("Could not decode the image") from exc
+    thumbnails = {}
+    # Each rendition is shrunk from the previous, larger one instead of from the original
+    for width in widths:
+        image.thumbnail((width, width * 4))
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=80, method=4)
+        thumbnails[width] = out.getvalue()
+    return thumbnails
+
+
+class LocalBlobStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).exists)
+
+    async def put(self, key: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(self._write, self._path(key), data)
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            return await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            return None
+
+
+class S3BlobStore:
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        if boto3 is None:
+            raise RuntimeError("BLOB_STORE_BACKEND=s3 requires the boto3 package")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self.prefix + key)
+        except self.client.exceptions.ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    async def put(self, key: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(
+            self.client.put_object, Bucket=self.bucket, Key=self.prefix + key, Body=data,
+            ContentType=content_type, CacheControl=IMAGE_CACHE_CONTROL,
+        )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=self.prefix + key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return await asyncio.to_thread(obj["Body"].read)
+
+
+async def store_image(store, data: bytes) -> Tuple[str, bool]:
+    """Store ``data`` and its thumbnails; returns the key and whether it was new."""
+    extension = sniff_extension(data)
+    key = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    if await store.exists(key):
+        return key, False
+    thumbnails = await asyncio.to_thread(make_thumbnails, data)
+    for width, thumbnail in thumbnails.items():
+        await store.put(thumbnail_key(key, width), thumbnail, "image/webp")
+    # The original goes last: once it exists, the thumbnails are known to exist too
+    await store.put(key, data, content_type_for(key))
+    return key, True
+
+
+def decode_data_uri(uri: str) -> bytes:
+    header, _, payload = uri.partition(",")
+    if not header.startswith("data:") or ";base64" not in header:
+        raise InvalidImage("Only base64 data URIs can be migrated")
+    try:
+        return base64.b64decode(payload, validate=True)
+    except binascii.Error as exc:
+        raise InvalidImage("Malformed base64 payload") from exc
+
+
+def blob_store_from_env():
+    backend = os.environ.get("BLOB_STORE_BACKEND", "local")
+    if backend == "s3":
+        return S3BlobStore(
+            os.environ["BLOB_S3_BUCKET"],
+            prefix=os.environ.get("BLOB_S3_PREFIX", ""),
+            endpoint_url=os.environ.get("BLOB_S3_ENDPOINT_URL") or None,
+        )
+    return LocalBlobStore(Path(os.environ.get("BLOB_STORE_PATH", Path(__file__).parent / "blobs")))
+
+
+async def migrate_covers(db, store) -> None:
+    """Move inline data-URI covers into the store and keep only their keys."""
+    migrated = failed = 0
+    async for channel in db.channels.find({"cover_image": {"$regex": "^data:"}}, {"_id": 0, "id": 1, "cover_image": 1}):
+        try:
+            key, _ = await store_image(store, decode_data_uri(channel["cover_image"]))
+        except InvalidImage as exc:
+            logger.warning("Skipping cover of channel %s: %s", channel["id"], exc)
+            failed += 1
+            continue
+        await db.channels.update_one(
+            {"id": channel["id"]}, {"$set": {"cover_image_key": key}, "$unset": {"cover_image": ""}},
+        )
+        migrated += 1
+    print(f"migrated {migrated} covers, skipped {failed}")
+
+
+async def _main() -> None:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await migrate_covers(client[os.environ['DB_NAME']], blob_store_from_env())
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the cover image store")
+    parser.add_argument("--migrate-covers", action="store_true", required=True, help="move inline data: covers into the store")
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,524 @@
+"""Bulk import of users, channels and investments from CSV or NDJSON.
+
+Run from the backend folder, users first, then channels, then investments:
+
+    python bulk_import.py users creators.csv
+    python bulk_import.py channels channels.ndjson
+    python bulk_import.py investments history.csv --rejects rejected.ndjson
+
+Columns are the API request bodies plus what the route would take from the
+logged-in user:
+
+- users: ``UserCreate`` fields, optional ``balance`` (default is the signup
+  credit) and ``created_at``;
+- channels: ``ChannelCreate`` fields, ``creator_email``, optional ``id`` and
+  ``created_at``;
+- investments: ``InvestmentCreate`` fields, ``investor_email``, optional
+  ``id`` and ``investment_date``.
+
+The input is streamed in batches. Rows are validated with the API models
+and the routes' rules, and bad rows are reported and skipped. Passwords are
+hashed on a process pool (``--workers``), and users and channels are
+written with unordered ``insert_many`` calls. Investments are grouped by
+investor: the rows that fit the investor's balance, taken in input order,
+are kept and the rest rejected, then ``apply_investments``
+(investment_engine.py) debits the sum with one conditional ``$inc`` and
+writes the investments, ledger rows, channel totals and summaries with one
+batched write each. Investors are placed concurrently.
+
+Nothing is recomputed from scratch afterwards. Every batch applies its own
+``$inc`` to the balances, channel totals and summaries it touches, as the
+API routes do, so imports can run while the API takes traffic. API workers
+keep cached responses until their TTL expires. Funding history gets one
+batched write per batch, with running totals derived from the channel
+totals after it. When imported rows predate investments already in the
+database, or arrive out of date order, the chart's running totals can read
+high on earlier days; ``python funding_history.py --rebuild`` recomputes
+them.
+
+Progress and rows/sec go to stderr. After each batch the input position is
+saved to ``<input>.checkpoint.json``, and ``--resume`` continues from
+there. Ids are derived from the row, from the email for users, or taken
+from an ``id`` column. Replaying a batch after a crash therefore skips rows
+already written instead of duplicating them.
+"""
+import abc
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import EmailStr, Field, ValidationError
+from pymongo.errors import BulkWriteError
+
+import equity_ledger
+import funding_history
+from balance_ledger import record_transactions
+from blob_store import blob_store_from_env
+from documents import (
+    MIN_INVESTMENT, NEW_CHANNEL_COUNTERS, STARTING_BALANCE, ChannelCreate, InvestmentCreate, UserCreate,
+    build_channel_doc, build_user_doc, cover_image_error, opening_entry,
+)
+from investment_engine import InsufficientBalance, apply_investments, build_investment_doc
+from passwords import DEFAULT_BCRYPT_ROUNDS, PasswordHasher
+
+DEFAULT_BATCH_SIZE = 1000
+# Batches in flight: the next one validates and hashes while the previous one writes
+DEFAULT_PIPELINE_DEPTH = 2
+REPORT_INTERVAL_SECONDS = 5.0
+MAX_PRINTED_REJECTS = 20
+USER_TYPES = ("creator", "investor")
+# Fixed so derived ids are the same on every run
+IMPORT_NAMESPACE = uuid.UUID("5b0e7c1e-4a1f-4b8e-9a57-2f0c3d6e8b14")
+
+_DUPLICATE_KEY = 11000
+
+Row = Tuple[int, object]  # (1-based row number, CSV dict or NDJSON line)
+
+
+class UserRow(UserCreate):
+    balance: float = Field(STARTING_BALANCE, ge=0)
+    created_at: Optional[datetime] = None
+
+
+class ChannelRow(ChannelCreate):
+    id: Optional[str] = None
+    creator_email: EmailStr
+    created_at: Optional[datetime] = None
+
+
+class InvestmentRow(InvestmentCreate):
+    id: Optional[str] = None
+    investor_email: EmailStr
+    investment_date: Optional[datetime] = None
+
+
+def read_rows(path: Path, fmt: str) -> Iterator[Row]:
+    with open(path, newline="", encoding="utf-8") as handle:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(handle), 1):
+                # Empty cells mean "not given", so optional columns fall back to their defaults
+                yield number, {key: value for key, value in row.items() if value not in ("", None)}
+        else:
+            lines = (line for line in handle if line.strip())
+            yield from enumerate(lines, 1)
+
+
+def _batches(rows: Iterator[Row], size: int) -> Iterator[List[Row]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timestamp(value: Optional[datetime]) -> str:
+    if value is None:
+        return datetime.now(timezone.utc).isoformat()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _derived_id(*parts) -> str:
+    return str(uuid.uuid5(IMPORT_NAMESPACE, ":".join(str(part) for part in parts)))
+
+
+async def _insert_unordered(collection, docs: List[dict]) -> int:
+    """Insert ``docs`` and return how many were new; duplicates of earlier runs are skipped."""
+    if not docs:
+        return 0
+    try:
+        await collection.insert_many(docs, ordered=False)
+        return len(docs)
+    except BulkWriteError as exc:
+        errors = exc.details["writeErrors"]
+        if any(error["code"] != _DUPLICATE_KEY for error in errors):
+            raise
+        return len(docs) - len(errors)
+    finally:
+        for doc in docs:
+            doc.pop("_id", None)
+
+
+def _redact(raw):
+    # Rejected rows are written out; never with a password in them
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return raw
+    if isinstance(raw, dict):
+        return {key: value for key, value in raw.items() if key != "password"}
+    return raw
+
+
+class Rejects:
+    """Prints the first rejected rows and optionally writes all of them as NDJSON."""
+
+    def __init__(self, path: Optional[Path]):
+        self.count = 0
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def add(self, number: int, raw, reason: str) -> None:
+        self.count += 1
+        if self.count <= MAX_PRINTED_REJECTS:
+            print(f"row {number}: {reason}", file=sys.stderr)
+        if self._file is not None:
+            self._file.write(json.dumps({"row": number, "error": reason, "data": _redact(raw)}, default=str) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class BatchRejects:
+    """Rejects of one batch, counted separately so batches in flight do not mix their counts."""
+
+    def __init__(self, rejects: Rejects):
+        self.rejects = rejects
+        self.count = 0
+
+    def add(self, number: int, raw, reason: str) -> None:
+        self.count += 1
+        self.rejects.add(number, raw, reason)
+
+
+def _validation_error(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors())
+    return str(exc)
+
+
+def _reject(rejects: BatchRejects, number: int, row, reason: str) -> None:
+    rejects.add(number, row.model_dump(mode="json"), reason)
+
+
+class Importer(abc.ABC):
+    """Validates and writes one kind of row."""
+
+    model = None
+
+    def __init__(self, db, source: Path):
+        self.db = db
+        self.source = source
+
+    def validate(self, batch: List[Row], rejects: BatchRejects) -> list:
+        valid = []
+        for number, raw in batch:
+            try:
+                data = json.loads(raw) if isinstance(raw, str) else raw
+                valid.append((number, self.model.model_validate(data)))
+            except (ValueError, ValidationError) as exc:
+                rejects.add(number, raw, _validation_error(exc))
+        return valid
+
+    def row_id(self, number: int, row) -> str:
+        return row.id or _derived_id(self.source.name, number, row.model_dump_json())
+
+    async def _users_by_email(self, emails) -> dict:
+        users = await self.db.users.find(
+            {"email": {"$in": list(set(emails))}}, {"_id": 0, "id": 1, "name": 1, "email": 1, "user_type": 1},
+        ).to_list(None)
+        return {user["email"]: user for user in users}
+
+    @abc.abstractmethod
+    async def write(self, batch: List[Row], rejects: BatchRejects) -> Tuple[int, int]:
+        """Write the valid rows of ``batch``; returns (inserted, duplicates)."""
+
+
+class UserImporter(Importer):
+    model = UserRow
+
+    def __init__(self, db, source: Path, hasher: PasswordHasher):
+        super().__init__(db, source)
+        self.hasher = hasher
+
+    async def write(self, batch: List[Row], rejects: BatchRejects) -> Tuple[int, int]:
+        rows = []
+        for number, row in self.validate(batch, rejects):
+            if row.user_type not in USER_TYPES:
+                _reject(rejects, number, row, f"user_type must be one of {', '.join(USER_TYPES)}")
+            else:
+                rows.append((number, row))
+        existing = await self._users_by_email([row.email for _, row in rows])
+        fresh, seen = [], set()
+        for number, row in rows:
+            if row.email not in existing and row.email not in seen:
+                seen.add(row.email)
+                fresh.append(row)
+        hashes = await asyncio.gather(*(self.hasher.hash(row.password) for row in fresh))
+        docs = [
+            build_user_doc(row, password_hash, _derived_id("user", row.email), row.balance, _timestamp(row.created_at))
+            for row, password_hash in zip(fresh, hashes)
+        ]
+        if not docs:
+            return 0, len(rows)
+        # Ledger first: a user never exists without its opening row, even after a crash
+        entries = [opening_entry(doc) for doc in docs]
+        await record_transactions(self.db, entries)
+        try:
+            await self.db.users.insert_many(docs, ordered=False)
+            failed = []
+        except BulkWriteError as exc:
+            if any(error["code"] != _DUPLICATE_KEY for error in exc.details["writeErrors"]):
+                raise
+            failed = [docs[error["index"]]["id"] for error in exc.details["writeErrors"]]
+        finally:
+            for doc in docs:
+                doc.pop("_id", None)
+        if failed:
+            # A replayed row's user exists and keeps its row; one that lost its email to a concurrent signup has none
+            kept = await self.db.users.find({"id": {"$in": failed}}, {"_id": 0, "id": 1}).to_list(None)
+            orphans = set(failed) - {user["id"] for user in kept}
+            await self.db.balance_transactions.delete_many(
+                {"id": {"$in": [entry["id"] for entry in entries if entry["user_id"] in orphans]}},
+            )
+        inserted = len(docs) - len(failed)
+        return inserted, len(rows) - inserted
+
+
+class ChannelImporter(Importer):
+    model = ChannelRow
+
+    def __init__(self, db, source: Path, blob_store):
+        super().__init__(db, source)
+        self.blob_store = blob_store
+
+    async def write(self, batch: List[Row], rejects: BatchRejects) -> Tuple[int, int]:
+        rows = self.validate(batch, rejects)
+        creators = await self._users_by_email([row.creator_email for _, row in rows])
+        docs = []
+        for number, row in rows:
+            creator = creators.get(row.creator_email)
+            if creator is None or creator["user_type"] != "creator":
+                _reject(rejects, number, row, "creator_email is not a registered creator")
+                continue
+            cover_error = await cover_image_error(self.blob_store, row)
+            if cover_error:
+                _reject(rejects, number, row, cover_error)
+                continue
+            channel_doc = build_channel_doc(row, creator, self.row_id(number, row), _timestamp(row.created_at))
+            docs.append({**channel_doc, **NEW_CHANNEL_COUNTERS})
+        inserted = await _insert_unordered(self.db.channels, docs)
+        # Every channel, not just new ones: a replayed batch may have lost its stats; existing ones are skipped
+        await equity_ledger.record_channels_created(self.db, docs)
+        return inserted, len(docs) - inserted
+
+
+class InvestmentImporter(Importer):
+    model = InvestmentRow
+
+    def __init__(self, db, source: Path, client=None):
+        super().__init__(db, source)
+        # Only needed with MONGO_TRANSACTIONS=1
+        self.client = client
+        # The next batch validates while this one places; placing stays in input order
+        self._placing = asyncio.Lock()
+
+    async def write(self, batch: List[Row], rejects: BatchRejects) -> Tuple[int, int]:
+        rows = self.validate(batch, rejects)
+        investors = await self._users_by_email([row.investor_email for _, row in rows])
+        channels = await self.db.channels.find(
+            {"id": {"$in": list({row.channel_id for _, row in rows})}},
+            {"_id": 0, "id": 1, "name": 1, "equity_percentage": 1, "goal_amount": 1},
+        ).to_list(None)
+        channels = {channel["id"]: channel for channel in channels}
+        accepted = []
+        for number, row in rows:
+            investor = investors.get(row.investor_email)
+            channel = channels.get(row.channel_id)
+            if investor is None or investor["user_type"] != "investor":
+                _reject(rejects, number, row, "investor_email is not a registered investor")
+            elif channel is None:
+                _reject(rejects, number, row, "Channel not found")
+            elif row.amount < MIN_INVESTMENT:
+                _reject(rejects, number, row, f"Minimum investment is ₹{MIN_INVESTMENT:.0f}")
+            else:
+                investment_doc = build_investment_doc(channel, investor, row.amount)
+                investment_doc["id"] = self.row_id(number, row)
+                investment_doc["investment_date"] = _timestamp(row.investment_date)
+                accepted.append((number, row, investment_doc))
+
+        # Rows written by an earlier run are skipped before anything is debited
+        existing = await self.db.investments.find(
+            {"id": {"$in": [doc["id"] for _, _, doc in accepted]}}, {"_id": 0, "id": 1},
+        ).to_list(None)
+        existing = {doc["id"] for doc in existing}
+        duplicates = 0
+        by_investor = {}
+        for number, row, doc in accepted:
+            if doc["id"] in existing:
+                duplicates += 1
+            else:
+                by_investor.setdefault(doc["investor_id"], []).append((number, row, doc))
+
+        async def place(items) -> Tuple[int, int]:
+            # One investor's rows in input order: each that still fits the balance is taken, the rest rejected,
+            # then all taken rows are debited and written together
+            investor_id = items[0][2]["investor_id"]
+            while True:
+                investor = await self.db.users.find_one({"id": investor_id}, {"_id": 0, "balance": 1})
+                if investor is None:
+                    for number, row, _ in items:
+                        _reject(rejects, number, row, "investor_email is not a registered investor")
+                    return 0, 0
+                fits, overdraws, spent = [], [], 0.0
+                for item in items:
+                    if spent + item[2]["amount"] <= investor["balance"]:
+                        spent += item[2]["amount"]
+                        fits.append(item)
+                    else:
+                        overdraws.append(item)
+                if not fits:
+                    placed = []
+                    break
+                try:
+                    placed = await apply_investments(self.client, self.db, channels, [doc for _, _, doc in fits])
+                    break
+                except InsufficientBalance:
+                    continue  # the balance changed since it was read
+            for number, row, _ in overdraws:
+                _reject(rejects, number, row, "Insufficient balance")
+            return placed, len(fits) - len(placed)
+
+        async with self._placing:
+            results = await asyncio.gather(*(place(items) for items in by_investor.values()))
+            placed = [doc for docs, _ in results for doc in docs]
+            # Read before the next batch places, so these are the totals right after this one
+            totals = await self.db.channels.find(
+                {"id": {"$in": list({doc["channel_id"] for doc in placed})}}, {"_id": 0, "id": 1, "total_raised": 1},
+            ).to_list(None)
+        duplicates += sum(skipped for _, skipped in results)
+        if placed:
+            await funding_history.record_investment_points(
+                self.db, placed, {channel["id"]: channel["total_raised"] for channel in totals},
+            )
+        return len(placed), duplicates
+
+
+def _load_checkpoint(path: Path, kind: str, source: Path, resume: bool) -> dict:
+    fresh = {"kind": kind, "source": source.name, "rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0,
+             "done": False}
+    if not resume or not path.exists():
+        return fresh
+    checkpoint = json.loads(path.read_text())
+    if (checkpoint["kind"], checkpoint["source"]) != (kind, source.name):
+        raise SystemExit(f"{path} belongs to a {checkpoint['kind']} import of {checkpoint['source']}")
+    return checkpoint
+
+
+def _save_checkpoint(path: Path, checkpoint: dict) -> None:
+    # Replace atomically so a crash mid-write never leaves a truncated checkpoint
+    partial = path.with_name(path.name + ".tmp")
+    partial.write_text(json.dumps(checkpoint))
+    os.replace(partial, path)
+
+
+class Progress:
+    def __init__(self, kind: str, checkpoint: dict):
+        self.kind = kind
+        self.checkpoint = checkpoint
+        self.first_row = checkpoint["rows"]
+        self.started = time.monotonic()
+        self.reported = self.started
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return (self.checkpoint["rows"] - self.first_row) / elapsed if elapsed > 0 else 0.0
+
+    def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self.reported < REPORT_INTERVAL_SECONDS:
+            return
+        self.reported = now
+        c = self.checkpoint
+        print(f"{self.kind}: {c['rows']} rows, {c['inserted']} inserted, {c['duplicates']} duplicates, "
+              f"{c['rejected']} rejected, {self.rate():.0f} rows/s", file=sys.stderr)
+
+
+async def run_import(importer: Importer, rows: Iterator[Row], rejects: Rejects, checkpoint: dict,
+                     checkpoint_path: Path, batch_size: int, depth: int = DEFAULT_PIPELINE_DEPTH) -> dict:
+    progress = Progress(checkpoint["kind"], checkpoint)
+    if not checkpoint["done"]:
+        in_flight = []
+
+        async def finish_oldest():
+            # Batches complete in input order, so the checkpoint only ever covers fully written rows
+            task, last_row, batch_rejects = in_flight.pop(0)
+            inserted, duplicates = await task
+            checkpoint["rows"] = last_row
+            checkpoint["inserted"] += inserted
+            checkpoint["duplicates"] += duplicates
+            checkpoint["rejected"] += batch_rejects.count
+            _save_checkpoint(checkpoint_path, checkpoint)
+            progress.report()
+
+        skip = checkpoint["rows"]
+        for batch in _batches((row for row in rows if row[0] > skip), batch_size):
+            if len(in_flight) >= depth:
+                await finish_oldest()
+            batch_rejects = BatchRejects(rejects)
+            in_flight.append((asyncio.create_task(importer.write(batch, batch_rejects)), batch[-1][0], batch_rejects))
+        while in_flight:
+            await finish_oldest()
+        checkpoint["done"] = True
+        _save_checkpoint(checkpoint_path, checkpoint)
+        progress.report(force=True)
+    return checkpoint
+
+
+async def _main(args) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    source = Path(args.source)
+    fmt = args.format or ("csv" if source.suffix.lower() == ".csv" else "ndjson")
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else source.with_name(source.name + ".checkpoint.json")
+    checkpoint = _load_checkpoint(checkpoint_path, args.kind, source, args.resume)
+    if checkpoint["done"]:
+        print(f"{source} was already imported ({checkpoint_path})", file=sys.stderr)
+        return 0
+
+    rejects = Rejects(Path(args.rejects) if args.rejects else None)
+    hasher = PasswordHasher(rounds=args.bcrypt_rounds, max_concurrency=args.workers, use_processes=True)
+    if args.kind == "users":
+        importer = UserImporter(db, source, hasher)
+    elif args.kind == "channels":
+        importer = ChannelImporter(db, source, blob_store_from_env())
+    else:
+        importer = InvestmentImporter(db, source, client)
+    try:
+        await run_import(importer, read_rows(source, fmt), rejects, checkpoint, checkpoint_path, args.batch_size)
+    finally:
+        hasher.shutdown()
+        rejects.close()
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import users, channels or investments from CSV or NDJSON")
+    parser.add_argument("kind", choices=["users", "channels", "investments"])
+    parser.add_argument("source", help="input file; .csv is read as CSV, anything else as NDJSON")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="override the format guessed from the extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="password hashing processes")
+    parser.add_argument("--bcrypt-rounds", type=int,
+                        default=int(os.environ.get("BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS)))
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of an earlier run")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <source>.checkpoint.json)")
+    parser.add_argument("--rejects", help="append rejected rows with their errors to this NDJSON file")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,161 @@
+"""MongoDB client construction, pool tuning and connection lifecycle.
+
+Pool and driver settings come from the environment (all optional):
+
+- MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE: connections per server per
+  worker process (driver defaults 100 / 0).
+- MONGO_WAIT_QUEUE_TIMEOUT_MS: how long a request may wait for a free pooled
+  connection before failing, instead of queueing forever under overload.
+- MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS,
+  MONGO_SOCKET_TIMEOUT_MS: driver timeouts.
+- MONGO_COMPRESSORS: e.g. ``zstd,snappy`` (needs the zstandard or
+  python-snappy package; the server must allow the compressor too).
+- MONGO_READ_PREFERENCE: default read preference (``primary``).
+- MONGO_LIST_READ_PREFERENCE: read preference for public list and export
+  queries that tolerate replication lag, e.g. ``secondaryPreferred``, with
+  MONGO_MAX_STALENESS_SECONDS bounding how stale a secondary may be.
+- MONGO_WARM_CONNECTIONS: connections opened at startup, so the first
+  requests after a deploy do not pay for TCP/TLS handshakes.
+
+``PoolStats`` is a pool listener counting connections, checkouts, waiters and
+wait-queue timeouts; these are exported on /metrics to show pool saturation.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Iterable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+logger = logging.getLogger(__name__)
+
+
+def _int_env(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _read_preference(name: str, max_staleness: int = -1):
+    return make_read_preference(read_pref_mode_from_name(name), None, max_staleness=max_staleness)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters summed over all servers; callbacks run on driver threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_timeouts = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+
+    def _add(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self._add(cleared=1)
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        self._add(open=1)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event) -> None:
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event) -> None:
+        timed_out = event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT
+        self._add(waiting=-1, checkout_failures=1, wait_timeouts=1 if timed_out else 0)
+
+    def connection_checked_out(self, event) -> None:
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event) -> None:
+        self._add(checked_out=-1)
+
+    def as_dict(self) -> dict:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "wait_timeouts": self.wait_timeouts,
+            "checkout_failures": self.checkout_failures,
+            "cleared": self.cleared,
+        }
+
+
+class Database:
+    """One Motor client per process, its default database and a lag-tolerant read view."""
+
+    def __init__(self, url: str, name: str, *, list_read_preference=None, warm_connections: int = 0,
+                 event_listeners: Iterable = (), **client_options):
+        self.pool_stats = PoolStats()
+        self.max_pool_size = client_options.get("maxPoolSize", 100)
+        self.warm_connections = warm_connections
+        self.client = AsyncIOMotorClient(url, event_listeners=[self.pool_stats, *event_listeners], **client_options)
+        self.db = self.client[name]
+        # Public lists and exports may read from secondaries; anything that must
+        # see the caller's own writes stays on self.db
+        self.list_db = self.db.with_options(read_preference=list_read_preference) if list_read_preference else self.db
+
+    async def warm_up(self) -> None:
+        """Select a server and open ``warm_connections`` pooled connections."""
+        await self.client.admin.command("ping")
+        count = min(self.warm_connections, self.max_pool_size)
+        if count > 1:
+            await asyncio.gather(*(self.client.admin.command("ping") for _ in range(count)))
+        logger.info("MongoDB pool warmed: %s", self.pool_stats.as_dict())
+
+    def stats(self) -> dict:
+        return {**self.pool_stats.as_dict(), "max_pool_size": self.max_pool_size}
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def database_from_env(event_listeners: Iterable = ()) -> Database:
+    options = {
+        "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE"),
+        "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE"),
+        "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+        "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS"),
+        "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS"),
+        "compressors": os.environ.get("MONGO_COMPRESSORS") or None,
+        "readPreference": os.environ.get("MONGO_READ_PREFERENCE") or None,
+    }
+    options = {key: value for key, value in options.items() if value is not None}
+    list_preference = os.environ.get("MONGO_LIST_READ_PREFERENCE")
+    return Database(
+        os.environ['MONGO_URL'],
+        os.environ['DB_NAME'],
+        list_read_preference=_read_preference(
+            list_preference, _int_env("MONGO_MAX_STALENESS_SECONDS") or -1,
+        ) if list_preference else None,
+        warm_connections=_int_env("MONGO_WARM_CONNECTIONS") or 0,
+        event_listeners=event_listeners,
+        **options,
+    )
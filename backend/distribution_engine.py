@@ -0,0 +1,175 @@
+"""Profit distribution engine.
+
+A distribution runs in two phases so it can be resumed after a crash:
+
+1. ``create_distribution`` reads each investor's summed equity from the
+   equity ledger, computes every share in one NumPy pass and writes
+   one ``profit_payouts`` row per recipient, then the distribution itself
+   with status "pending". Nothing is credited yet.
+2. ``apply_distribution`` sums payouts per user and credits balances with
+   one unordered ``bulk_write`` per chunk, then marks the distribution
+   "completed".
+
+Credits are idempotent: each user update only matches while the user's
+``credited_distributions`` (the last CREDIT_HISTORY_SIZE distribution ids)
+does not contain this distribution, so re-running phase 2 never pays twice.
+Each chunk's credits are then appended to the balance ledger, whose row ids
+are per (distribution, user), so a re-run fills in rows a crash left out
+without duplicating the rest.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+
+from balance_ledger import ledger_entry, record_transactions
+from equity_ledger import investor_positions
+
+APPLY_CHUNK_SIZE = 1000
+INSERT_CHUNK_SIZE = 1000
+CREDIT_HISTORY_SIZE = 100
+
+
+def compute_payouts(total_profit: float, team_members: List[dict], investors: List[dict], creator: dict) -> List[dict]:
+    """Split ``total_profit`` between team, investors (pro rata to equity) and creator."""
+    payouts = []
+
+    splits = np.array([m["profit_split_percentage"] for m in team_members], dtype=float)
+    team_shares = total_profit * splits / 100
+    for member, share in zip(team_members, team_shares.tolist()):
+        payouts.append({
+            "user_id": member["user_id"],
+            "user_name": member["user_name"],
+            "amount": share,
+            "type": "team",
+            "percentage": member["profit_split_percentage"],
+        })
+    remaining_profit = total_profit - float(team_shares.sum())
+
+    equity = np.array([inv["equity_percentage"] for inv in investors], dtype=float)
+    total_investor_equity = float(equity.sum())
+    if total_investor_equity > 0:
+        investor_shares = remaining_profit * equity / total_investor_equity
+        for investor, share, pct in zip(investors, investor_shares.tolist(), equity.tolist()):
+            payouts.append({
+                "user_id": investor["investor_id"],
+                "user_name": investor["investor_name"],
+                "amount": share,
+                "type": "investor",
+                "percentage": pct,
+            })
+        creator_remaining = remaining_profit - float(investor_shares.sum())
+    else:
+        creator_remaining = remaining_profit
+
+    # Investor shares sum to the remainder up to float error; ignore that dust
+    if creator_remaining > 1e-9:
+        payouts.append({
+            "user_id": creator["id"],
+            "user_name": creator["name"],
+            "amount": creator_remaining,
+            "type": "creator",
+            "percentage": 0,
+        })
+    return payouts
+
+
+async def create_distribution(
+    db, channel: dict, creator: dict, total_profit: float, distribution_id: Optional[str] = None
+) -> dict:
+    """Phase 1: compute and persist payouts; returns the pending distribution.
+
+    Passing a stable ``distribution_id`` makes a retried phase 1 replace the
+    payout rows a crashed attempt may have left behind.
+    """
+    team_members = await db.team_members.find(
+        {"channel_id": channel["id"]}, {"_id": 0, "user_id": 1, "user_name": 1, "profit_split_percentage": 1}
+    ).to_list(None)
+    investors = await investor_positions(db, channel["id"]).to_list(None)
+    payouts = compute_payouts(total_profit, team_members, investors, creator)
+
+    if distribution_id is None:
+        distribution_id = str(uuid.uuid4())
+    else:
+        await db.profit_payouts.delete_many({"distribution_id": distribution_id})
+    rows = [
+        {**payout, "distribution_id": distribution_id, "channel_id": channel["id"]}
+        for payout in payouts
+    ]
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        await db.profit_payouts.insert_many(rows[start:start + INSERT_CHUNK_SIZE], ordered=False)
+
+    # Written last: a crash before this point leaves only unreferenced payout rows
+    distribution_doc = {
+        "id": distribution_id,
+        "channel_id": channel["id"],
+        "channel_name": channel["name"],
+        "total_profit": total_profit,
+        "distribution_date": datetime.now(timezone.utc).isoformat(),
+        "recipient_count": len(payouts),
+        "user_count": len({payout["user_id"] for payout in payouts}),
+        "status": "pending",
+    }
+    await db.profit_distributions.insert_one(distribution_doc)
+
+    distribution_doc.pop("_id", None)
+    return distribution_doc
+
+
+async def apply_distribution(
+    db,
+    distribution_id: str,
+    on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+    on_credited: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+) -> int:
+    """Phase 2: credit every recipient exactly once; returns the users credited."""
+    per_user = db.profit_payouts.aggregate([
+        {"$match": {"distribution_id": distribution_id}},
+        {"$group": {"_id": "$user_id", "amount": {"$sum": "$amount"}}},
+    ])
+
+    distribution = await db.profit_distributions.find_one({"id": distribution_id}, {"_id": 0, "channel_id": 1})
+    channel_id = distribution["channel_id"] if distribution else None
+    credited = 0
+
+    async def flush(batch, user_ids, entries):
+        nonlocal credited
+        await db.users.bulk_write(batch, ordered=False)
+        await record_transactions(db, entries)
+        credited += len(batch)
+        if on_credited:
+            await on_credited(user_ids)
+        if on_progress:
+            await on_progress(credited)
+
+    batch, user_ids, entries = [], [], []
+    async for row in per_user:
+        user_ids.append(row["_id"])
+        entries.append(ledger_entry(row["_id"], row["amount"], "distribution", distribution_id, channel_id=channel_id))
+        batch.append(UpdateOne(
+            {"id": row["_id"], "credited_distributions": {"$ne": distribution_id}},
+            {
+                "$inc": {"balance": row["amount"]},
+                "$push": {"credited_distributions": {"$each": [distribution_id], "$slice": -CREDIT_HISTORY_SIZE}},
+            },
+        ))
+        if len(batch) >= APPLY_CHUNK_SIZE:
+            await flush(batch, user_ids, entries)
+            batch, user_ids, entries = [], [], []
+    if batch:
+        await flush(batch, user_ids, entries)
+
+    await db.profit_distributions.update_one(
+        {"id": distribution_id},
+        {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc).isoformat()}},
+    )
+    return credited
+
+
+async def load_payouts(db, distribution_id: str, limit: int) -> List[dict]:
+    return await db.profit_payouts.find(
+        {"distribution_id": distribution_id},
+        {"_id": 0, "user_id": 1, "user_name": 1, "amount": 1, "type": 1, "percentage": 1},
+    ).sort("amount", -1).limit(limit).to_list(limit)
@@ -0,0 +1,89 @@
+"""Request models and the user and channel documents built from them.
+
+Shared by the API routes (server.py) and bulk_import.py so both apply the
+same rules. Importing this module opens no connections and starts nothing;
+server.py, by contrast, creates the Mongo client, caches and job queue.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, EmailStr, Field
+
+from balance_ledger import ledger_entry
+from blob_store import KEY_PATTERN
+
+# Signup credit and smallest investment
+STARTING_BALANCE = 10000.0  # Mock starting balance
+MIN_INVESTMENT = 500.0
+
+# Stored on every new channel but not part of the Channel response
+NEW_CHANNEL_COUNTERS = {"funding_progress": 0.0, "total_distributed": 0.0}
+
+
+class UserCreate(BaseModel):
+    email: EmailStr
+    password: str
+    name: str
+    user_type: str  # 'creator' or 'investor'
+
+
+class ChannelCreate(BaseModel):
+    name: str
+    description: str
+    category: str
+    goal_amount: float
+    equity_percentage: float
+    cover_image: Optional[str] = Field(None, max_length=2048)  # external URL; uploads use cover_image_key
+    cover_image_key: Optional[str] = None
+
+
+class InvestmentCreate(BaseModel):
+    channel_id: str
+    amount: float
+
+
+def build_user_doc(user_data: UserCreate, password_hash: str, user_id: Optional[str] = None,
+                   balance: float = STARTING_BALANCE, created_at: Optional[str] = None) -> dict:
+    return {
+        "id": user_id or str(uuid.uuid4()),
+        "email": user_data.email,
+        "password_hash": password_hash,
+        "name": user_data.name,
+        "user_type": user_data.user_type,
+        "balance": balance,
+        "created_at": created_at or datetime.now(timezone.utc).isoformat()
+    }
+
+
+def opening_entry(user_doc: dict) -> dict:
+    return ledger_entry(user_doc["id"], user_doc["balance"], "opening", user_doc["id"], user_doc["created_at"])
+
+
+async def cover_image_error(blob_store, channel_data: ChannelCreate) -> Optional[str]:
+    if channel_data.cover_image and channel_data.cover_image.startswith("data:"):
+        return "Upload cover images via POST /api/images and send cover_image_key"
+    if channel_data.cover_image_key and not (
+        KEY_PATTERN.fullmatch(channel_data.cover_image_key) and await blob_store.exists(channel_data.cover_image_key)
+    ):
+        return "Unknown cover_image_key"
+    return None
+
+
+def build_channel_doc(channel_data: ChannelCreate, creator: dict, channel_id: Optional[str] = None,
+                      created_at: Optional[str] = None) -> dict:
+    return {
+        "id": channel_id or str(uuid.uuid4()),
+        "name": channel_data.name,
+        "description": channel_data.description,
+        "creator_id": creator["id"],
+        "creator_name": creator["name"],
+        "category": channel_data.category,
+        "goal_amount": channel_data.goal_amount,
+        "total_raised": 0.0,
+        "equity_percentage": channel_data.equity_percentage,
+        "cover_image": channel_data.cover_image,
+        "cover_image_key": channel_data.cover_image_key,
+        "status": "active",
+        "created_at": created_at or datetime.now(timezone.utc).isoformat()
+    }
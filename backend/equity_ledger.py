@@ -0,0 +1,400 @@
+"""Pre-aggregated funding and equity summaries, maintained on every write.
+
+- ``channel_stats``: one document per channel (total raised, investor and
+  investment counts, total equity sold).
+- ``equity_positions``: one document per (channel, investor) with the
+  amount invested and equity held across all of that investor's investments.
+- ``platform_stats``: a single document with platform-wide totals.
+
+Readers (profit distribution, dashboard stats) use these instead of
+scanning ``investments``. ``python equity_ledger.py --rebuild`` recomputes
+all three from the source collections, e.g. after deploying this on
+existing data. It also recomputes each channel's ``funding_progress``.
+Positions and channel stats are built in a side collection that then
+replaces the live one in a single rename, so readers such as a running
+profit distribution never see them empty.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from typing import Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from indexes import INDEXES
+
+PLATFORM_STATS_ID = "platform"
+REBUILD_SUFFIX = "_rebuild"
+# Guarded writes add the investment id here in the same update that applies it, so
+# replaying them changes nothing; release_investment removes it again
+APPLIED_FIELD = "applied_investments"
+
+_DUPLICATE_KEY = 11000
+
+
+class GuardMissed(Exception):
+    """A batched guarded write found a document already marked with some of its investments."""
+
+
+async def record_channel_created(db, channel_doc: dict) -> None:
+    await db.channel_stats.insert_one({
+        "channel_id": channel_doc["id"],
+        "total_raised": 0.0,
+        "investor_count": 0,
+        "investment_count": 0,
+        "total_equity_sold": 0.0,
+        "updated_at": channel_doc["created_at"],
+    })
+    await db.platform_stats.update_one({"id": PLATFORM_STATS_ID}, {"$inc": {"channel_count": 1}}, upsert=True)
+
+
+async def record_channels_created(db, channel_docs: List[dict]) -> int:
+    """``record_channel_created`` for a batch; channels that already have stats are skipped.
+
+    Returns how many stats documents were new, which is also what the
+    platform channel count grows by, so replaying a batch counts nothing twice.
+    """
+    if not channel_docs:
+        return 0
+    stats = [{
+        "channel_id": doc["id"],
+        "total_raised": 0.0,
+        "investor_count": 0,
+        "investment_count": 0,
+        "total_equity_sold": 0.0,
+        "updated_at": doc["created_at"],
+    } for doc in channel_docs]
+    try:
+        result = await db.channel_stats.insert_many(stats, ordered=False)
+        created = len(result.inserted_ids)
+    except BulkWriteError as exc:
+        if any(error["code"] != _DUPLICATE_KEY for error in exc.details["writeErrors"]):
+            raise
+        created = exc.details["nInserted"]
+    if created:
+        await db.platform_stats.update_one({"id": PLATFORM_STATS_ID}, {"$inc": {"channel_count": created}}, upsert=True)
+    return created
+
+
+async def guarded_update(collection, key: dict, update: dict, investment_id: str, upsert: bool = False,
+                         **kwargs) -> Tuple[bool, Optional[dict]]:
+    """``find_one_and_update`` that applies ``update`` at most once per investment.
+
+    Returns whether it was applied now, and the document as it was before
+    (None if the upsert created it).
+    """
+    guarded = {**key, APPLIED_FIELD: {"$ne": investment_id}}
+    update = {**update, "$push": {APPLIED_FIELD: investment_id}}
+    while True:
+        try:
+            previous = await collection.find_one_and_update(guarded, update, upsert=upsert, **kwargs)
+        except DuplicateKeyError:
+            # The upsert hit a document that is already marked, or that a concurrent upsert just created
+            if await collection.find_one({**key, APPLIED_FIELD: investment_id}, {"_id": 1}):
+                return False, None
+            continue
+        if previous is None and not upsert:
+            return False, None
+        return True, previous
+
+
+async def record_investment(db, investment_doc: dict, session=None, guarded: bool = False) -> None:
+    """Fold one investment into the position, channel and platform summaries.
+
+    With ``guarded`` each summary is updated at most once for this
+    investment, however often the call is repeated, until
+    ``release_investment`` drops the markers. Not for use in transactions.
+    """
+    investment_id = investment_doc["id"]
+    amount = investment_doc["amount"]
+    equity = investment_doc["equity_percentage"]
+
+    async def upsert(collection, key: dict, update: dict, **kwargs) -> Tuple[bool, Optional[dict]]:
+        if guarded:
+            return await guarded_update(collection, key, update, investment_id, upsert=True, **kwargs)
+        return True, await collection.find_one_and_update(key, update, upsert=True, session=session, **kwargs)
+
+    position_key = {"channel_id": investment_doc["channel_id"], "investor_id": investment_doc["investor_id"]}
+    applied, previous = await upsert(
+        db.equity_positions,
+        position_key,
+        {
+            "$inc": {"amount": amount, "equity_percentage": equity, "investment_count": 1},
+            "$set": {"investor_name": investment_doc["investor_name"], "last_investment_date": investment_doc["investment_date"]},
+            "$setOnInsert": {
+                "first_investment_date": investment_doc["investment_date"],
+                "first_investment_id": investment_id,
+            },
+        },
+        projection={"_id": 1},
+    )
+    if applied:
+        new_investor = previous is None
+    else:
+        # Applied by an earlier attempt, which may have stopped before the channel stats below
+        position = await db.equity_positions.find_one(position_key, {"_id": 0, "first_investment_id": 1}) or {}
+        new_investor = position.get("first_investment_id") == investment_id
+    await upsert(
+        db.channel_stats,
+        {"channel_id": investment_doc["channel_id"]},
+        {
+            "$inc": {
+                "total_raised": amount,
+                "total_equity_sold": equity,
+                "investment_count": 1,
+                "investor_count": 1 if new_investor else 0,
+            },
+            "$set": {"updated_at": investment_doc["investment_date"]},
+        },
+        projection={"_id": 1},
+    )
+    await upsert(
+        db.platform_stats,
+        {"id": PLATFORM_STATS_ID},
+        {"$inc": {"total_raised": amount, "investment_count": 1}},
+        projection={"_id": 1},
+    )
+
+
+async def guarded_bulk_write(collection, updates: List[Tuple[dict, dict, List[str]]], upsert: bool = False,
+                             guarded: bool = True, session=None) -> Set[int]:
+    """Apply (key, update, investment ids) triples with one unordered ``bulk_write``.
+
+    Guarded updates only match documents carrying none of their investment
+    ids and add all of them; if any update misses, GuardMissed is raised and
+    the caller falls back to per-investment ``guarded_update`` calls, which
+    skip what was applied. Returns the indexes of updates that upserted.
+    """
+    operations = []
+    for key, update, investment_ids in updates:
+        if guarded:
+            key = {**key, APPLIED_FIELD: {"$nin": investment_ids}}
+            update = {**update, "$push": {APPLIED_FIELD: {"$each": investment_ids}}}
+        operations.append(UpdateOne(key, update, upsert=upsert))
+    try:
+        result = await collection.bulk_write(operations, ordered=False, session=session)
+    except BulkWriteError as exc:
+        if guarded and all(error["code"] == _DUPLICATE_KEY for error in exc.details["writeErrors"]):
+            # An upsert met a marked document, or one a concurrent upsert created
+            raise GuardMissed() from exc
+        raise
+    if result.matched_count + result.upserted_count < len(operations):
+        raise GuardMissed()
+    return set(result.upserted_ids)
+
+
+async def record_investments(db, investment_docs: List[dict], session=None, guarded: bool = False) -> None:
+    """``record_investment`` for many investments with one batched write per summary.
+
+    Raises GuardMissed when a guarded batch cannot be applied as a whole.
+    """
+    positions: Dict[Tuple[str, str], List[dict]] = {}
+    for doc in sorted(investment_docs, key=lambda doc: doc["investment_date"]):
+        positions.setdefault((doc["channel_id"], doc["investor_id"]), []).append(doc)
+    created = await guarded_bulk_write(db.equity_positions, [
+        (
+            {"channel_id": channel_id, "investor_id": investor_id},
+            {
+                "$inc": {
+                    "amount": sum(doc["amount"] for doc in docs),
+                    "equity_percentage": sum(doc["equity_percentage"] for doc in docs),
+                    "investment_count": len(docs),
+                },
+                "$set": {"investor_name": docs[-1]["investor_name"], "last_investment_date": docs[-1]["investment_date"]},
+                "$setOnInsert": {"first_investment_date": docs[0]["investment_date"], "first_investment_id": docs[0]["id"]},
+            },
+            [doc["id"] for doc in docs],
+        )
+        for (channel_id, investor_id), docs in positions.items()
+    ], upsert=True, guarded=guarded, session=session)
+
+    channels: Dict[str, dict] = {}
+    for index, ((channel_id, _), docs) in enumerate(positions.items()):
+        channel = channels.setdefault(channel_id, {"docs": [], "new_investors": 0})
+        channel["docs"] += docs
+        channel["new_investors"] += index in created
+    await guarded_bulk_write(db.channel_stats, [
+        (
+            {"channel_id": channel_id},
+            {
+                "$inc": {
+                    "total_raised": sum(doc["amount"] for doc in channel["docs"]),
+                    "total_equity_sold": sum(doc["equity_percentage"] for doc in channel["docs"]),
+                    "investment_count": len(channel["docs"]),
+                    "investor_count": channel["new_investors"],
+                },
+                "$max": {"updated_at": max(doc["investment_date"] for doc in channel["docs"])},
+            },
+            [doc["id"] for doc in channel["docs"]],
+        )
+        for channel_id, channel in channels.items()
+    ], upsert=True, guarded=guarded, session=session)
+    await guarded_bulk_write(db.platform_stats, [(
+        {"id": PLATFORM_STATS_ID},
+        {"$inc": {
+            "total_raised": sum(doc["amount"] for doc in investment_docs),
+            "investment_count": len(investment_docs),
+        }},
+        [doc["id"] for doc in investment_docs],
+    )], upsert=True, guarded=guarded, session=session)
+
+
+async def release_investments(db, investment_docs: List[dict]) -> None:
+    """``release_investment`` for many investments."""
+    ids = [doc["id"] for doc in investment_docs]
+    release = {"$pull": {APPLIED_FIELD: {"$in": ids}}}
+    channel_ids = list({doc["channel_id"] for doc in investment_docs})
+    await db.equity_positions.update_many(
+        {"channel_id": {"$in": channel_ids}, "investor_id": {"$in": list({doc["investor_id"] for doc in investment_docs})}},
+        release,
+    )
+    await db.channel_stats.update_many({"channel_id": {"$in": channel_ids}}, release)
+    await db.platform_stats.update_one({"id": PLATFORM_STATS_ID}, release)
+
+
+async def release_investment(db, investment_doc: dict) -> None:
+    """Drop the markers a guarded ``record_investment`` left on the summaries."""
+    release = {"$pull": {APPLIED_FIELD: investment_doc["id"]}}
+    await db.equity_positions.update_one(
+        {"channel_id": investment_doc["channel_id"], "investor_id": investment_doc["investor_id"]}, release,
+    )
+    await db.channel_stats.update_one({"channel_id": investment_doc["channel_id"]}, release)
+    await db.platform_stats.update_one({"id": PLATFORM_STATS_ID}, release)
+
+
+async def get_channel_stats(db, channel_id: str) -> dict:
+    stats = await db.channel_stats.find_one({"channel_id": channel_id}, {"_id": 0, APPLIED_FIELD: 0})
+    return stats or {
+        "channel_id": channel_id,
+        "total_raised": 0.0,
+        "investor_count": 0,
+        "investment_count": 0,
+        "total_equity_sold": 0.0,
+    }
+
+
+async def get_platform_stats(db) -> dict:
+    stats = await db.platform_stats.find_one({"id": PLATFORM_STATS_ID}, {"_id": 0, "id": 0}) or {}
+    return {
+        "channel_count": stats.get("channel_count", 0),
+        "total_raised": stats.get("total_raised", 0.0),
+        "investment_count": stats.get("investment_count", 0),
+    }
+
+
+async def top_investors(db, channel_id: str, limit: int) -> list:
+    """The channel's largest investors by amount invested."""
+    return await db.equity_positions.find(
+        {"channel_id": channel_id}, {"_id": 0, APPLIED_FIELD: 0}
+    ).sort([("amount", -1), ("investor_id", 1)]).limit(limit).to_list(limit)
+
+
+def investor_positions(db, channel_id: str):
+    """Cursor over one channel's investors with their summed equity."""
+    return db.equity_positions.find(
+        {"channel_id": channel_id},
+        {"_id": 0, "investor_id": 1, "investor_name": 1, "equity_percentage": 1},
+    )
+
+
+async def _staging(db, name: str):
+    """An empty, indexed collection to build ``name`` in; a leftover from a failed run is dropped."""
+    staging = db[name + REBUILD_SUFFIX]
+    await staging.drop()
+    await staging.create_indexes(INDEXES[name])
+    return staging
+
+
+async def rebuild(db) -> None:
+    """Recompute every summary from channels and investments."""
+    now = datetime.now(timezone.utc).isoformat()
+    positions = await _staging(db, "equity_positions")
+    await db.investments.aggregate([
+        {"$sort": {"investment_date": 1}},
+        {"$group": {
+            "_id": {"channel_id": "$channel_id", "investor_id": "$investor_id"},
+            "investor_name": {"$last": "$investor_name"},
+            "amount": {"$sum": "$amount"},
+            "equity_percentage": {"$sum": "$equity_percentage"},
+            "investment_count": {"$sum": 1},
+            "first_investment_date": {"$first": "$investment_date"},
+            "first_investment_id": {"$first": "$id"},
+            "last_investment_date": {"$last": "$investment_date"},
+        }},
+        {"$set": {"channel_id": "$_id.channel_id", "investor_id": "$_id.investor_id"}},
+        {"$unset": "_id"},
+        {"$merge": {"into": positions.name}},
+    ]).to_list(None)
+    await positions.rename("equity_positions", dropTarget=True)
+
+    await db.channels.update_many({}, [{"$set": {"funding_progress": {"$cond": [
+        {"$gt": ["$goal_amount", 0]}, {"$divide": ["$total_raised", "$goal_amount"]}, 0.0,
+    ]}}}])
+
+    stats = await _staging(db, "channel_stats")
+    await db.channels.aggregate([
+        {"$project": {
+            "_id": 0,
+            "channel_id": "$id",
+            "total_raised": {"$literal": 0.0},
+            "investor_count": {"$literal": 0},
+            "investment_count": {"$literal": 0},
+            "total_equity_sold": {"$literal": 0.0},
+            "updated_at": {"$literal": now},
+        }},
+        {"$merge": {"into": stats.name}},
+    ]).to_list(None)
+    await db.equity_positions.aggregate([
+        {"$group": {
+            "_id": "$channel_id",
+            "total_raised": {"$sum": "$amount"},
+            "investor_count": {"$sum": 1},
+            "investment_count": {"$sum": "$investment_count"},
+            "total_equity_sold": {"$sum": "$equity_percentage"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "channel_id": "$_id",
+            "total_raised": 1,
+            "investor_count": 1,
+            "investment_count": 1,
+            "total_equity_sold": 1,
+            "updated_at": {"$literal": now},
+        }},
+        {"$merge": {"into": stats.name, "on": "channel_id", "whenMatched": "replace"}},
+    ]).to_list(None)
+    await stats.rename("channel_stats", dropTarget=True)
+
+    totals = await db.channel_stats.aggregate([
+        {"$group": {
+            "_id": None,
+            "channel_count": {"$sum": 1},
+            "total_raised": {"$sum": "$total_raised"},
+            "investment_count": {"$sum": "$investment_count"},
+        }},
+    ]).to_list(1)
+    totals = totals[0] if totals else {"channel_count": 0, "total_raised": 0.0, "investment_count": 0}
+    totals.pop("_id", None)
+    await db.platform_stats.replace_one({"id": PLATFORM_STATS_ID}, {"id": PLATFORM_STATS_ID, **totals}, upsert=True)
+
+
+async def _main() -> None:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await rebuild(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the pre-aggregated equity ledger")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="recompute all summaries from scratch")
+    parser.parse_args()
+    asyncio.run(_main())
@@ -0,0 +1,52 @@
+"""Opt-in fast JSON path for routes that return trusted database documents.
+
+By default FastAPI re-validates every row against ``response_model`` and runs
+it through ``jsonable_encoder`` before serializing. With FAST_JSON_RESPONSES=1
+the list and create routes instead fetch only the model's fields (so the
+output matches the model) and hand the documents straight to orjson.
+"""
+import json
+import os
+from typing import Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "0") == "1"
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def model_projection(model: Type[BaseModel]) -> dict:
+    """Mongo projection returning exactly the fields ``model`` serializes."""
+    projection = {field: 1 for field in model.model_fields}
+    projection["_id"] = 0
+    return projection
+
+
+def fast_response(content, response: Optional[Response] = None, status_code: int = 200, partial: bool = False):
+    """Return ``content`` unvalidated when the fast path is on, else unchanged.
+
+    ``partial`` content (a summary or ``fields=`` view, see views.py) can never
+    pass the route's response_model, so it always takes the fast path.
+    Headers already set on the injected ``response`` (e.g. X-Next-Cursor) are
+    carried over, since FastAPI ignores them once a Response is returned.
+    """
+    if not (FAST_JSON_RESPONSES or partial):
+        return content
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,274 @@
+"""Per-channel funding history in day buckets, for charts.
+
+``funding_history`` holds one document per (channel, UTC day) with the
+day's totals and an ``hours`` map of per-hour totals:
+
+    {"channel_id": ..., "day": "2026-10-18",
+     "raised": 1500.0, "investments": 2, "payouts": 0.0, "distributions": 0,
+     "total_raised": 8200.0, "total_payouts": 1000.0,
+     "hours": {"05": {"raised": 1500.0, "investments": 2, "total_raised": 8200.0, ...}}}
+
+Each investment or completed distribution is one upsert with ``$inc`` on
+the counters. ``$max`` sets the running totals (``total_raised``,
+``total_payouts``), which only grow, so out-of-order writes still leave the
+right closing value. A history query reads the buckets in its range plus
+the one bucket before it for the opening totals, so a year of daily points
+is about 365 documents however many investments there were. Charts get
+evenly spaced points: hours or days without activity carry the totals
+forward.
+
+``python funding_history.py --rebuild`` recomputes every bucket from
+investments and completed distributions, e.g. after deploying this on
+existing data.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from equity_ledger import APPLIED_FIELD, guarded_update
+
+INTERVALS = {"1h": timedelta(hours=1), "1d": timedelta(days=1)}
+DEFAULT_RANGES = {"1h": timedelta(days=2), "1d": timedelta(days=90)}
+# Longest range per interval, so a response stays a few hundred points
+MAX_RANGES = {"1h": timedelta(days=14), "1d": timedelta(days=730)}
+REBUILD_BATCH_SIZE = 1000
+
+_COUNTERS = ("raised", "investments", "payouts", "distributions")
+
+
+def _bucket_keys(timestamp: str):
+    # ISO timestamps in UTC: "2026-10-18T05:47:56.455344+00:00" -> ("2026-10-18", "05")
+    moment = datetime.fromisoformat(timestamp).astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d"), moment.strftime("%H")
+
+
+def _bucket_change(channel_id: str, timestamp: str, increments: Dict[str, float], totals: Dict[str, float]):
+    day, hour = _bucket_keys(timestamp)
+    inc = {}
+    for field, value in increments.items():
+        inc[field] = value
+        inc[f"hours.{hour}.{field}"] = value
+    update = {"$inc": inc}
+    if totals:
+        update["$max"] = {
+            **totals,
+            **{f"hours.{hour}.{field}": value for field, value in totals.items()},
+        }
+    return {"channel_id": channel_id, "day": day}, update
+
+
+def _bucket_update(channel_id: str, timestamp: str, increments: Dict[str, float], totals: Dict[str, float]) -> UpdateOne:
+    return UpdateOne(*_bucket_change(channel_id, timestamp, increments, totals), upsert=True)
+
+
+async def record_investment_point(db, investment_doc: dict, total_raised: Optional[float]) -> None:
+    totals = {"total_raised": total_raised} if total_raised is not None else {}
+    await db.funding_history.bulk_write([_bucket_update(
+        investment_doc["channel_id"], investment_doc["investment_date"],
+        {"raised": investment_doc["amount"], "investments": 1}, totals,
+    )])
+
+
+async def record_investment_points(db, investment_docs: List[dict], total_raised: Dict[str, float]) -> None:
+    """``record_investment_point`` for many investments with one ``bulk_write``.
+
+    ``total_raised`` holds each channel's total after the last of them; the
+    running total at each investment is that minus the amounts after it.
+    """
+    buckets: Dict[tuple, dict] = {}
+    remaining = dict(total_raised)
+    for doc in sorted(investment_docs, key=lambda doc: doc["investment_date"], reverse=True):
+        channel_id = doc["channel_id"]
+        bucket = buckets.setdefault((channel_id, *_bucket_keys(doc["investment_date"])), {
+            "timestamp": doc["investment_date"], "raised": 0.0, "investments": 0,
+            # Walking backwards, the first investment seen in a bucket is its last
+            "totals": {"total_raised": remaining[channel_id]} if channel_id in remaining else {},
+        })
+        bucket["raised"] += doc["amount"]
+        bucket["investments"] += 1
+        if channel_id in remaining:
+            remaining[channel_id] -= doc["amount"]
+    if buckets:
+        await db.funding_history.bulk_write([
+            _bucket_update(channel_id, bucket["timestamp"],
+                           {"raised": bucket["raised"], "investments": bucket["investments"]}, bucket["totals"])
+            for (channel_id, _, _), bucket in buckets.items()
+        ], ordered=False)
+
+
+async def record_distribution_point(db, distribution: dict) -> None:
+    """Add a completed distribution to the history; only the first call per distribution counts.
+
+    The channel total and the bucket are each updated at most once for the
+    distribution (``guarded_update`` markers), and ``history_recorded`` is
+    set only after both, so a call that failed part way is simply repeated.
+    """
+    distribution_id = distribution["id"]
+    recorded = await db.profit_distributions.find_one({"id": distribution_id}, {"_id": 0, "history_recorded": 1})
+    if recorded and recorded.get("history_recorded"):
+        return
+    channel_key = {"id": distribution["channel_id"]}
+    applied, previous = await guarded_update(
+        db.channels, channel_key, {"$inc": {"total_distributed": distribution["total_profit"]}}, distribution_id,
+        projection={"_id": 0, "total_distributed": 1},
+    )
+    if applied:
+        totals = {"total_payouts": previous.get("total_distributed", 0.0) + distribution["total_profit"]}
+    else:
+        # Applied by an earlier attempt (or no such channel); the current total is at least that one
+        channel = await db.channels.find_one(channel_key, {"_id": 0, "total_distributed": 1})
+        totals = {"total_payouts": channel.get("total_distributed", 0.0)} if channel else {}
+    completed_at = distribution.get("completed_at") or datetime.now(timezone.utc).isoformat()
+    bucket_key, update = _bucket_change(
+        distribution["channel_id"], completed_at,
+        {"payouts": distribution["total_profit"], "distributions": 1}, totals,
+    )
+    await guarded_update(db.funding_history, bucket_key, update, distribution_id, upsert=True)
+    await db.profit_distributions.update_one({"id": distribution_id}, {"$set": {"history_recorded": True}})
+    release = {"$pull": {APPLIED_FIELD: distribution_id}}
+    await db.channels.update_one(channel_key, release)
+    await db.funding_history.update_one(bucket_key, release)
+
+
+def resolve_range(interval: str, start: Optional[datetime], end: Optional[datetime]):
+    """Clamp a requested range to the interval's limits and align it to bucket boundaries."""
+    step = INTERVALS[interval]
+    end = end or datetime.now(timezone.utc)
+    start = start or end - DEFAULT_RANGES[interval]
+    start = max(start, end - MAX_RANGES[interval])
+    if interval == "1h":
+        start = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, end, step
+
+
+async def funding_history(db, channel_id: str, interval: str,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[dict]:
+    """Evenly spaced points from ``start`` to ``end`` with per-bucket and running totals."""
+    start, end, step = resolve_range(interval, start, end)
+    first_day, last_day = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    projection = {"_id": 0, "day": 1, "total_raised": 1, "total_payouts": 1, **{field: 1 for field in _COUNTERS}}
+    if interval == "1h":
+        projection["hours"] = 1
+    buckets, previous = await asyncio.gather(
+        db.funding_history.find(
+            {"channel_id": channel_id, "day": {"$gte": first_day, "$lte": last_day}}, projection,
+        ).sort("day", 1).to_list(None),
+        db.funding_history.find_one(
+            {"channel_id": channel_id, "day": {"$lt": first_day}},
+            {"_id": 0, "total_raised": 1, "total_payouts": 1}, sort=[("day", -1)],
+        ),
+    )
+
+    by_key = {}
+    for bucket in buckets:
+        if interval == "1h":
+            for hour, values in (bucket.get("hours") or {}).items():
+                by_key[f"{bucket['day']}T{hour}"] = values
+        else:
+            by_key[bucket["day"]] = bucket
+
+    running = {
+        "total_raised": (previous or {}).get("total_raised", 0.0),
+        "total_payouts": (previous or {}).get("total_payouts", 0.0),
+    }
+    # Hours of the first day that fall before ``start`` still move the opening totals
+    if interval == "1h":
+        first_key = start.strftime("%Y-%m-%dT%H")
+        for key, values in by_key.items():
+            if key < first_key:
+                for field in running:
+                    running[field] = max(running[field], values.get(field, 0.0))
+    points = []
+    moment = start
+    while moment <= end:
+        key = moment.strftime("%Y-%m-%dT%H" if interval == "1h" else "%Y-%m-%d")
+        values = by_key.get(key, {})
+        for field in running:
+            running[field] = max(running[field], values.get(field, 0.0))
+        points.append({
+            "t": moment.isoformat(),
+            "raised": values.get("raised", 0.0),
+            "investments": values.get("investments", 0),
+            "payouts": values.get("payouts", 0.0),
+            "distributions": values.get("distributions", 0),
+            **running,
+        })
+        moment += step
+    return points
+
+
+async def rebuild(db) -> int:
+    """Recompute every bucket and each channel's total_distributed; returns the bucket count."""
+    await db.funding_history.delete_many({})
+    updates = []
+
+    async def flush():
+        nonlocal updates
+        if updates:
+            await db.funding_history.bulk_write(updates, ordered=False)
+        updates = []
+
+    # Channel order is reversed so the sorts walk the channel_date_id indexes backwards
+    totals: Dict[str, float] = {}
+    investments = db.investments.find(
+        {}, {"_id": 0, "id": 1, "channel_id": 1, "amount": 1, "investment_date": 1},
+    ).sort([("channel_id", -1), ("investment_date", 1), ("id", 1)])
+    async for investment in investments:
+        channel_id = investment["channel_id"]
+        totals[channel_id] = totals.get(channel_id, 0.0) + investment["amount"]
+        updates.append(_bucket_update(
+            channel_id, investment["investment_date"],
+            {"raised": investment["amount"], "investments": 1}, {"total_raised": totals[channel_id]},
+        ))
+        if len(updates) >= REBUILD_BATCH_SIZE:
+            await flush()
+
+    totals = {}
+    distributions = db.profit_distributions.find(
+        {"status": "completed"},
+        {"_id": 0, "id": 1, "channel_id": 1, "total_profit": 1, "distribution_date": 1, "completed_at": 1},
+    ).sort([("channel_id", -1), ("distribution_date", 1), ("id", 1)])
+    async for distribution in distributions:
+        channel_id = distribution["channel_id"]
+        totals[channel_id] = totals.get(channel_id, 0.0) + distribution["total_profit"]
+        updates.append(_bucket_update(
+            channel_id, distribution.get("completed_at") or distribution["distribution_date"],
+            {"payouts": distribution["total_profit"], "distributions": 1}, {"total_payouts": totals[channel_id]},
+        ))
+        if len(updates) >= REBUILD_BATCH_SIZE:
+            await flush()
+    await flush()
+
+    await db.channels.update_many({}, {"$set": {"total_distributed": 0.0}})
+    if totals:
+        await db.channels.bulk_write([
+            UpdateOne({"id": channel_id}, {"$set": {"total_distributed": total}})
+            for channel_id, total in totals.items()
+        ], ordered=False)
+    await db.profit_distributions.update_many({"status": "completed"}, {"$set": {"history_recorded": True}})
+    return await db.funding_history.count_documents({})
+
+
+async def _main() -> None:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        print(f"rebuilt {await rebuild(client[os.environ['DB_NAME']])} funding history buckets")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the bucketed funding history")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="recompute all buckets from scratch")
+    parser.parse_args()
+    asyncio.run(_main())
@@ -0,0 +1,240 @@
+"""Strong ETags, conditional GET (304) and a response cache for public read routes."""
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in header.split(","))
+
+
+def conditional_json(request: Request, content, headers: dict = None) -> Response:
+    """Render ``content`` with an ETag, or an empty 304 if the client already has it.
+
+    ``Cache-Control: no-cache`` lets browsers store the body but revalidate
+    every time, which turns repeat views into bodiless 304s.
+    """
+    response = JSONResponse(jsonable_encoder(content), headers=headers)
+    etag = etag_for(response.body)
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    return response
+
+
+class CacheRule:
+    """A cacheable GET path pattern, its TTL and the invalidation tags it carries.
+
+    ``tags`` are format strings filled from the pattern's named groups, e.g.
+    ``"channel:{channel_id}"``.
+    """
+
+    def __init__(self, pattern: str, ttl_seconds: float, tags: Iterable[str]):
+        self.pattern = re.compile(pattern)
+        self.ttl_seconds = ttl_seconds
+        self.tags = tuple(tags)
+
+    def match(self, path: str) -> Optional[Tuple["CacheRule", frozenset]]:
+        m = self.pattern.fullmatch(path)
+        if m is None:
+            return None
+        return self, frozenset(tag.format(**m.groupdict()) for tag in self.tags)
+
+
+class _Entry:
+    __slots__ = ("status", "headers", "body", "etag", "last_modified", "modified_at", "expires_at", "tags")
+
+    def __init__(self, status, headers, body, etag, modified_at, expires_at, tags):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.modified_at = modified_at
+        self.last_modified = formatdate(modified_at, usegmt=True)
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class ResponseCache:
+    """In-process LRU cache of full GET responses, bounded by total body bytes.
+
+    Entries expire after their rule's TTL and are dropped early by
+    ``invalidate(tag)`` from the write paths. The cache is per worker, so
+    with several workers another worker may serve a response up to one TTL
+    old; keep TTLs short.
+    """
+
+    def __init__(self, rules: List[CacheRule], max_bytes: int):
+        self.rules = rules
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    def match(self, path: str):
+        for rule in self.rules:
+            matched = rule.match(path)
+            if matched:
+                return matched
+        return None
+
+    def get(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: _Entry) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def invalidate(self, *tags: str) -> None:
+        self.generation += 1
+        tags = set(tags)
+        stale = [key for key, entry in self._entries.items() if entry.tags & tags]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _not_modified(headers: Headers, entry: _Entry) -> bool:
+    if_none = headers.get("if-none-match")
+    if if_none is not None:
+        return if_none.strip() == "*" or entry.etag in (tag.strip() for tag in if_none.split(","))
+    since = headers.get("if-modified-since")
+    if since:
+        try:
+            return parsedate_to_datetime(since).timestamp() >= int(entry.modified_at)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving ``ResponseCache`` hits and 304s for matching GETs."""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        matched = self.cache.match(scope["path"])
+        if matched is None:
+            return await self.app(scope, receive, send)
+        rule, tags = matched
+
+        request_headers = Headers(scope=scope)
+        key = scope["path"] + "?" + scope["query_string"].decode("latin-1")
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.hits += 1
+            return await self._send_entry(entry, request_headers, send, "HIT")
+        self.cache.misses += 1
+        generation = self.cache.generation
+
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        # Always fetch the full response; the conditional check happens below
+        upstream_scope = dict(scope, headers=[
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"if-none-match", b"if-modified-since")
+        ])
+        await self.app(upstream_scope, receive, capture)
+        body = b"".join(chunks)
+        headers = MutableHeaders(raw=list(start["headers"]))
+        if start["status"] != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = headers.get("etag") or etag_for(body)
+        for name in ("content-length", "etag", "last-modified", "cache-control"):
+            del headers[name]
+        entry = _Entry(
+            200, headers.raw, body, etag, time.time(),
+            time.monotonic() + rule.ttl_seconds, tags,
+        )
+        # Skip storing if a write invalidated the cache while this response was built
+        if generation == self.cache.generation:
+            self.cache.put(key, entry)
+        await self._send_entry(entry, request_headers, send, "MISS")
+
+    async def _send_entry(self, entry: _Entry, request_headers: Headers, send, outcome: str):
+        headers = MutableHeaders(raw=list(entry.headers))
+        headers["ETag"] = entry.etag
+        headers["Last-Modified"] = entry.last_modified
+        headers["Cache-Control"] = "no-cache"
+        headers["X-Cache"] = outcome
+        if _not_modified(request_headers, entry):
+            self.cache.not_modified += 1
+            for name in ("content-type", "content-length"):
+                del headers[name]
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers["Content-Length"] = str(len(entry.body))
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": entry.body})
@@ -0,0 +1,190 @@
+"""Index bootstrap and query-plan verification for the collections server.py uses.
+
+Run ``python indexes.py`` from the backend folder to create the indexes, or
+``python indexes.py --check`` to additionally explain() every route's query
+shape and exit non-zero if any of them would fall back to a COLLSCAN.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Completed and failed jobs are deleted this long after ``finished_at`` (a TTL index)
+FINISHED_JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Indexes per collection. Names are explicit so changing a definition fails
+# loudly (IndexOptionsConflict) instead of silently creating a duplicate.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "channels": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+        IndexModel([("creator_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="creator_created_id"),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="category_created_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_id"),
+        IndexModel([("total_raised", DESCENDING), ("id", DESCENDING)], name="raised_id"),
+        IndexModel([("category", ASCENDING), ("total_raised", DESCENDING), ("id", DESCENDING)], name="category_raised_id"),
+        IndexModel([("funding_progress", DESCENDING), ("id", DESCENDING)], name="progress_id"),
+        IndexModel([("category", ASCENDING), ("funding_progress", DESCENDING), ("id", DESCENDING)], name="category_progress_id"),
+        IndexModel([("name", TEXT), ("description", TEXT)], name="name_description_text", weights={"name": 3}),
+    ],
+    "team_members": [
+        IndexModel([("channel_id", ASCENDING), ("user_id", ASCENDING)], name="channel_user_unique", unique=True),
+        IndexModel([("channel_id", ASCENDING), ("joined_at", ASCENDING), ("id", ASCENDING)], name="channel_joined_id"),
+    ],
+    "investments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("channel_id", ASCENDING), ("investment_date", DESCENDING), ("id", DESCENDING)], name="channel_date_id"),
+        IndexModel([("investor_id", ASCENDING), ("investment_date", DESCENDING), ("id", DESCENDING)], name="investor_date_id"),
+        IndexModel([("pending_steps", ASCENDING), ("pending_since", ASCENDING)], name="pending_steps_since"),
+    ],
+    "profit_distributions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("channel_id", ASCENDING), ("distribution_date", DESCENDING), ("id", DESCENDING)], name="channel_date_id"),
+    ],
+    "channel_stats": [
+        IndexModel([("channel_id", ASCENDING)], name="channel_unique", unique=True),
+    ],
+    "equity_positions": [
+        IndexModel([("channel_id", ASCENDING), ("investor_id", ASCENDING)], name="channel_investor_unique", unique=True),
+        IndexModel([("channel_id", ASCENDING), ("amount", DESCENDING), ("investor_id", ASCENDING)], name="channel_amount"),
+        IndexModel([("investor_id", ASCENDING), ("channel_id", ASCENDING)], name="investor_channel"),
+    ],
+    "funding_history": [
+        IndexModel([("channel_id", ASCENDING), ("day", ASCENDING)], name="channel_day_unique", unique=True),
+    ],
+    "portfolio_positions": [
+        IndexModel([("investor_id", ASCENDING), ("channel_id", ASCENDING)], name="investor_channel_unique", unique=True),
+    ],
+    "platform_stats": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)], name="status_run_after"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+        IndexModel([("finished_at", ASCENDING)], name="finished_ttl", expireAfterSeconds=FINISHED_JOB_RETENTION_SECONDS),
+    ],
+    "balance_transactions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created_id"),
+        IndexModel([("created_at", ASCENDING)], name="created"),
+    ],
+    "balance_snapshots": [
+        IndexModel([("user_id", ASCENDING), ("as_of", DESCENDING)], name="user_as_of_unique", unique=True),
+    ],
+    "balance_snapshot_runs": [
+        IndexModel([("status", ASCENDING), ("as_of", DESCENDING)], name="status_as_of"),
+    ],
+    "profit_payouts": [
+        IndexModel([("distribution_id", ASCENDING), ("user_id", ASCENDING), ("type", ASCENDING)], name="distribution_user_type_unique", unique=True),
+        IndexModel([("distribution_id", ASCENDING), ("amount", DESCENDING)], name="distribution_amount"),
+        IndexModel([("user_id", ASCENDING), ("type", ASCENDING), ("channel_id", ASCENDING)], name="user_type_channel"),
+    ],
+}
+
+# One entry per query shape issued by a route: (collection, filter, sort).
+# Values are placeholders; only the shape matters to the planner.
+QUERY_SHAPES = [
+    ("users", {"id": "x"}, None),
+    ("users", {"email": "x"}, None),
+    ("channels", {"id": "x"}, None),
+    ("channels", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"creator_id": "x"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"category": "x"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"status": "x"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {}, [("total_raised", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"category": "x"}, [("total_raised", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"funding_progress": {"$lt": 1}}, [("funding_progress", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"category": "x", "funding_progress": {"$lt": 1}}, [("funding_progress", DESCENDING), ("id", DESCENDING)]),
+    ("channels", {"$text": {"$search": "x"}}, None),
+    ("team_members", {"channel_id": "x"}, [("joined_at", ASCENDING), ("id", ASCENDING)]),
+    ("team_members", {"channel_id": "x", "user_id": "x"}, None),
+    ("investments", {"channel_id": "x"}, [("investment_date", DESCENDING), ("id", DESCENDING)]),
+    ("investments", {"investor_id": "x"}, [("investment_date", DESCENDING), ("id", DESCENDING)]),
+    ("investments", {"pending_steps": {"$in": ["x"]}, "pending_since": {"$lt": "x"}}, None),
+    ("profit_distributions", {"channel_id": "x"}, [("distribution_date", DESCENDING), ("id", DESCENDING)]),
+    ("profit_payouts", {"distribution_id": "x"}, [("amount", DESCENDING)]),
+    ("channel_stats", {"channel_id": "x"}, None),
+    ("equity_positions", {"channel_id": "x"}, None),
+    ("equity_positions", {"channel_id": "x"}, [("amount", DESCENDING), ("investor_id", ASCENDING)]),
+    ("balance_transactions", {"user_id": "x"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("balance_transactions", {"user_id": "x", "created_at": {"$gt": "x", "$lte": "x"}}, None),
+    ("balance_transactions", {"created_at": {"$gt": "x", "$lte": "x"}}, None),
+    ("balance_snapshots", {"user_id": "x", "as_of": {"$lte": "x"}}, [("as_of", DESCENDING)]),
+    ("balance_snapshot_runs", {"status": "completed"}, [("as_of", DESCENDING)]),
+    ("equity_positions", {"investor_id": "x"}, None),
+    ("profit_payouts", {"user_id": "x", "type": "investor"}, None),
+    ("portfolio_positions", {"investor_id": "x"}, None),
+    ("funding_history", {"channel_id": "x", "day": {"$gte": "x", "$lte": "x"}}, [("day", ASCENDING)]),
+    ("funding_history", {"channel_id": "x", "day": {"$lt": "x"}}, [("day", DESCENDING)]),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create every index in INDEXES. Safe to call on each startup."""
+    for collection, models in INDEXES.items():
+        await db[collection].create_indexes(models)
+    logger.info("Ensured indexes on %d collections", len(INDEXES))
+
+
+def _plan_stages(plan: dict):
+    """Yield every stage name in a winning-plan tree."""
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+    # Slot-based engine (6.0+) nests the classic plan under queryPlan
+    if "queryPlan" in plan:
+        yield from _plan_stages(plan["queryPlan"])
+
+
+async def verify_query_plans(db) -> list:
+    """Explain every QUERY_SHAPES entry and return the ones that COLLSCAN."""
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_plan_stages(winning_plan)):
+            failures.append((collection, query, sort))
+    return failures
+
+
+async def _main(check: bool) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        if not check:
+            return 0
+        failures = await verify_query_plans(db)
+        for collection, query, sort in failures:
+            print(f"COLLSCAN: {collection} filter={query} sort={sort}")
+        print(f"{len(QUERY_SHAPES) - len(failures)}/{len(QUERY_SHAPES)} query shapes use an index")
+        return 1 if failures else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="explain() every route query and fail on COLLSCAN")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(args.check)))
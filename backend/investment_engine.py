@@ -0,0 +1,349 @@
+"""Atomic investment write path.
+
+The investor's balance is debited with one conditional ``$inc`` that only
+matches while funds suffice, and ``total_raised`` is bumped with ``$inc``,
+so concurrent investments can neither overdraw a balance nor lose an update.
+
+Each debit is also appended to the balance ledger (balance_ledger.py).
+
+With MONGO_TRANSACTIONS=1 (replica set or sharded cluster required) the
+debit, the investment insert, the ledger row and the channel update commit
+together.
+Without it, a failed insert after the debit is compensated with a refund.
+The investment is inserted with the follow-up writes it still needs in
+``pending_steps`` (ledger row, channel total, equity summaries). Every step
+can be repeated after a failure at any point without applying twice: the
+ledger row has a fixed id, and the channel and summary updates only match
+documents that do not yet carry the investment id in ``applied_investments``
+and add it in the same write. An applied step is replaced by its
+``release:`` step, which removes those markers. Steps still pending after
+STEP_ATTEMPTS tries are finished by ``repair_investments``, which the API
+runs on a schedule and which only picks investments written more than
+REPAIR_GRACE_SECONDS ago (``pending_since``, not the investment date, which
+imports take from the input), so it does not race the writer that placed them.
+
+``apply_investments`` places several investments of one investor (bulk
+imports) with one debit, one insert and one batched write per collection,
+guarded the same way.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from balance_ledger import ledger_entry, record_transactions
+from equity_ledger import (
+    APPLIED_FIELD, GuardMissed, guarded_bulk_write, guarded_update, record_investment, record_investments,
+    release_investment, release_investments,
+)
+
+logger = logging.getLogger(__name__)
+
+USE_TRANSACTIONS = os.environ.get("MONGO_TRANSACTIONS", "0") == "1"
+FOLLOW_UP_STEPS = ("ledger", "total_raised", "equity")
+# Steps that mark the documents they update; each becomes "release:<step>" once applied
+GUARDED_STEPS = ("total_raised", "equity")
+PENDING_STEPS = [*FOLLOW_UP_STEPS, *(f"release:{step}" for step in GUARDED_STEPS)]
+STEP_ATTEMPTS = 3
+STEP_RETRY_SECONDS = 0.1
+# Investments written more recently than this may still be finishing their own steps
+REPAIR_GRACE_SECONDS = 60
+REPAIR_BATCH_SIZE = 500
+
+_DUPLICATE_KEY = 11000
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def build_investment_doc(channel: dict, investor: dict, amount: float) -> dict:
+    equity_per_rupee = channel["equity_percentage"] / channel["goal_amount"]
+    return {
+        "id": str(uuid.uuid4()),
+        "channel_id": channel["id"],
+        "channel_name": channel["name"],
+        "investor_id": investor["id"],
+        "investor_name": investor["name"],
+        "amount": amount,
+        "equity_percentage": equity_per_rupee * amount,
+        "investment_date": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _with_pending_steps(investment_doc: dict) -> dict:
+    return {
+        **investment_doc,
+        "pending_steps": list(FOLLOW_UP_STEPS),
+        "pending_since": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def _debit(db, investor_id: str, amount: float, session=None) -> None:
+    # The filter only matches while funds suffice, so check-and-debit is one atomic step
+    matched = await db.users.find_one_and_update(
+        {"id": investor_id, "balance": {"$gte": amount}},
+        {"$inc": {"balance": -amount}},
+        projection={"_id": 0, "id": 1},
+        session=session,
+    )
+    if matched is None:
+        raise InsufficientBalance()
+
+
+def debit_entry(investment_doc: dict) -> dict:
+    return ledger_entry(
+        investment_doc["investor_id"], -investment_doc["amount"], "investment", investment_doc["id"],
+        investment_doc["investment_date"], investment_doc["channel_id"],
+    )
+
+
+async def _add_to_total_raised(db, channel: dict, investment_doc: dict, session=None, guarded: bool = False) -> dict:
+    # funding_progress (total_raised / goal_amount) is kept in step for search and sorting
+    increments = {"total_raised": investment_doc["amount"]}
+    if channel["goal_amount"] > 0:
+        increments["funding_progress"] = investment_doc["amount"] / channel["goal_amount"]
+    key = {"id": investment_doc["channel_id"]}
+    if guarded:
+        applied, previous = await guarded_update(
+            db.channels, key, {"$inc": increments}, investment_doc["id"],
+            projection={"_id": 0, "total_raised": 1, "funding_progress": 1},
+        )
+        if not applied:
+            return {}
+        return {field: previous.get(field, 0.0) + increment for field, increment in increments.items()}
+    totals = await db.channels.find_one_and_update(
+        key, {"$inc": increments},
+        projection={"_id": 0, "total_raised": 1, "funding_progress": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    return totals or {}
+
+
+async def _add_to_totals_raised(db, channels: Dict[str, dict], investment_docs: List[dict], session=None,
+                                guarded: bool = False) -> None:
+    """``_add_to_total_raised`` for many investments, one batched update per channel."""
+    by_channel: Dict[str, List[dict]] = {}
+    for doc in investment_docs:
+        by_channel.setdefault(doc["channel_id"], []).append(doc)
+    updates = []
+    for channel_id, docs in by_channel.items():
+        amount = sum(doc["amount"] for doc in docs)
+        increments = {"total_raised": amount}
+        if channels[channel_id]["goal_amount"] > 0:
+            increments["funding_progress"] = amount / channels[channel_id]["goal_amount"]
+        updates.append(({"id": channel_id}, {"$inc": increments}, [doc["id"] for doc in docs]))
+    await guarded_bulk_write(db.channels, updates, guarded=guarded, session=session)
+
+
+async def _apply_step(db, channel: dict, investment_doc: dict, step: str) -> dict:
+    if step == "ledger":
+        await record_transactions(db, [debit_entry(investment_doc)])
+    elif step == "total_raised":
+        return await _add_to_total_raised(db, channel, investment_doc, guarded=True)
+    elif step == "equity":
+        await record_investment(db, investment_doc, guarded=True)
+    return {}
+
+
+async def _release_step(db, investment_doc: dict, step: str) -> None:
+    if step == "total_raised":
+        await db.channels.update_one({"id": investment_doc["channel_id"]}, {"$pull": {APPLIED_FIELD: investment_doc["id"]}})
+    elif step == "equity":
+        await release_investment(db, investment_doc)
+
+
+async def _run_step(db, channel: dict, investment_doc: dict, step: str) -> dict:
+    """Apply ``step`` if the investment still has it pending; safe to repeat after a failure anywhere."""
+    investment_id = investment_doc["id"]
+    stored = await db.investments.find_one({"id": investment_id}, {"_id": 0, "pending_steps": 1}) or {}
+    pending = stored.get("pending_steps", [])
+    release = f"release:{step}"
+    totals = {}
+    if step in pending:
+        totals = await _apply_step(db, channel, investment_doc, step)
+        if step not in GUARDED_STEPS:
+            await db.investments.update_one({"id": investment_id}, {"$pull": {"pending_steps": step}})
+            return totals
+        # Queue the release before dropping the step, so the markers outlive both
+        await db.investments.update_one({"id": investment_id}, {"$addToSet": {"pending_steps": release}})
+        await db.investments.update_one({"id": investment_id}, {"$pull": {"pending_steps": step}})
+    elif release not in pending:
+        return totals
+    await _release_step(db, investment_doc, step)
+    await db.investments.update_one({"id": investment_id}, {"$pull": {"pending_steps": release}})
+    return totals
+
+
+async def _finish_steps(db, channel: dict, investment_doc: dict) -> dict:
+    """Run the pending follow-up steps with retries; returns the channel totals if they were updated."""
+    totals = {}
+    for step in FOLLOW_UP_STEPS:
+        for attempt in range(1, STEP_ATTEMPTS + 1):
+            try:
+                totals.update(await _run_step(db, channel, investment_doc, step))
+                break
+            except PyMongoError:
+                if attempt == STEP_ATTEMPTS:
+                    logger.exception("Investment %s: %s step left for repair", investment_doc["id"], step)
+                    return totals
+                await asyncio.sleep(STEP_RETRY_SECONDS * 2 ** (attempt - 1))
+    return totals
+
+
+async def _finish_batch(db, channels: Dict[str, dict], investment_docs: List[dict]) -> None:
+    """Apply the follow-up steps of many investments with batched writes.
+
+    Every write is guarded like the single steps. If one fails or finds some
+    of its investments already applied (e.g. by a concurrent repair), each
+    investment finishes on its own with ``_finish_steps``, which skips the
+    writes that already landed.
+    """
+    ids = [doc["id"] for doc in investment_docs]
+    try:
+        await record_transactions(db, [debit_entry(doc) for doc in investment_docs])
+        await _add_to_totals_raised(db, channels, investment_docs, guarded=True)
+        await record_investments(db, investment_docs, guarded=True)
+        # Everything is applied; only the markers are left to release
+        await db.investments.update_many(
+            {"id": {"$in": ids}}, {"$set": {"pending_steps": [f"release:{step}" for step in GUARDED_STEPS]}},
+        )
+        await db.channels.update_many(
+            {"id": {"$in": list({doc["channel_id"] for doc in investment_docs})}},
+            {"$pull": {APPLIED_FIELD: {"$in": ids}}},
+        )
+        await release_investments(db, investment_docs)
+        await db.investments.update_many({"id": {"$in": ids}}, {"$set": {"pending_steps": []}})
+    except (GuardMissed, PyMongoError):
+        logger.warning("Batched follow-up writes for %d investments failed; finishing them one by one",
+                       len(investment_docs), exc_info=True)
+        for doc in investment_docs:
+            await _finish_steps(db, channels[doc["channel_id"]], doc)
+
+
+async def repair_investments(db) -> dict:
+    """Finish follow-up steps still pending on investments written over REPAIR_GRACE_SECONDS ago."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=REPAIR_GRACE_SECONDS)).isoformat()
+    repaired = 0
+    pending = db.investments.find(
+        {"pending_steps": {"$in": PENDING_STEPS}, "pending_since": {"$lt": cutoff}}, {"_id": 0},
+    ).limit(REPAIR_BATCH_SIZE)
+    async for investment_doc in pending:
+        channel = await db.channels.find_one(
+            {"id": investment_doc["channel_id"]}, {"_id": 0, "id": 1, "goal_amount": 1},
+        )
+        if channel is None:
+            continue
+        investment_doc.pop("pending_steps")
+        investment_doc.pop("pending_since")
+        await _finish_steps(db, channel, investment_doc)
+        repaired += 1
+    return {"repaired": repaired}
+
+
+async def place_investment(client, db, channel: dict, investor: dict, amount: float) -> Tuple[dict, dict]:
+    """Debit the investor and record the investment; raises InsufficientBalance.
+
+    Returns the investment and the channel's ``total_raised`` and
+    ``funding_progress`` right after it was applied.
+    """
+    return await apply_investment(client, db, channel, build_investment_doc(channel, investor, amount))
+
+
+async def apply_investment(client, db, channel: dict, investment_doc: dict) -> Tuple[dict, dict]:
+    """``place_investment`` for a prepared document, e.g. an imported one.
+
+    Raises InsufficientBalance, or DuplicateKeyError (with the debit undone)
+    when an investment with the same id already exists.
+    """
+    amount = investment_doc["amount"]
+    investor = {"id": investment_doc["investor_id"]}
+
+    if USE_TRANSACTIONS:
+        totals = {}
+
+        async def apply(session):
+            nonlocal totals
+            await _debit(db, investor["id"], amount, session)
+            await db.investments.insert_one(investment_doc, session=session)
+            await record_transactions(db, [debit_entry(investment_doc)], session)
+            totals = await _add_to_total_raised(db, channel, investment_doc, session)
+            await record_investment(db, investment_doc, session)
+
+        async with await client.start_session() as session:
+            await session.with_transaction(apply)
+    else:
+        await _debit(db, investor["id"], amount)
+        try:
+            await db.investments.insert_one(_with_pending_steps(investment_doc))
+        except Exception:
+            await db.users.update_one({"id": investor["id"]}, {"$inc": {"balance": amount}})
+            raise
+        totals = await _finish_steps(db, channel, investment_doc)
+
+    investment_doc.pop("_id", None)
+    return investment_doc, totals
+
+
+def _duplicate_indexes(exc: BulkWriteError) -> set:
+    """Indexes of the documents an unordered insert skipped as duplicates; other errors re-raise."""
+    if any(error["code"] != _DUPLICATE_KEY for error in exc.details["writeErrors"]):
+        raise exc
+    return {error["index"] for error in exc.details["writeErrors"]}
+
+
+async def apply_investments(client, db, channels: Dict[str, dict], investment_docs: List[dict]) -> List[dict]:
+    """``apply_investment`` for prepared investments of one investor, with batched writes.
+
+    The investor is debited once for the sum, so either all of them fit the
+    balance or InsufficientBalance is raised and nothing is written.
+    Investments whose id already exists are skipped and not charged.
+    Returns the investments that were inserted.
+    """
+    investor_id = investment_docs[0]["investor_id"]
+
+    if USE_TRANSACTIONS:
+        async def apply(session):
+            await _debit(db, investor_id, sum(doc["amount"] for doc in investment_docs), session)
+            await db.investments.insert_many(investment_docs, ordered=False, session=session)
+            await record_transactions(db, [debit_entry(doc) for doc in investment_docs], session)
+            await _add_to_totals_raised(db, channels, investment_docs, session)
+            await record_investments(db, investment_docs, session)
+
+        while investment_docs:
+            try:
+                async with await client.start_session() as session:
+                    await session.with_transaction(apply)
+                break
+            except BulkWriteError as exc:
+                # The transaction was rolled back; run it again without the duplicates
+                duplicates = _duplicate_indexes(exc)
+                investment_docs = [doc for index, doc in enumerate(investment_docs) if index not in duplicates]
+    else:
+        await _debit(db, investor_id, sum(doc["amount"] for doc in investment_docs))
+        pending = [_with_pending_steps(doc) for doc in investment_docs]
+        try:
+            await db.investments.insert_many(pending, ordered=False)
+            skipped = set()
+        except BulkWriteError as exc:
+            errors = {error["index"] for error in exc.details["writeErrors"]}
+            await db.users.update_one(
+                {"id": investor_id}, {"$inc": {"balance": sum(investment_docs[index]["amount"] for index in errors)}},
+            )
+            skipped = _duplicate_indexes(exc)
+        except Exception:
+            await db.users.update_one({"id": investor_id}, {"$inc": {"balance": sum(doc["amount"] for doc in investment_docs)}})
+            raise
+        investment_docs = [doc for index, doc in enumerate(investment_docs) if index not in skipped]
+        if investment_docs:
+            await _finish_batch(db, channels, investment_docs)
+
+    for doc in investment_docs:
+        doc.pop("_id", None)
+    return investment_docs
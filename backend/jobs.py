@@ -0,0 +1,231 @@
+"""Durable in-process background jobs.
+
+Jobs live in the ``jobs`` collection, so they survive restarts. Each worker
+process runs JOB_CONCURRENCY asyncio workers that claim queued jobs with an
+atomic find_one_and_update and hold a lease while running. A job whose lease
+expires (its worker crashed) becomes claimable again, and failures are
+retried with backoff up to MAX_ATTEMPTS times. A job whose lease expires on
+its last attempt is marked failed instead of being claimed again.
+
+Handlers are ``async def handler(job, report_progress)`` and must be safe to
+re-run after a crash. While a handler runs, a heartbeat renews its lease
+every HEARTBEAT_SECONDS, so a long job with no progress to report is not
+handed to a second worker.
+``schedule(kind, interval)`` enqueues a job once per interval; every worker
+tries, and the job id (kind plus interval number) lets only one succeed.
+
+Completed and failed jobs get a ``finished_at`` date, and a TTL index
+(indexes.py) deletes them FINISHED_JOB_RETENTION_SECONDS later, so
+scheduled jobs do not pile up.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+# Several renewals fit in one lease, so one slow or failed renewal does not lose it
+HEARTBEAT_SECONDS = LEASE_SECONDS / 5
+POLL_INTERVAL_SECONDS = 2.0
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5
+
+Handler = Callable[[dict, Callable[..., Awaitable[None]]], Awaitable[Optional[dict]]]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    def __init__(self, db, concurrency: int = 2):
+        self.db = db
+        self.concurrency = concurrency
+        self.worker_id = str(uuid.uuid4())
+        self._handlers: Dict[str, Handler] = {}
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        self._schedules = []
+
+    def handler(self, kind: str):
+        """Register the coroutine that runs jobs of ``kind``."""
+        def register(fn: Handler) -> Handler:
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def schedule(self, kind: str, interval_seconds: float, payload: Optional[dict] = None) -> None:
+        """Enqueue a ``kind`` job every ``interval_seconds`` once the queue starts."""
+        self._schedules.append((kind, interval_seconds, payload or {}))
+
+    async def enqueue(self, kind: str, payload: dict, owner_id: str, job_id: Optional[str] = None) -> dict:
+        now = _now().isoformat()
+        job = {
+            "id": job_id or str(uuid.uuid4()),
+            "kind": kind,
+            "owner_id": owner_id,
+            "payload": payload,
+            "status": "queued",
+            "progress": {"done": 0, "total": None},
+            "attempts": 0,
+            "error": None,
+            "result": None,
+            "run_after": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.db.jobs.insert_one(job)
+        job.pop("_id", None)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.db.jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def _claim(self) -> Optional[dict]:
+        now = _now()
+        claimed = {
+            "status": "running",
+            "worker_id": self.worker_id,
+            "lease_expires_at": (now + timedelta(seconds=LEASE_SECONDS)).isoformat(),
+            "updated_at": now.isoformat(),
+        }
+        job = await self.db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_after": {"$lte": now.isoformat()}},
+                # Lease expired: the worker running it died mid-job
+                {"status": "running", "lease_expires_at": {"$lt": now.isoformat()}, "attempts": {"$lt": MAX_ATTEMPTS}},
+            ]},
+            {"$set": claimed, "$inc": {"attempts": 1}},
+            sort=[("run_after", 1)],
+            projection={"_id": 0},
+        )
+        if job is not None:
+            job.update(claimed, attempts=job["attempts"] + 1)
+        return job
+
+    async def _fail_abandoned(self) -> None:
+        """Fail jobs whose lease expired on their last attempt; they would otherwise stay running."""
+        now = _now().isoformat()
+        await self.db.jobs.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": MAX_ATTEMPTS}},
+            {"$set": {
+                "status": "failed",
+                "error": f"Worker lost the job on each of {MAX_ATTEMPTS} attempts",
+                "updated_at": now,
+                "finished_at": _now(),
+            }},
+        )
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await self.db.jobs.update_one({"id": job_id, "worker_id": self.worker_id, "status": "running"}, {"$set": {
+                    "lease_expires_at": (_now() + timedelta(seconds=LEASE_SECONDS)).isoformat(),
+                }})
+            except PyMongoError:
+                logger.exception("Could not renew the lease on job %s", job_id)
+
+    async def _run(self, job: dict) -> None:
+        handler = self._handlers.get(job["kind"])
+
+        async def report_progress(done: int, total: Optional[int] = None) -> None:
+            update = {
+                "progress.done": done,
+                "lease_expires_at": (_now() + timedelta(seconds=LEASE_SECONDS)).isoformat(),
+                "updated_at": _now().isoformat(),
+            }
+            if total is not None:
+                update["progress.total"] = total
+            await self.db.jobs.update_one({"id": job["id"], "worker_id": self.worker_id}, {"$set": update})
+
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind {job['kind']!r}")
+            result = await handler(job, report_progress)
+        except asyncio.CancelledError:
+            # Shutting down is not a failure: hand the job straight back to the queue
+            await self.db.jobs.update_one(
+                {"id": job["id"], "worker_id": self.worker_id},
+                {"$set": {"status": "queued", "updated_at": _now().isoformat()}, "$inc": {"attempts": -1}},
+            )
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed on attempt %d", job["id"], job["kind"], job["attempts"])
+            retry = job["attempts"] < MAX_ATTEMPTS
+            run_after = _now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1))
+            update = {
+                "status": "queued" if retry else "failed",
+                "error": str(exc),
+                "run_after": run_after.isoformat(),
+                "updated_at": _now().isoformat(),
+            }
+            if not retry:
+                update["finished_at"] = _now()
+            # A worker that lost its lease must not overwrite the job's new run
+            await self.db.jobs.update_one({"id": job["id"], "worker_id": self.worker_id}, {"$set": update})
+            return
+        finally:
+            heartbeat.cancel()
+        await self.db.jobs.update_one({"id": job["id"], "worker_id": self.worker_id}, {"$set": {
+            "status": "completed",
+            "result": result,
+            "error": None,
+            "updated_at": _now().isoformat(),
+            "finished_at": _now(),
+        }})
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except PyMongoError:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is not None:
+                await self._run(job)
+                continue
+            try:
+                await self._fail_abandoned()
+            except PyMongoError:
+                logger.exception("Could not fail abandoned jobs")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _scheduler(self, kind: str, interval_seconds: float, payload: dict) -> None:
+        while True:
+            period = int(time.time() // interval_seconds)
+            try:
+                await self.enqueue(kind, payload, owner_id="system", job_id=f"{kind}:{period}")
+            except DuplicateKeyError:
+                pass  # another worker enqueued this period's job
+            except PyMongoError:
+                logger.exception("Could not enqueue scheduled %s job", kind)
+            await asyncio.sleep((period + 1) * interval_seconds - time.time())
+
+    def start(self) -> None:
+        """Start the workers; queued and orphaned jobs are picked up on their first poll."""
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers += [asyncio.create_task(self._scheduler(*schedule)) for schedule in self._schedules]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+def job_queue_from_env(db) -> JobQueue:
+    return JobQueue(db, concurrency=int(os.environ.get("JOB_CONCURRENCY", 2)))
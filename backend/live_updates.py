@@ -0,0 +1,241 @@
+"""Live channel updates pushed to browsers over Server-Sent Events.
+
+Write routes publish small events (``funding``, ``investment``,
+``distribution``) to topics: ``channel:<id>`` for one channel's page and
+``channels`` for the dashboard's funding ticker. ``LiveHub`` fans each event
+out to the subscribers of its topics in this worker. Publishing goes
+through a broker so multi-worker deployments see each other's events:
+
+- ``LocalBroker``: delivers straight back to this worker's hub (default).
+- ``RedisBroker``: LIVE_BROKER=redis publishes on one Redis pub/sub channel
+  that every worker's hub listens to.
+
+Publishing never waits on subscribers. Each ``Subscription`` holds bounded
+state: events with a ``key`` (the running funding total of a channel) are
+coalesced so a slow client only gets the latest value, and the rest go to a
+queue of at most ``max_queue`` events. When that overflows the oldest are
+dropped and the client is sent a ``resync`` event, telling it to refetch.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15.0
+# Tells EventSource how long to wait before reconnecting
+RECONNECT_MS = 3000
+DEFAULT_MAX_QUEUE = 100
+DEFAULT_MAX_SUBSCRIBERS = 10_000
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, topics: Iterable[str], max_queue: int = DEFAULT_MAX_QUEUE):
+        self.topics = frozenset(topics)
+        self._latest: Dict[str, dict] = {}
+        self._queue: deque = deque(maxlen=max_queue)
+        self._dropped = 0
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, event: dict) -> None:
+        key = event.get("key")
+        if key is not None:
+            self._latest[key] = event
+        else:
+            if len(self._queue) == self._queue.maxlen:
+                self._dropped += 1
+            self._queue.append(event)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next_events(self, timeout: float) -> List[dict]:
+        """Everything pending, oldest first; empty after ``timeout`` or once closed."""
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        events = [{"type": "resync"}] if self._dropped else []
+        events.extend(self._queue)
+        events.extend(self._latest.values())
+        self._queue.clear()
+        self._latest.clear()
+        self._dropped = 0
+        return events
+
+
+class LocalBroker:
+    """Single-process broker: messages go straight back to the local hub."""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[dict], None]] = None
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, message: dict) -> None:
+        if self._deliver is not None:
+            self._deliver(message)
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+class RedisBroker:
+    """Shares events between workers over one Redis pub/sub channel."""
+
+    def __init__(self, url: str, channel: str = "live-updates"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("LIVE_BROKER=redis requires the 'redis' package") from exc
+        self.channel = channel
+        self._redis = redis.from_url(url)
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Callable[[dict], None]) -> None:
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        deliver(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live update subscription failed; retrying")
+                await asyncio.sleep(1)
+
+    async def publish(self, message: dict) -> None:
+        await self._redis.publish(self.channel, json.dumps(message))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+class LiveHub:
+    def __init__(self, broker, max_subscribers: int = DEFAULT_MAX_SUBSCRIBERS, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.broker = broker
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self.published = 0
+        self.delivered = 0
+
+    async def start(self) -> None:
+        await self.broker.start(self.deliver)
+
+    async def stop(self) -> None:
+        self.close_all()
+        await self.broker.stop()
+
+    async def publish(self, topics: Iterable[str], event: dict) -> None:
+        """Send ``event`` to every subscriber of ``topics`` in all workers; best effort."""
+        self.published += 1
+        try:
+            await self.broker.publish({"topics": list(topics), "event": event})
+        except Exception:
+            logger.exception("Could not publish live update %s", event.get("type"))
+
+    def deliver(self, message: dict) -> None:
+        targets = set()
+        for topic in message["topics"]:
+            targets.update(self._subscribers.get(topic, ()))
+        for subscription in targets:
+            subscription.push(message["event"])
+        self.delivered += len(targets)
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    @contextmanager
+    def subscribe(self, *topics: str):
+        subscription = Subscription(topics, self.max_queue)
+        self._count += 1
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._count -= 1
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def close_all(self) -> None:
+        """End every open stream, e.g. on shutdown; EventSource clients reconnect elsewhere."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+
+    def stats(self) -> dict:
+        return {"subscribers": self._count, "published": self.published, "delivered": self.delivered}
+
+
+def _format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def event_stream(hub: LiveHub, *topics: str) -> StreamingResponse:
+    """An SSE response relaying ``topics``; raises TooManySubscribers when the hub is full."""
+    if hub.full:
+        raise TooManySubscribers()
+
+    async def body():
+        with hub.subscribe(*topics) as subscription:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            while not subscription.closed:
+                events = await subscription.next_events(HEARTBEAT_SECONDS)
+                # A comment line keeps proxies from timing out idle connections
+                yield "".join(_format_event(event) for event in events) if events else ": ping\n\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stops nginx from buffering the stream
+        "X-Accel-Buffering": "no",
+    })
+
+
+def live_hub_from_env() -> LiveHub:
+    if os.environ.get("LIVE_BROKER", "local") == "redis":
+        broker = RedisBroker(os.environ.get("LIVE_BROKER_URL", "redis://localhost:6379/0"))
+    else:
+        broker = LocalBroker()
+    return LiveHub(
+        broker,
+        max_subscribers=int(os.environ.get("LIVE_MAX_SUBSCRIBERS", DEFAULT_MAX_SUBSCRIBERS)),
+        max_queue=int(os.environ.get("LIVE_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+    )
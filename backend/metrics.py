@@ -0,0 +1,265 @@
+"""Per-route request timing and per-request Mongo command attribution.
+
+``MetricsMiddleware`` times every HTTP request, counts requests in flight and
+labels everything by the matched route template (``/api/channels/{channel_id}``),
+so label cardinality stays bounded. ``MongoCommandListener`` is a pymongo
+command listener that adds each command's round trip, duration and returned
+document count to the request that issued it. Motor runs commands on its
+executor with a copy of the caller's context, so the ``ContextVar`` holding
+the request's ``RequestStats`` is visible there. A route whose
+``http_request_mongo_commands`` histogram grows with the data is an N+1.
+
+``render()`` produces the Prometheus text format served at ``/metrics``.
+With SERVER_TIMING=1 every response also carries a ``Server-Timing`` header
+(``app``, ``db``) that browser dev tools display per request. Requests
+slower than SLOW_REQUEST_MS are logged with their Mongo breakdown.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 1000))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Commands whose replies carry documents in cursor.firstBatch / cursor.nextBatch
+_CURSOR_COMMANDS = {"find", "aggregate", "getMore"}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(labels, ('le', le))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {total}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[Tuple[str, str, str, float]]]) -> None:
+        """Register a callback yielding ``(name, kind, help, value)`` read at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collect in self._collectors:
+            for name, kind, help_text, value in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+REQUESTS = registry.register(Counter("http_requests_total", "HTTP requests by route and status"))
+REQUEST_SECONDS = registry.register(Histogram("http_request_duration_seconds", "HTTP request latency by route"))
+IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests currently being served"))
+REQUEST_MONGO_COMMANDS = registry.register(Histogram(
+    "http_request_mongo_commands", "Mongo round trips per HTTP request", COUNT_BUCKETS))
+REQUEST_MONGO_SECONDS = registry.register(Histogram(
+    "http_request_mongo_seconds", "Time spent in Mongo commands per HTTP request"))
+REQUEST_MONGO_DOCUMENTS = registry.register(Histogram(
+    "http_request_mongo_documents", "Documents returned by Mongo per HTTP request", COUNT_BUCKETS))
+MONGO_COMMANDS = registry.register(Counter("mongo_commands_total", "Mongo commands by name and outcome"))
+MONGO_SECONDS = registry.register(Histogram("mongo_command_duration_seconds", "Mongo command latency by name"))
+
+render = registry.render
+
+
+class RequestStats:
+    """Mongo work attributed to one request; updated from Motor's executor threads."""
+
+    __slots__ = ("commands", "seconds", "documents", "by_command", "_lock")
+
+    def __init__(self):
+        self.commands = 0
+        self.seconds = 0.0
+        self.documents = 0
+        self.by_command: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, command: str, seconds: float, documents: int) -> None:
+        with self._lock:
+            self.commands += 1
+            self.seconds += seconds
+            self.documents += documents
+            self.by_command[command] += 1
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _returned_documents(command: str, reply) -> int:
+    if command in _CURSOR_COMMANDS:
+        cursor = reply.get("cursor") or {}
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    return 0
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMANDS.inc(command=event.command_name, outcome="ok")
+        MONGO_SECONDS.observe(seconds, command=event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add(event.command_name, seconds, _returned_documents(event.command_name, event.reply))
+
+    def failed(self, event) -> None:
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMANDS.inc(command=event.command_name, outcome="error")
+        MONGO_SECONDS.observe(seconds, command=event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add(event.command_name, seconds, 0)
+
+
+def route_template(app, scope) -> str:
+    """The path template of the route ``scope`` matches, or "unmatched"."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    for candidate in app.router.routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and Mongo attribution."""
+
+    def __init__(self, app, router_app=None):
+        self.app = app
+        # The FastAPI app whose routes label the metrics (the outermost app)
+        self.router_app = router_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = route_template(self.router_app, scope)
+        method = scope["method"]
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        event_stream = False
+        IN_FLIGHT.inc(route=route)
+
+        async def send_wrapper(message):
+            nonlocal status_code, event_stream
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                event_stream = MutableHeaders(scope=message).get("content-type", "").startswith("text/event-stream")
+                if SERVER_TIMING:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", (
+                        f"app;dur={(time.perf_counter() - started) * 1000:.1f}, "
+                        f'db;dur={stats.seconds * 1000:.1f};desc="{stats.commands} mongo commands"'
+                    ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            IN_FLIGHT.dec(route=route)
+            REQUESTS.inc(method=method, route=route, status=str(status_code))
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route)
+            REQUEST_MONGO_COMMANDS.observe(stats.commands, method=method, route=route)
+            REQUEST_MONGO_SECONDS.observe(stats.seconds, method=method, route=route)
+            REQUEST_MONGO_DOCUMENTS.observe(stats.documents, method=method, route=route)
+            # Server-Sent Event streams stay open for minutes; that is not a slow request
+            if elapsed * 1000 >= SLOW_REQUEST_MS and not event_stream:
+                logger.warning(
+                    "Slow request %s %s: %.0f ms, %d mongo commands (%.0f ms, %d docs) %s",
+                    method, route, elapsed * 1000, stats.commands, stats.seconds * 1000, stats.documents,
+                    dict(stats.by_command),
+                )
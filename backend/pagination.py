@@ -0,0 +1,96 @@
+"""Opaque-cursor keyset pagination for list routes.
+
+A cursor encodes the sort name and the sort-key values of the last row on a
+page. The next page is fetched with a range filter on those keys, so every
+page is an index seek no matter how deep the client scrolls.
+"""
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# A sort is a list of (field, direction); the last field must be unique ("id")
+# so that rows with equal leading keys still have a total order.
+SortSpec = List[Tuple[str, int]]
+
+
+def newest_first(field: str) -> Dict[str, SortSpec]:
+    """The usual newest/oldest sort pair over a timestamp field."""
+    return {
+        "newest": [(field, DESCENDING), ("id", DESCENDING)],
+        "oldest": [(field, ASCENDING), ("id", ASCENDING)],
+    }
+
+
+def encode_cursor(sort_name: str, doc: dict, sort: SortSpec) -> str:
+    payload = {"s": sort_name, "v": [doc.get(field) for field, _ in sort]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_name: str, sort: SortSpec) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        values = payload["v"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort_name or len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: list) -> dict:
+    """Filter selecting rows strictly after ``values`` in ``sort`` order."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$lt" if direction == DESCENDING else "$gt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def resolve_sort(sort_name: str, sorts: Dict[str, SortSpec]) -> SortSpec:
+    if sort_name not in sorts:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(sorts)}")
+    return sorts[sort_name]
+
+
+async def paginate(
+    collection,
+    query: dict,
+    *,
+    sorts: Dict[str, SortSpec],
+    sort_name: str,
+    limit: int,
+    cursor: Optional[str],
+    response: Response,
+    projection: Optional[dict] = None,
+) -> List[dict]:
+    """Fetch one page and set the next-page cursor header on ``response``."""
+    sort = resolve_sort(sort_name, sorts)
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort_name, sort))]}
+
+    # An inclusion projection must still return the sort keys the cursor is built from
+    projection = projection or {"_id": 0}
+    hidden_keys = []
+    if any(value for field, value in projection.items() if field != "_id"):
+        hidden_keys = [field for field, _ in sort if not projection.get(field)]
+        projection = {**projection, **{field: 1 for field in hidden_keys}}
+
+    # Fetch one extra row to learn whether another page exists
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_name, docs[-1], sort)
+    for doc in docs:
+        for field in hidden_keys:
+            doc.pop(field, None)
+    return docs
@@ -0,0 +1,104 @@
+"""Async password hashing that keeps bcrypt off the event loop.
+
+bcrypt is deliberately slow, so hashing and verification run on a bounded
+thread (or process) pool. A semaphore caps how many run at once; callers
+beyond that wait in a queue whose depth is reported by ``stats()``.
+
+BCRYPT_ROUNDS sets the cost. A stored hash with any other cost is accepted
+once and transparently re-hashed at the current cost on successful login.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+DEFAULT_BCRYPT_ROUNDS = 12
+
+
+@lru_cache(maxsize=None)
+def _crypt_context(rounds: int) -> CryptContext:
+    # Pinning min and max to the default makes any other cost "need update"
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# Module-level so they can be pickled into a ProcessPoolExecutor
+def _hash(password: str, rounds: int) -> str:
+    return _crypt_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = DEFAULT_BCRYPT_ROUNDS, max_concurrency: int = 4, use_processes: bool = False):
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._max_waiting = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.max_concurrency)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        self._waiting += 1
+        self._max_waiting = max(self._max_waiting, self._waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._running -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Return (valid, new_hash); new_hash is set when the stored cost is outdated."""
+        return await self._run(_verify_and_update, password, hashed_password, self.rounds)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "queue_depth": self._waiting,
+            "max_queue_depth": self._max_waiting,
+            "completed": self._completed,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def password_hasher_from_env() -> PasswordHasher:
+    return PasswordHasher(
+        rounds=int(os.environ.get("BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS)),
+        max_concurrency=int(os.environ.get("PASSWORD_HASH_CONCURRENCY", os.cpu_count() or 1)),
+        use_processes=os.environ.get("PASSWORD_HASH_EXECUTOR", "thread") == "process",
+    )
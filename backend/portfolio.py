@@ -0,0 +1,202 @@
+"""Per-investor portfolio summaries computed inside MongoDB.
+
+A portfolio has one row per channel the investor holds: amount invested,
+equity, payouts received and ROI (payouts / invested), plus totals. It is
+built from two small aggregations instead of the raw investment and payout
+lists:
+
+- ``equity_positions`` (already summed per channel and investor by
+  equity_ledger.py), joined to ``channels`` for the name and status;
+- the investor's own ``profit_payouts`` rows (type "investor") from
+  completed distributions, grouped by channel, i.e. what was actually paid
+  out for their equity. Ledger credits are not used: they sum every share a
+  user got from a distribution, so an investor who is also on the team or
+  is the creator would see those shares inflate their ROI.
+
+Both read an investor-keyed index; the payouts grow with the number of
+distributions the investor took part in.
+
+Distributions made before the payout engine kept their payouts only in an
+inline ``distributions`` array and have no status.
+``python portfolio.py --backfill-payouts`` copies those arrays into
+``profit_payouts`` and marks the distributions completed (they were
+credited when made), so their payouts count here too.
+
+With PORTFOLIO_SOURCE=view, reads come from the ``portfolio_positions``
+materialized view instead. ``refresh_portfolio_view`` rebuilds it for all
+investors with ``$merge``, from a scheduled job (PORTFOLIO_REFRESH_INTERVAL_SECONDS)
+or ``python portfolio.py --refresh``. Rows may then lag by up to one
+interval, and the response says when they were computed.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+DEFAULT_POSITION_LIMIT = 100
+VIEW_COLLECTION = "portfolio_positions"
+
+_DUPLICATE_KEY = 11000
+
+_CHANNEL_FIELDS = [
+    {"$lookup": {"from": "channels", "localField": "channel_id", "foreignField": "id", "as": "channel"}},
+    {"$unwind": {"path": "$channel", "preserveNullAndEmptyArrays": True}},
+]
+
+
+def _position_projection(extra: Optional[dict] = None) -> dict:
+    return {"$project": {
+        "_id": 0,
+        "investor_id": 1,
+        "channel_id": 1,
+        "channel_name": "$channel.name",
+        "category": "$channel.category",
+        "status": "$channel.status",
+        "invested": "$amount",
+        "equity_percentage": 1,
+        "investment_count": 1,
+        "first_investment_date": 1,
+        "last_investment_date": 1,
+        **(extra or {}),
+    }}
+
+
+def _payouts_by_channel(match: dict, group_id) -> list:
+    return [
+        {"$match": {**match, "type": "investor"}},
+        # Only distributions that finished crediting count as paid
+        {"$lookup": {
+            "from": "profit_distributions", "localField": "distribution_id", "foreignField": "id", "as": "distribution",
+        }},
+        {"$match": {"distribution.status": "completed"}},
+        {"$group": {"_id": group_id, "payouts": {"$sum": "$amount"}}},
+    ]
+
+
+def _summarise(positions: List[dict], limit: int, as_of: str) -> dict:
+    for position in positions:
+        position.setdefault("payouts", 0.0)
+        position["roi"] = position["payouts"] / position["invested"] if position["invested"] else 0.0
+    positions.sort(key=lambda p: (-p["invested"], p["channel_id"]))
+    total_invested = sum(p["invested"] for p in positions)
+    total_payouts = sum(p["payouts"] for p in positions)
+    return {
+        "total_invested": total_invested,
+        "total_payouts": total_payouts,
+        "total_equity_percentage": sum(p["equity_percentage"] for p in positions),
+        "roi": total_payouts / total_invested if total_invested else 0.0,
+        "channel_count": len(positions),
+        "positions": positions[:limit],
+        "as_of": as_of,
+    }
+
+
+async def live_portfolio(db, investor_id: str, limit: int = DEFAULT_POSITION_LIMIT) -> dict:
+    """Aggregate the portfolio now; the two pipelines run concurrently."""
+    as_of = datetime.now(timezone.utc).isoformat()
+    positions, payouts = await asyncio.gather(
+        db.equity_positions.aggregate([
+            {"$match": {"investor_id": investor_id}},
+            *_CHANNEL_FIELDS,
+            _position_projection(),
+        ]).to_list(None),
+        db.profit_payouts.aggregate(
+            _payouts_by_channel({"user_id": investor_id}, "$channel_id"),
+        ).to_list(None),
+    )
+    paid = {row["_id"]: row["payouts"] for row in payouts}
+    for position in positions:
+        position["payouts"] = paid.get(position["channel_id"], 0.0)
+    return _summarise(positions, limit, as_of)
+
+
+async def view_portfolio(db, investor_id: str, limit: int = DEFAULT_POSITION_LIMIT) -> dict:
+    """Read the portfolio from the materialized view."""
+    positions = await db[VIEW_COLLECTION].find({"investor_id": investor_id}, {"_id": 0}).to_list(None)
+    as_of = min((p.pop("refreshed_at") for p in positions), default=datetime.now(timezone.utc).isoformat())
+    return _summarise(positions, limit, as_of)
+
+
+async def refresh_portfolio_view(db) -> dict:
+    """Rebuild ``portfolio_positions`` for every investor with two ``$merge`` passes."""
+    refreshed_at = datetime.now(timezone.utc).isoformat()
+    await db.equity_positions.aggregate([
+        *_CHANNEL_FIELDS,
+        _position_projection({"refreshed_at": {"$literal": refreshed_at}}),
+        # "merge" keeps each row's payouts from the last refresh until the next pass updates them
+        {"$merge": {"into": VIEW_COLLECTION, "on": ["investor_id", "channel_id"], "whenMatched": "merge"}},
+    ], allowDiskUse=True).to_list(None)
+    # Payouts only land on positions that exist
+    await db.profit_payouts.aggregate([
+        *_payouts_by_channel({}, {"investor_id": "$user_id", "channel_id": "$channel_id"}),
+        {"$project": {"_id": 0, "investor_id": "$_id.investor_id", "channel_id": "$_id.channel_id", "payouts": 1}},
+        {"$merge": {
+            "into": VIEW_COLLECTION, "on": ["investor_id", "channel_id"],
+            "whenMatched": "merge", "whenNotMatched": "discard",
+        }},
+    ], allowDiskUse=True).to_list(None)
+    return {"refreshed_at": refreshed_at, "positions": await db[VIEW_COLLECTION].estimated_document_count()}
+
+
+async def backfill_legacy_payouts(db) -> dict:
+    """Write ``profit_payouts`` rows for distributions that only have the inline array.
+
+    Rows are inserted before the distribution is marked completed, so an
+    interrupted run is simply run again; rows it already wrote are skipped.
+    """
+    backfilled = rows = 0
+    legacy = db.profit_distributions.find(
+        {"distributions": {"$exists": True}, "status": {"$exists": False}},
+        {"_id": 0, "id": 1, "channel_id": 1, "distributions": 1},
+    )
+    async for distribution in legacy:
+        payouts = [
+            {**payout, "distribution_id": distribution["id"], "channel_id": distribution["channel_id"]}
+            for payout in distribution["distributions"]
+        ]
+        if payouts:
+            try:
+                rows += len((await db.profit_payouts.insert_many(payouts, ordered=False)).inserted_ids)
+            except BulkWriteError as exc:
+                if any(error["code"] != _DUPLICATE_KEY for error in exc.details["writeErrors"]):
+                    raise
+                rows += exc.details["nInserted"]
+        await db.profit_distributions.update_one({"id": distribution["id"]}, {"$set": {"status": "completed"}})
+        backfilled += 1
+    return {"distributions": backfilled, "payouts": rows}
+
+
+def portfolio_reader_from_env():
+    return view_portfolio if os.environ.get("PORTFOLIO_SOURCE", "live") == "view" else live_portfolio
+
+
+async def _main(args: argparse.Namespace) -> None:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.backfill_payouts:
+            result = await backfill_legacy_payouts(db)
+            print(f"backfilled {result['payouts']} payouts from {result['distributions']} legacy distributions")
+        if args.refresh:
+            result = await refresh_portfolio_view(db)
+            print(f"refreshed {result['positions']} portfolio positions")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the portfolio materialized view")
+    parser.add_argument("--refresh", action="store_true", help="rebuild portfolio_positions")
+    parser.add_argument("--backfill-payouts", action="store_true",
+                        help="copy payouts of legacy distributions into profit_payouts (run once, before --refresh)")
+    args = parser.parse_args()
+    if not (args.refresh or args.backfill_payouts):
+        parser.error("pass --refresh and/or --backfill-payouts")
+    asyncio.run(_main(args))
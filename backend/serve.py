@@ -0,0 +1,125 @@
+"""Production entry point:  python -m backend.serve  (or  cd backend && python serve.py)
+
+Runs WEB_CONCURRENCY uvicorn worker processes (default 1) sharing one
+listening socket. uvicorn picks uvloop and httptools when they are
+installed. Each worker has its own Mongo pool, caches and bcrypt pool, so
+size MONGO_MAX_POOL_SIZE and PASSWORD_HASH_CONCURRENCY per worker.
+
+More than one worker needs LIVE_BROKER=redis, otherwise live updates
+published by one worker never reach streams held by another; serve.py
+refuses to start without it. The GET response cache (http_caching.py) stays
+per worker, so another worker may serve a response up to one rule TTL old
+after a write; set USER_CACHE_BACKEND and RATE_LIMIT_BACKEND to redis as
+well so sessions and rate limits are shared.
+
+On SIGTERM each worker first reports not-ready on /readyz for
+DRAIN_DELAY_SECONDS, so load balancers that poll readiness stop sending new
+traffic. It then ends open live-update streams (EventSource clients
+reconnect to another worker), stops accepting connections, lets in-flight requests finish
+for up to GRACEFUL_TIMEOUT_SECONDS, and runs the app's lifespan shutdown,
+which hands running background jobs back to the queue. SIGINT (Ctrl+C)
+skips the drain delay, and a second SIGINT exits without waiting.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+from pathlib import Path
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+logger = logging.getLogger("uvicorn.error")
+
+# The app imports its modules flat (server, documents, ...); under python -m backend.serve
+# put backend/ on the path so "server:app" resolves here and in spawned workers
+BACKEND_DIR = str(Path(__file__).resolve().parent)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+SHARED_LIVE_BROKERS = {"redis"}
+
+
+def default_workers() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        return os.cpu_count() or 1
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that fails readiness before it starts shutting down."""
+
+    def __init__(self, config: uvicorn.Config, drain_delay: float):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+        self.draining = False
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.draining or self.drain_delay <= 0 or sig == signal.SIGINT:
+            return self._exit(sig, frame)
+        self.draining = True
+        from server import app
+
+        app.state.draining = True
+        # Signal handlers run on the event loop, so the real exit can be scheduled on it
+        asyncio.get_running_loop().call_later(self.drain_delay, self._exit, sig, frame)
+
+    def _exit(self, sig, frame) -> None:
+        from server import live_hub
+
+        # Open event streams would otherwise hold the graceful shutdown until it times out
+        live_hub.close_all()
+        super().handle_exit(sig, frame)
+
+
+class Supervisor(Multiprocess):
+    def shutdown(self) -> None:
+        # uvicorn stops workers one at a time; signal them all so they drain in parallel
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        logger.info("Stopping parent process [%d]", self.pid)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the API with multiple workers")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 0)) or 1,
+                        help=f"worker processes (default WEB_CONCURRENCY or 1; this machine has {default_workers()} CPUs)")
+    args = parser.parse_args()
+    live_broker = os.environ.get("LIVE_BROKER", "local")
+    if args.workers > 1 and live_broker not in SHARED_LIVE_BROKERS:
+        parser.error(f"{args.workers} workers need a shared live-update broker (LIVE_BROKER=redis), "
+                     f"got LIVE_BROKER={live_broker}; run one worker or configure redis")
+
+    config = uvicorn.Config(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="auto",
+        http="auto",
+        lifespan="on",
+        proxy_headers=True,
+        # Client IPs (admission.client_ip, per-IP rate limits) come from X-Forwarded-For only when the
+        # proxy is listed here; render.yaml and railway.json set * for their load balancers
+        forwarded_allow_ips=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        timeout_keep_alive=int(os.environ.get("KEEP_ALIVE_SECONDS", 5)),
+        timeout_graceful_shutdown=int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", 30)),
+        log_level=os.environ.get("LOG_LEVEL", "info"),
+    )
+    server = DrainingServer(config, drain_delay=float(os.environ.get("DRAIN_DELAY_SECONDS", 0)))
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Supervisor(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
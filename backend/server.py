@@ -1,46 +1,148 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, Query, Request, Response, UploadFile, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
-from passlib.context import CryptContext
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
 import jwt
 
+from admission import client_ip, concurrency_limiter_from_env, rate_limit_backend_from_env, rate_limiter_from_env
+from database import database_from_env
+from indexes import ensure_indexes, verify_query_plans
+from balance_ledger import balance_as_of, reconcile, record_transactions, snapshot_balances, statement
+from blob_store import (
+    IMAGE_CACHE_CONTROL, KEY_PATTERN, THUMBNAIL_WIDTHS, InvalidImage, blob_store_from_env, content_type_for, store_image,
+    thumbnail_key,
+)
+from funding_history import funding_history, record_distribution_point, record_investment_point
+from documents import (
+    MIN_INVESTMENT, NEW_CHANNEL_COUNTERS, ChannelCreate, InvestmentCreate, UserCreate, build_channel_doc, build_user_doc,
+    cover_image_error, opening_entry,
+)
+from equity_ledger import get_channel_stats, get_platform_stats, record_channel_created, top_investors
+from fast_json import fast_response, model_projection
+from views import ListView
+from http_caching import CacheRule, ResponseCache, ResponseCacheMiddleware, conditional_json, if_none_match
+from distribution_engine import apply_distribution, create_distribution, load_payouts
+from jobs import job_queue_from_env
+from live_updates import TooManySubscribers, event_stream, live_hub_from_env
+from investment_engine import USE_TRANSACTIONS, InsufficientBalance, place_investment, repair_investments
+from metrics import MetricsMiddleware, MongoCommandListener, registry as metrics_registry
+from passwords import password_hasher_from_env
+from portfolio import DEFAULT_POSITION_LIMIT, portfolio_reader_from_env, refresh_portfolio_view, view_portfolio
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, newest_first, paginate
+from streaming import stream_documents
+from user_cache import VOLATILE_USER_FIELDS, user_cache_from_env
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection (pool settings and lifecycle in database.py)
+database = database_from_env(event_listeners=[MongoCommandListener()])
+client = database.client
+db = database.db
+# Read view for public lists and exports; a secondary when MONGO_LIST_READ_PREFERENCE is set
+list_db = database.list_db
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = password_hasher_from_env()
 security = HTTPBearer()
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Public read routes served from the in-process response cache. Writes
+# invalidate by tag; the TTL bounds staleness across workers.
+response_cache = ResponseCache([
+    CacheRule(r"/api/channels", 10, ["channels"]),
+    CacheRule(r"/api/stats", 10, ["channels"]),
+    CacheRule(r"/api/channels/(?P<channel_id>(?!stream$)[^/]+)", 30, ["channel:{channel_id}"]),
+    CacheRule(r"/api/channels/(?P<channel_id>[^/]+)/(?:team|investors|overview|stats|history)", 30, ["channel:{channel_id}"]),
+    CacheRule(r"/api/profits/(?P<channel_id>[^/]+)", 30, ["channel:{channel_id}"]),
+], max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024)))
+
+# Payout rows returned inline with a distribution; the rest stay in profit_payouts
+PAYOUT_PREVIEW_SIZE = 100
+
+# Internal user fields never returned to clients
+PRIVATE_USER_FIELDS = ["_id", "password_hash", "credited_distributions"]
+
+# Authenticated users, keyed by id; invalidate on every write to a user document
+user_cache = user_cache_from_env()
+
+# Admission control (see admission.py): per-IP limits on the bcrypt routes,
+# per-user limits on multi-write routes, and bounded in-flight work for both
+rate_limit_backend = rate_limit_backend_from_env()
+auth_rate_limit = rate_limiter_from_env(rate_limit_backend, "auth", per_minute=20, burst=10)
+write_rate_limit = rate_limiter_from_env(rate_limit_backend, "write", per_minute=60, burst=20)
+auth_concurrency = concurrency_limiter_from_env(
+    "auth", limit=2 * password_hasher.max_concurrency, max_waiting=8 * password_hasher.max_concurrency,
+)
+write_concurrency = concurrency_limiter_from_env("write", limit=32, max_waiting=64)
+
+# Server-Sent Events for live funding progress (see live_updates.py)
+live_hub = live_hub_from_env()
+
+# Content-addressed cover images (see blob_store.py)
+blob_store = blob_store_from_env()
+IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", 5 * 1024 * 1024))
+
+# Keyset sort orders accepted by the list routes (see pagination.py)
+CHANNEL_SORTS = {
+    **newest_first("created_at"),
+    "most_funded": [("total_raised", DESCENDING), ("id", DESCENDING)],
+    # Among channels still below their goal, the most nearly funded first
+    "closest_to_goal": [("funding_progress", DESCENDING), ("id", DESCENDING)],
+}
+TEAM_SORTS = newest_first("joined_at")
+INVESTMENT_SORTS = newest_first("investment_date")
+PROFIT_SORTS = newest_first("distribution_date")
+BALANCE_TRANSACTION_SORTS = newest_first("created_at")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await database.warm_up()
+        await ensure_indexes(db)
+        if os.environ.get("MONGO_CHECK_QUERY_PLANS") == "1":
+            for collection, query, sort in await verify_query_plans(db):
+                logger.warning("Query on %s %s sort=%s is a collection scan", collection, query, sort)
+    except PyMongoError:
+        logger.exception("Database warm-up or index bootstrap failed; run `python indexes.py --check` for details")
+    await live_hub.start()
+    job_queue.start()
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        await job_queue.stop()
+        await live_hub.stop()
+        await user_cache.close()
+        await rate_limit_backend.close()
+        password_hasher.shutdown()
+        database.close()
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.state.ready = False
+app.state.draining = False  # set by serve.py on SIGTERM
+READINESS_TIMEOUT_SECONDS = 2.0
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Pydantic Models
-class UserCreate(BaseModel):
-    email: EmailStr
-    password: str
-    name: str
-    user_type: str  # 'creator' or 'investor'
-
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -54,28 +156,77 @@ class User(BaseModel):
     balance: float
     created_at: str
 
-class ChannelCreate(BaseModel):
+class Channel(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
     name: str
     description: str
+    creator_id: str
+    creator_name: str
     category: str
     goal_amount: float
+    total_raised: float
     equity_percentage: float
     cover_image: Optional[str] = None
+    cover_image_key: Optional[str] = None
+    status: str
+    created_at: str
 
-class Channel(BaseModel):
+class ChannelSummary(BaseModel):
+    """Card view of a channel (``view=summary``) with a shortened description."""
     model_config = ConfigDict(extra="ignore")
     id: str
     name: str
     description: str
-    creator_id: str
     creator_name: str
     category: str
     goal_amount: float
     total_raised: float
     equity_percentage: float
     cover_image: Optional[str] = None
+    cover_image_key: Optional[str] = None
     status: str
-    created_at: str
+
+class ChannelStats(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    channel_id: str
+    total_raised: float
+    investor_count: int
+    investment_count: int
+    total_equity_sold: float
+
+class FundingPoint(BaseModel):
+    t: str  # start of the hour or day
+    raised: float
+    investments: int
+    payouts: float
+    distributions: int
+    total_raised: float
+    total_payouts: float
+
+class FundingHistory(BaseModel):
+    channel_id: str
+    interval: str
+    points: List[FundingPoint]  # oldest first, one per interval
+
+class PlatformStats(BaseModel):
+    channel_count: int
+    total_raised: float
+    investment_count: int
+
+class EquityPosition(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    investor_id: str
+    investor_name: str
+    amount: float
+    equity_percentage: float
+    investment_count: int
+    last_investment_date: str
+
+class ImageUpload(BaseModel):
+    key: str
+    thumbnails: dict  # width -> key
+    created: bool  # False when identical bytes were already stored
 
 class TeamMemberAdd(BaseModel):
     user_email: str
@@ -93,9 +244,11 @@ class TeamMember(BaseModel):
     profit_split_percentage: float
     joined_at: str
 
-class InvestmentCreate(BaseModel):
-    channel_id: str
-    amount: float
+class ChannelOverview(BaseModel):
+    channel: Channel
+    team: List[TeamMember]
+    top_investors: List[EquityPosition]
+    stats: ChannelStats
 
 class Investment(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -108,6 +261,39 @@ class Investment(BaseModel):
     equity_percentage: float
     investment_date: str
 
+class InvestmentSummary(BaseModel):
+    """An investment as listed to its own investor (``view=summary``)."""
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    channel_id: str
+    channel_name: str
+    amount: float
+    equity_percentage: float
+    investment_date: str
+
+class PortfolioPosition(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    channel_id: str
+    channel_name: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    invested: float
+    equity_percentage: float
+    investment_count: int
+    payouts: float
+    roi: float
+    first_investment_date: Optional[str] = None
+    last_investment_date: Optional[str] = None
+
+class Portfolio(BaseModel):
+    total_invested: float
+    total_payouts: float
+    total_equity_percentage: float
+    roi: float
+    channel_count: int
+    positions: List[PortfolioPosition]  # largest first
+    as_of: str
+
 class ProfitDistribute(BaseModel):
     channel_id: str
     total_profit: float
@@ -119,21 +305,140 @@ class ProfitDistribution(BaseModel):
     channel_name: str
     total_profit: float
     distribution_date: str
-    distributions: List[dict]
+    distributions: List[dict]  # largest PAYOUT_PREVIEW_SIZE payouts
+    recipient_count: Optional[int] = None
+    status: str = "completed"
 
-# Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class BalanceTransaction(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    amount: float  # signed: credits are positive, debits negative
+    kind: str  # 'opening', 'investment' or 'distribution'
+    ref_id: str
+    channel_id: Optional[str] = None
+    created_at: str
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+class BalanceAsOf(BaseModel):
+    at: str
+    balance: float
 
+class BalanceStatement(BaseModel):
+    start: str
+    end: str
+    opening_balance: float
+    closing_balance: float
+    credits: float
+    debits: float
+    transaction_count: int
+    by_kind: Dict[str, dict]
+
+class Job(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    kind: str
+    status: str
+    progress: dict
+    attempts: int
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: str
+    updated_at: str
+
+# Projections for routes that may skip response_model validation (fast_json.py)
+TEAM_MEMBER_FIELDS = model_projection(TeamMember)
+INVESTMENT_FIELDS = model_projection(Investment)
+PROFIT_DISTRIBUTION_FIELDS = model_projection(ProfitDistribution)
+PAYOUT_FIELDS = {"_id": 0, "user_id": 1, "user_name": 1, "amount": 1, "type": 1, "percentage": 1}
+BALANCE_TRANSACTION_FIELDS = model_projection(BalanceTransaction)
+
+# Cards clamp the description to two lines, so the summary only ships its start
+SUMMARY_DESCRIPTION_LENGTH = 160
+CHANNEL_VIEWS = ListView(Channel, ChannelSummary, {
+    **model_projection(ChannelSummary),
+    "description": {"$substrCP": ["$description", 0, SUMMARY_DESCRIPTION_LENGTH]},
+})
+INVESTMENT_VIEWS = ListView(Investment, InvestmentSummary)
+
+# Background jobs (durable in the jobs collection)
+job_queue = job_queue_from_env(db)
+
+@job_queue.handler("profit_distribution")
+async def run_profit_distribution(job: dict, report_progress) -> dict:
+    payload = job["payload"]
+    # The distribution reuses the job id, so a retry finds the attempt that came before it
+    distribution = await db.profit_distributions.find_one({"id": job["id"]}, {"_id": 0})
+    if distribution is None:
+        channel = await db.channels.find_one({"id": payload["channel_id"]}, {"_id": 0})
+        creator = {"id": payload["creator_id"], "name": payload["creator_name"]}
+        distribution = await create_distribution(db, channel, creator, payload["total_profit"], job["id"])
+
+    async def on_progress(done: int) -> None:
+        await report_progress(done, distribution["user_count"])
+
+    credited = await apply_distribution(db, distribution["id"], on_progress=on_progress, on_credited=invalidate_users)
+    await record_distribution_point(db, distribution)
+    response_cache.invalidate(f"channel:{distribution['channel_id']}")
+    await live_hub.publish([f"channel:{distribution['channel_id']}"], {
+        "type": "distribution",
+        "status": "completed",
+        "channel_id": distribution["channel_id"],
+        "distribution_id": distribution["id"],
+        "total_profit": distribution["total_profit"],
+        "users_credited": credited,
+    })
+    return {"distribution_id": distribution["id"], "users_credited": credited}
+
+@job_queue.handler("balance_snapshot")
+async def run_balance_snapshot(job: dict, report_progress) -> dict:
+    return await snapshot_balances(db)
+
+@job_queue.handler("balance_reconciliation")
+async def run_balance_reconciliation(job: dict, report_progress) -> dict:
+    report = await reconcile(db)
+    if report["mismatched"]:
+        logger.warning("%d user balances disagree with the ledger: %s", report["mismatched"], report["mismatches"][:10])
+    return report
+
+@job_queue.handler("portfolio_refresh")
+async def run_portfolio_refresh(job: dict, report_progress) -> dict:
+    return await refresh_portfolio_view(db)
+
+@job_queue.handler("investment_repair")
+async def run_investment_repair(job: dict, report_progress) -> dict:
+    return await repair_investments(db)
+
+# Ledger snapshots bound how many rows an as-of query replays; 0 disables a schedule
+BALANCE_SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("BALANCE_SNAPSHOT_INTERVAL_SECONDS", 3600))
+BALANCE_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("BALANCE_RECONCILE_INTERVAL_SECONDS", 0))
+if BALANCE_SNAPSHOT_INTERVAL_SECONDS > 0:
+    job_queue.schedule("balance_snapshot", BALANCE_SNAPSHOT_INTERVAL_SECONDS)
+if BALANCE_RECONCILE_INTERVAL_SECONDS > 0:
+    job_queue.schedule("balance_reconciliation", BALANCE_RECONCILE_INTERVAL_SECONDS)
+
+# Finishes investment writes that failed part-way without MONGO_TRANSACTIONS; 0 disables it
+INVESTMENT_REPAIR_INTERVAL_SECONDS = float(os.environ.get("INVESTMENT_REPAIR_INTERVAL_SECONDS", 300))
+if not USE_TRANSACTIONS and INVESTMENT_REPAIR_INTERVAL_SECONDS > 0:
+    job_queue.schedule("investment_repair", INVESTMENT_REPAIR_INTERVAL_SECONDS)
+
+# Portfolios are aggregated per request, or read from a view refreshed on a schedule (PORTFOLIO_SOURCE=view)
+read_portfolio = portfolio_reader_from_env()
+PORTFOLIO_REFRESH_INTERVAL_SECONDS = float(os.environ.get("PORTFOLIO_REFRESH_INTERVAL_SECONDS", 300))
+if read_portfolio is view_portfolio and PORTFOLIO_REFRESH_INTERVAL_SECONDS > 0:
+    job_queue.schedule("portfolio_refresh", PORTFOLIO_REFRESH_INTERVAL_SECONDS)
+
+# Helper functions
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+async def load_user(user_id: str) -> Optional[dict]:
+    return await db.users.find_one({"id": user_id}, {field: 0 for field in PRIVATE_USER_FIELDS + VOLATILE_USER_FIELDS})
+
+async def invalidate_users(user_ids: List[str]) -> None:
+    await user_cache.invalidate(*user_ids)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     try:
         token = credentials.credentials
@@ -142,7 +447,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+        user = await user_cache.get_user(user_id, load_user)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -151,73 +456,153 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def admit_auth(request: Request):
+    await auth_rate_limit.check(client_ip(request))
+    async with auth_concurrency.slot():
+        yield
+
+async def admit_write(current_user: dict = Depends(get_current_user)):
+    await write_rate_limit.check(current_user["id"])
+    async with write_concurrency.slot():
+        yield
+
 # Auth Routes
-@api_router.post("/auth/register")
+@api_router.post("/auth/register", dependencies=[Depends(admit_auth)])
 async def register(user_data: UserCreate):
     # Check if user exists
     existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    user_id = str(uuid.uuid4())
-    user_doc = {
-        "id": user_id,
-        "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
-        "name": user_data.name,
-        "user_type": user_data.user_type,
-        "balance": 10000.0,  # Mock starting balance
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
+    user_doc = build_user_doc(user_data, await password_hasher.hash(user_data.password))
+    user_id = user_doc["id"]
     await db.users.insert_one(user_doc)
+    await record_transactions(db, [opening_entry(user_doc)])
     
     token = create_access_token({"sub": user_id})
-    return {"token": token, "user": {k: v for k, v in user_doc.items() if k not in ["_id", "password_hash"]}}
+    return {"token": token, "user": {k: v for k, v in user_doc.items() if k not in PRIVATE_USER_FIELDS}}
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", dependencies=[Depends(admit_auth)])
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await password_hasher.verify_and_update(credentials.password, user["password_hash"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        # Stored hash used an outdated bcrypt cost
+        await db.users.update_one({"id": user["id"]}, {"$set": {"password_hash": new_hash}})
     
     token = create_access_token({"sub": user["id"]})
-    user_data = {k: v for k, v in user.items() if k not in ["_id", "password_hash"]}
+    user_data = {k: v for k, v in user.items() if k not in PRIVATE_USER_FIELDS}
     return {"token": token, "user": user_data}
 
 @api_router.get("/auth/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
-    return current_user
+    # The cached user has no balance; read the current one
+    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0, "balance": 1})
+    return {**current_user, "balance": (user or {}).get("balance", 0.0)}
 
 # Channel Routes
-@api_router.post("/channels", response_model=Channel)
+@api_router.post("/channels", response_model=Channel, dependencies=[Depends(admit_write)])
 async def create_channel(channel_data: ChannelCreate, current_user: dict = Depends(get_current_user)):
     if current_user["user_type"] != "creator":
         raise HTTPException(status_code=403, detail="Only creators can create channels")
     
-    channel_id = str(uuid.uuid4())
-    channel_doc = {
-        "id": channel_id,
-        "name": channel_data.name,
-        "description": channel_data.description,
-        "creator_id": current_user["id"],
-        "creator_name": current_user["name"],
-        "category": channel_data.category,
-        "goal_amount": channel_data.goal_amount,
-        "total_raised": 0.0,
-        "equity_percentage": channel_data.equity_percentage,
-        "cover_image": channel_data.cover_image,
-        "status": "active",
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    await db.channels.insert_one(channel_doc)
-    return Channel(**{k: v for k, v in channel_doc.items() if k != "_id"})
+    cover_error = await cover_image_error(blob_store, channel_data)
+    if cover_error:
+        raise HTTPException(status_code=400, detail=cover_error)
+
+    channel_doc = build_channel_doc(channel_data, current_user)
+    await db.channels.insert_one({**channel_doc, **NEW_CHANNEL_COUNTERS})
+    await record_channel_created(db, channel_doc)
+    response_cache.invalidate("channels")
+    channel_doc.pop("_id", None)
+    return fast_response(channel_doc)
+
+# Cover images
+@api_router.post(
+    "/images", response_model=ImageUpload, status_code=status.HTTP_201_CREATED, dependencies=[Depends(admit_write)],
+)
+async def upload_image(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    data = await file.read(IMAGE_MAX_BYTES + 1)
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Images are limited to {IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+    try:
+        key, created = await store_image(blob_store, data)
+    except InvalidImage as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"key": key, "thumbnails": {width: thumbnail_key(key, width) for width in THUMBNAIL_WIDTHS}, "created": created}
+
+@api_router.get("/images/{key}")
+async def get_image(key: str, request: Request):
+    if not KEY_PATTERN.fullmatch(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Keys are content hashes, so the key itself is a strong validator
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": f'"{key}"'}
+    if if_none_match(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    data = await blob_store.get(key)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(data, media_type=content_type_for(key), headers=headers)
 
 @api_router.get("/channels", response_model=List[Channel])
-async def get_channels():
-    channels = await db.channels.find({}, {"_id": 0}).to_list(1000)
-    return channels
+async def get_channels(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    category: Optional[str] = None,
+    channel_status: Optional[str] = Query(None, alias="status"),
+    min_progress: Optional[float] = Query(None, ge=0, description="minimum total_raised / goal_amount"),
+    max_progress: Optional[float] = Query(None, ge=0, description="maximum total_raised / goal_amount"),
+    q: Optional[str] = Query(None, min_length=2, max_length=100, description="text search over name and description"),
+    view: str = Query("full", description="full or summary (ChannelSummary)"),
+    fields: Optional[str] = Query(None, description="comma-separated Channel fields to return"),
+):
+    projection, partial = CHANNEL_VIEWS.projection(view, fields)
+    query = {}
+    if category:
+        query["category"] = category
+    if channel_status:
+        query["status"] = channel_status
+    progress = {}
+    if min_progress is not None:
+        progress["$gte"] = min_progress
+    if max_progress is not None:
+        progress["$lte"] = max_progress
+    if sort == "closest_to_goal":
+        progress["$lt"] = 1
+    if progress:
+        query["funding_progress"] = progress
+    if q:
+        query["$text"] = {"$search": q}
+
+    channels = await paginate(
+        list_db.channels, query, sorts=CHANNEL_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=projection,
+    )
+    return fast_response(channels, response, partial=partial)
+
+def open_event_stream(*topics: str):
+    try:
+        return event_stream(live_hub, *topics)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "30"})
+
+@api_router.get("/channels/stream", include_in_schema=False)
+async def stream_all_channels():
+    """Funding totals of every channel as they change (SSE)."""
+    return open_event_stream("channels")
+
+@api_router.get("/channels/{channel_id}/stream", include_in_schema=False)
+async def stream_channel(channel_id: str):
+    """Funding, investment and distribution events of one channel (SSE)."""
+    if not await db.channels.find_one({"id": channel_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Channel not found")
+    return open_event_stream(f"channel:{channel_id}")
 
 @api_router.get("/channels/{channel_id}", response_model=Channel)
 async def get_channel(channel_id: str):
@@ -226,7 +611,49 @@ async def get_channel(channel_id: str):
         raise HTTPException(status_code=404, detail="Channel not found")
     return channel
 
-@api_router.post("/channels/{channel_id}/team", response_model=TeamMember)
+@api_router.get("/channels/{channel_id}/stats", response_model=ChannelStats)
+async def get_channel_summary(channel_id: str):
+    return await get_channel_stats(db, channel_id)
+
+@api_router.get("/channels/{channel_id}/history", response_model=FundingHistory)
+async def get_channel_history(
+    channel_id: str,
+    interval: str = Query("1d", pattern="^(1h|1d)$"),
+    start: Optional[str] = Query(None, description="ISO 8601; defaults to 2 days (1h) or 90 days (1d) before end"),
+    end: Optional[str] = Query(None, description="ISO 8601; defaults to now"),
+):
+    """Funding raised and paid out over time, from day buckets rather than individual investments."""
+    start_at = datetime.fromisoformat(parse_timestamp(start, "start")) if start else None
+    end_at = datetime.fromisoformat(parse_timestamp(end, "end")) if end else None
+    if start_at and end_at and end_at < start_at:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if not await db.channels.find_one({"id": channel_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Channel not found")
+    points = await funding_history(list_db, channel_id, interval, start_at, end_at)
+    return fast_response({"channel_id": channel_id, "interval": interval, "points": points})
+
+@api_router.get("/channels/{channel_id}/overview", response_model=ChannelOverview)
+async def get_channel_overview(
+    channel_id: str,
+    request: Request,
+    investors: int = Query(10, ge=1, le=100, description="number of top investors to include"),
+):
+    channel, team, investors_list, stats = await asyncio.gather(
+        db.channels.find_one({"id": channel_id}, {"_id": 0}),
+        db.team_members.find({"channel_id": channel_id}, {"_id": 0}).sort(TEAM_SORTS["oldest"]).to_list(MAX_PAGE_SIZE),
+        top_investors(db, channel_id, investors),
+        get_channel_stats(db, channel_id),
+    )
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    overview = ChannelOverview(channel=channel, team=team, top_investors=investors_list, stats=stats)
+    return conditional_json(request, overview)
+
+@api_router.get("/stats", response_model=PlatformStats)
+async def get_stats():
+    return await get_platform_stats(db)
+
+@api_router.post("/channels/{channel_id}/team", response_model=TeamMember, dependencies=[Depends(admit_write)])
 async def add_team_member(channel_id: str, team_data: TeamMemberAdd, current_user: dict = Depends(get_current_user)):
     # Verify channel exists and user is creator
     channel = await db.channels.find_one({"id": channel_id})
@@ -258,192 +685,317 @@ async def add_team_member(channel_id: str, team_data: TeamMemberAdd, current_use
     }
     
     await db.team_members.insert_one(member_doc)
-    return TeamMember(**{k: v for k, v in member_doc.items() if k != "_id"})
+    response_cache.invalidate(f"channel:{channel_id}")
+    member_doc.pop("_id", None)
+    return fast_response(member_doc)
 
 @api_router.get("/channels/{channel_id}/team", response_model=List[TeamMember])
-async def get_team_members(channel_id: str):
-    members = await db.team_members.find({"channel_id": channel_id}, {"_id": 0}).to_list(1000)
-    return members
+async def get_team_members(
+    channel_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "oldest",
+):
+    members = await paginate(
+        list_db.team_members, {"channel_id": channel_id},
+        sorts=TEAM_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=TEAM_MEMBER_FIELDS,
+    )
+    return fast_response(members, response)
 
 # Investment Routes
-@api_router.post("/investments", response_model=Investment)
+@api_router.post("/investments", response_model=Investment, dependencies=[Depends(admit_write)])
 async def create_investment(investment_data: InvestmentCreate, current_user: dict = Depends(get_current_user)):
     if current_user["user_type"] != "investor":
         raise HTTPException(status_code=403, detail="Only investors can invest")
     
+    # Check minimum investment
+    if investment_data.amount < MIN_INVESTMENT:
+        raise HTTPException(status_code=400, detail=f"Minimum investment is ₹{MIN_INVESTMENT:.0f}")
+    
     # Get channel
-    channel = await db.channels.find_one({"id": investment_data.channel_id})
+    channel = await db.channels.find_one({"id": investment_data.channel_id}, {"_id": 0})
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     
-    # Check minimum investment
-    if investment_data.amount < 500:
-        raise HTTPException(status_code=400, detail="Minimum investment is ₹500")
-    
-    # Check user balance
-    if current_user["balance"] < investment_data.amount:
+    try:
+        investment_doc, totals = await place_investment(client, db, channel, current_user, investment_data.amount)
+    except InsufficientBalance:
         raise HTTPException(status_code=400, detail="Insufficient balance")
+    finally:
+        await user_cache.invalidate(current_user["id"])
+    try:
+        await record_investment_point(db, investment_doc, totals.get("total_raised"))
+    except PyMongoError:
+        # Chart data only; `python funding_history.py --rebuild` restores a missed point
+        logger.exception("Could not record funding history for investment %s", investment_doc["id"])
+    response_cache.invalidate("channels", f"channel:{channel['id']}")
+    await publish_investment(investment_doc, totals)
     
-    # Calculate equity percentage for this investment
-    equity_per_rupee = channel["equity_percentage"] / channel["goal_amount"]
-    investment_equity = equity_per_rupee * investment_data.amount
-    
-    investment_id = str(uuid.uuid4())
-    investment_doc = {
-        "id": investment_id,
-        "channel_id": investment_data.channel_id,
-        "channel_name": channel["name"],
-        "investor_id": current_user["id"],
-        "investor_name": current_user["name"],
-        "amount": investment_data.amount,
-        "equity_percentage": investment_equity,
-        "investment_date": datetime.now(timezone.utc).isoformat()
-    }
-    
-    await db.investments.insert_one(investment_doc)
-    
-    # Update channel total_raised
-    new_total = channel["total_raised"] + investment_data.amount
-    await db.channels.update_one(
-        {"id": investment_data.channel_id},
-        {"$set": {"total_raised": new_total}}
-    )
-    
-    # Update user balance (mock payment)
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"balance": current_user["balance"] - investment_data.amount}}
-    )
-    
-    return Investment(**{k: v for k, v in investment_doc.items() if k != "_id"})
+    return fast_response(investment_doc)
+
+async def publish_investment(investment_doc: dict, totals: dict) -> None:
+    channel_id = investment_doc["channel_id"]
+    if totals:
+        # Keyed, so a slow subscriber only gets the latest total
+        await live_hub.publish([f"channel:{channel_id}", "channels"], {
+            "type": "funding", "key": f"funding:{channel_id}", "channel_id": channel_id, **totals,
+        })
+    await live_hub.publish([f"channel:{channel_id}"], {
+        "type": "investment",
+        "channel_id": channel_id,
+        "investment": {field: investment_doc[field] for field in (
+            "id", "investor_name", "amount", "equity_percentage", "investment_date",
+        )},
+    })
 
 @api_router.get("/investments/my", response_model=List[Investment])
-async def get_my_investments(current_user: dict = Depends(get_current_user)):
-    investments = await db.investments.find({"investor_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return investments
+async def get_my_investments(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    view: str = Query("full", description="full or summary (InvestmentSummary)"),
+    fields: Optional[str] = Query(None, description="comma-separated Investment fields to return"),
+    current_user: dict = Depends(get_current_user),
+):
+    projection, partial = INVESTMENT_VIEWS.projection(view, fields)
+    investments = await paginate(
+        db.investments, {"investor_id": current_user["id"]},
+        sorts=INVESTMENT_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=projection,
+    )
+    return fast_response(investments, response, partial=partial)
+
+@api_router.get("/investments/my/portfolio", response_model=Portfolio)
+async def get_my_portfolio(
+    limit: int = Query(DEFAULT_POSITION_LIMIT, ge=1, le=MAX_PAGE_SIZE, description="positions returned, largest first"),
+    current_user: dict = Depends(get_current_user),
+):
+    return await read_portfolio(db, current_user["id"], limit)
 
 @api_router.get("/channels/{channel_id}/investors", response_model=List[Investment])
-async def get_channel_investors(channel_id: str):
-    investors = await db.investments.find({"channel_id": channel_id}, {"_id": 0}).to_list(1000)
-    return investors
+async def get_channel_investors(
+    channel_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+):
+    investors = await paginate(
+        list_db.investments, {"channel_id": channel_id},
+        sorts=INVESTMENT_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=INVESTMENT_FIELDS,
+    )
+    return fast_response(investors, response)
+
+@api_router.get("/channels/{channel_id}/investors/export")
+async def export_channel_investors(channel_id: str, format: str = "ndjson"):
+    cursor = list_db.investments.find({"channel_id": channel_id}, INVESTMENT_FIELDS).sort(INVESTMENT_SORTS["oldest"])
+    return stream_documents(cursor, format, f"investors-{channel_id}")
+
+# Balance Routes
+def parse_timestamp(value: str, name: str) -> str:
+    """Normalise an ISO 8601 timestamp to the UTC form stored in the ledger."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+@api_router.get("/balance/transactions", response_model=List[BalanceTransaction])
+async def get_balance_transactions(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    current_user: dict = Depends(get_current_user),
+):
+    transactions = await paginate(
+        db.balance_transactions, {"user_id": current_user["id"]},
+        sorts=BALANCE_TRANSACTION_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=BALANCE_TRANSACTION_FIELDS,
+    )
+    return fast_response(transactions, response)
+
+@api_router.get("/balance/as-of", response_model=BalanceAsOf)
+async def get_balance_as_of(at: str, current_user: dict = Depends(get_current_user)):
+    at = parse_timestamp(at, "at")
+    return {"at": at, "balance": await balance_as_of(db, current_user["id"], at)}
+
+@api_router.get("/balance/statement", response_model=BalanceStatement)
+async def get_balance_statement(start: str, end: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    start = parse_timestamp(start, "start")
+    end = parse_timestamp(end, "end") if end else datetime.now(timezone.utc).isoformat()
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return await statement(db, current_user["id"], start, end)
 
 # Profit Distribution Routes
-@api_router.post("/profits/distribute", response_model=ProfitDistribution)
+@api_router.post(
+    "/profits/distribute", response_model=Job, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admit_write)],
+)
 async def distribute_profits(profit_data: ProfitDistribute, current_user: dict = Depends(get_current_user)):
     # Verify channel exists and user is creator
-    channel = await db.channels.find_one({"id": profit_data.channel_id})
+    channel = await db.channels.find_one({"id": profit_data.channel_id}, {"_id": 0})
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     if channel["creator_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Only channel creator can distribute profits")
     
-    # Get team members
-    team_members = await db.team_members.find({"channel_id": profit_data.channel_id}, {"_id": 0}).to_list(1000)
-    
-    # Get investors
-    investors = await db.investments.find({"channel_id": profit_data.channel_id}, {"_id": 0}).to_list(1000)
-    
-    # Calculate distributions
-    distributions = []
-    remaining_profit = profit_data.total_profit
-    
-    # Team members get their split percentage
-    for member in team_members:
-        member_share = profit_data.total_profit * (member["profit_split_percentage"] / 100)
-        distributions.append({
-            "user_id": member["user_id"],
-            "user_name": member["user_name"],
-            "amount": member_share,
-            "type": "team",
-            "percentage": member["profit_split_percentage"]
-        })
-        remaining_profit -= member_share
-        
-        # Update user balance
-        await db.users.update_one(
-            {"id": member["user_id"]},
-            {"$inc": {"balance": member_share}}
-        )
-    
-    # Calculate total equity held by investors
-    total_investor_equity = sum(inv["equity_percentage"] for inv in investors)
-    
-    # Distribute remaining profit to investors based on equity
-    if total_investor_equity > 0:
-        for investor in investors:
-            investor_share = remaining_profit * (investor["equity_percentage"] / total_investor_equity)
-            distributions.append({
-                "user_id": investor["investor_id"],
-                "user_name": investor["investor_name"],
-                "amount": investor_share,
-                "type": "investor",
-                "percentage": investor["equity_percentage"]
-            })
-            
-            # Update user balance
-            await db.users.update_one(
-                {"id": investor["investor_id"]},
-                {"$inc": {"balance": investor_share}}
-            )
-    
-    # Creator gets remaining (if any)
-    creator_remaining = remaining_profit - sum(d["amount"] for d in distributions if d["type"] == "investor")
-    if creator_remaining > 0:
-        distributions.append({
-            "user_id": current_user["id"],
-            "user_name": current_user["name"],
-            "amount": creator_remaining,
-            "type": "creator",
-            "percentage": 0
-        })
-        
-        await db.users.update_one(
-            {"id": current_user["id"]},
-            {"$inc": {"balance": creator_remaining}}
-        )
-    
-    distribution_id = str(uuid.uuid4())
-    distribution_doc = {
-        "id": distribution_id,
-        "channel_id": profit_data.channel_id,
-        "channel_name": channel["name"],
+    # Payouts run in the background; poll GET /jobs/{id} for progress
+    response_cache.invalidate(f"channel:{channel['id']}")
+    job = await job_queue.enqueue("profit_distribution", {
+        "channel_id": channel["id"],
         "total_profit": profit_data.total_profit,
-        "distribution_date": datetime.now(timezone.utc).isoformat(),
-        "distributions": distributions
-    }
-    
-    await db.profit_distributions.insert_one(distribution_doc)
-    
-    return ProfitDistribution(**{k: v for k, v in distribution_doc.items() if k != "_id"})
+        "creator_id": current_user["id"],
+        "creator_name": current_user["name"],
+    }, owner_id=current_user["id"])
+    await live_hub.publish([f"channel:{channel['id']}"], {
+        "type": "distribution", "status": "queued", "channel_id": channel["id"], "total_profit": profit_data.total_profit,
+    })
+    return job
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id)
+    if not job or job["owner_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @api_router.get("/profits/{channel_id}", response_model=List[ProfitDistribution])
-async def get_profit_history(channel_id: str):
-    profits = await db.profit_distributions.find({"channel_id": channel_id}, {"_id": 0}).to_list(1000)
-    return profits
+async def get_profit_history(
+    channel_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+):
+    profits = await paginate(
+        list_db.profit_distributions, {"channel_id": channel_id},
+        sorts=PROFIT_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=PROFIT_DISTRIBUTION_FIELDS,
+    )
+    # Distributions made by the payout engine keep their rows in profit_payouts
+    pending = [p for p in profits if "distributions" not in p]
+    previews = await asyncio.gather(*(load_payouts(db, p["id"], PAYOUT_PREVIEW_SIZE) for p in pending))
+    for profit, payouts in zip(pending, previews):
+        profit["distributions"] = payouts
+    return fast_response(profits, response)
+
+@api_router.get("/profits/{channel_id}/export")
+async def export_profit_history(channel_id: str, format: str = "ndjson"):
+    """Distributions of a channel, oldest first.
+
+    Payout rows of distributions made by the payout engine live in profit_payouts and are
+    exported per distribution by ``/profits/{channel_id}/{distribution_id}/payouts/export``.
+    """
+    cursor = list_db.profit_distributions.find({"channel_id": channel_id}, PROFIT_DISTRIBUTION_FIELDS).sort(PROFIT_SORTS["oldest"])
+    return stream_documents(cursor, format, f"profits-{channel_id}")
+
+@api_router.get("/profits/{channel_id}/{distribution_id}/payouts/export")
+async def export_distribution_payouts(channel_id: str, distribution_id: str, format: str = "ndjson"):
+    if not await list_db.profit_distributions.find_one({"id": distribution_id, "channel_id": channel_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Distribution not found")
+    cursor = list_db.profit_payouts.find({"distribution_id": distribution_id}, PAYOUT_FIELDS).sort("amount", DESCENDING)
+    return stream_documents(cursor, format, f"payouts-{distribution_id}")
 
 @api_router.get("/channels/my/created", response_model=List[Channel])
-async def get_my_channels(current_user: dict = Depends(get_current_user)):
-    channels = await db.channels.find({"creator_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return channels
+async def get_my_channels(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    view: str = Query("full", description="full or summary (ChannelSummary)"),
+    fields: Optional[str] = Query(None, description="comma-separated Channel fields to return"),
+    current_user: dict = Depends(get_current_user),
+):
+    projection, partial = CHANNEL_VIEWS.projection(view, fields)
+    channels = await paginate(
+        db.channels, {"creator_id": current_user["id"]},
+        sorts=CHANNEL_SORTS, sort_name=sort, limit=limit, cursor=cursor, response=response,
+        projection=projection,
+    )
+    return fast_response(channels, response, partial=partial)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return {"responses": response_cache.stats(), "users": user_cache.stats.as_dict()}
+
+def collect_component_stats():
+    responses = response_cache.stats()
+    users = user_cache.stats.as_dict()
+    hashing = password_hasher.stats()
+    pool = database.stats()
+    auth_slots = auth_concurrency.stats()
+    write_slots = write_concurrency.stats()
+    live = live_hub.stats()
+    return [
+        ("response_cache_hits_total", "counter", "Response cache hits", responses["hits"]),
+        ("response_cache_misses_total", "counter", "Response cache misses", responses["misses"]),
+        ("response_cache_bytes", "gauge", "Response cache body bytes held", responses["bytes"]),
+        ("user_cache_hits_total", "counter", "Authenticated-user cache hits", users["hits"]),
+        ("user_cache_misses_total", "counter", "Authenticated-user cache misses", users["misses"]),
+        ("password_hash_running", "gauge", "bcrypt operations running", hashing["running"]),
+        ("password_hash_queue_depth", "gauge", "bcrypt operations waiting for the pool", hashing["queue_depth"]),
+        ("mongo_pool_connections", "gauge", "Open pooled MongoDB connections", pool["open"]),
+        ("mongo_pool_checked_out", "gauge", "Pooled MongoDB connections in use", pool["checked_out"]),
+        ("mongo_pool_max_size", "gauge", "maxPoolSize per server", pool["max_pool_size"]),
+        ("mongo_pool_waiting", "gauge", "Operations waiting for a pooled connection", pool["waiting"]),
+        ("mongo_pool_wait_timeouts_total", "counter", "Checkouts that hit waitQueueTimeoutMS", pool["wait_timeouts"]),
+        ("admission_auth_running", "gauge", "Auth requests holding a concurrency slot", auth_slots["running"]),
+        ("admission_auth_waiting", "gauge", "Auth requests queued for a concurrency slot", auth_slots["waiting"]),
+        ("admission_write_running", "gauge", "Write requests holding a concurrency slot", write_slots["running"]),
+        ("admission_write_waiting", "gauge", "Write requests queued for a concurrency slot", write_slots["waiting"]),
+        ("live_subscribers", "gauge", "Open live update streams", live["subscribers"]),
+        ("live_events_published_total", "counter", "Live update events published", live["published"]),
+        ("live_events_delivered_total", "counter", "Live update events queued to subscribers", live["delivered"]),
+    ]
+
+metrics_registry.add_collector(collect_component_stats)
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness only: a database outage should not get every worker restarted
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    if app.state.draining or not app.state.ready:
+        return JSONResponse({"status": "draining" if app.state.draining else "starting"}, status_code=503)
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_SECONDS)
+    except (PyMongoError, asyncio.TimeoutError):
+        return JSONResponse({"status": "database unreachable"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
 )
 
+# Outermost, so latency includes the response cache and CORS handling
+app.add_middleware(MetricsMiddleware, router_app=app)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+logger = logging.getLogger(__name__)
\ No newline at end of file
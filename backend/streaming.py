@@ -0,0 +1,60 @@
+"""Streaming exports that iterate a Motor cursor instead of building a list.
+
+Rows are serialized straight from the cursor in batches, so memory stays
+constant and the first bytes go out as soon as the first batch arrives.
+"""
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def _dumps(doc: dict) -> str:
+    return json.dumps(doc, separators=(",", ":"), default=str)
+
+
+async def _ndjson_chunks(cursor) -> AsyncIterator[str]:
+    batch = []
+    async for doc in cursor:
+        batch.append(_dumps(doc))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+async def _json_array_chunks(cursor) -> AsyncIterator[str]:
+    yield "["
+    separator = ""
+    batch = []
+    async for doc in cursor:
+        batch.append(_dumps(doc))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield separator + ",".join(batch)
+            separator = ","
+            batch = []
+    if batch:
+        yield separator + ",".join(batch)
+    yield "]"
+
+
+def stream_documents(cursor, fmt: str, filename: str) -> StreamingResponse:
+    """Wrap a Motor cursor in a StreamingResponse as NDJSON or a JSON array."""
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_MEDIA_TYPES)}")
+    cursor = cursor.batch_size(EXPORT_BATCH_SIZE)
+    chunks = _ndjson_chunks(cursor) if fmt == "ndjson" else _json_array_chunks(cursor)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
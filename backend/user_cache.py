@@ -0,0 +1,195 @@
+"""Authenticated-user cache used by get_current_user.
+
+Cached users leave out fields that change on every investment or payout
+(``balance``); routes that show them read the user document directly. What
+remains (name, email, user type) only changes through invalidated writes.
+
+The in-memory backend is a TTL + LRU map local to one worker. With several
+uvicorn workers, set USER_CACHE_BACKEND=redis so every worker shares one
+cache (and one invalidation) through any Redis-protocol server; otherwise an
+invalidation in one worker cannot reach the others before the TTL expires.
+
+Each key has a generation that every invalidation bumps. A miss reads the
+generation before loading and only stores the loaded user if it is
+unchanged, so a load that raced with a write never caches the old document.
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional
+
+DEFAULT_TTL_SECONDS = 30.0
+DEFAULT_MAX_ENTRIES = 10_000
+# Left out of cached users; they change without the user document being invalidated everywhere
+VOLATILE_USER_FIELDS = ["balance"]
+# Redis keeps a generation at least this long, well past any in-flight load
+MIN_GENERATION_TTL_SECONDS = 60.0
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MemoryCacheBackend:
+    """Per-process TTL + LRU map bounded by entry count."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped generations, bounded like the entries. Dropping one raises the
+        # floor, so a forgotten key still reads as changed to an in-flight load.
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._generation_floor = 0
+        self._clock = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return dict(value)
+
+    async def generation(self, key: str) -> int:
+        return self._generations.get(key, self._generation_floor)
+
+    async def set(self, key: str, value: dict, generation: int) -> None:
+        if await self.generation(key) != generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+            self._clock += 1
+            self._generations[key] = self._clock
+            self._generations.move_to_end(key)
+        while len(self._generations) > self.max_entries:
+            _, dropped = self._generations.popitem(last=False)
+            self._generation_floor = max(self._generation_floor, dropped)
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+
+
+# Stores the value only while the key's generation is still the one read before loading
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[2] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[3])
+end
+"""
+
+
+class RedisCacheBackend:
+    """Shared backend for multi-worker deployments (any Redis-protocol server)."""
+
+    def __init__(self, url: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, prefix: str = "user:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.stats = CacheStats()
+        self._redis = redis.from_url(url)
+        self._set_if_generation = self._redis.register_script(_SET_IF_GENERATION)
+        self._generation_ttl_ms = int(max(ttl_seconds, MIN_GENERATION_TTL_SECONDS) * 1000)
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}gen:{key}"
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self._redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def generation(self, key: str) -> int:
+        raw = await self._redis.get(self._generation_key(key))
+        return int(raw) if raw is not None else 0
+
+    async def set(self, key: str, value: dict, generation: int) -> None:
+        await self._set_if_generation(
+            keys=[self.prefix + key, self._generation_key(key)],
+            args=[json.dumps(value), str(generation), int(self.ttl_seconds * 1000)],
+        )
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*[self.prefix + key for key in keys])
+            for key in keys:
+                pipe.incr(self._generation_key(key))
+                pipe.pexpire(self._generation_key(key), self._generation_ttl_ms)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class UserCache:
+    """Read-through cache of user documents (without password_hash or balance) keyed by id."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.backend.stats
+
+    async def get_user(self, user_id: str, loader: Callable[[str], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        user = await self.backend.get(user_id)
+        if user is not None:
+            self.stats.hits += 1
+            return user
+        self.stats.misses += 1
+        generation = await self.backend.generation(user_id)
+        user = await loader(user_id)
+        if user is not None:
+            await self.backend.set(user_id, user, generation)
+        return user
+
+    async def invalidate(self, *user_ids: str) -> None:
+        """Drop cached users; call after every write that changes a user document."""
+        self.stats.invalidations += len(user_ids)
+        await self.backend.delete(user_ids)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def user_cache_from_env() -> UserCache:
+    ttl_seconds = float(os.environ.get("USER_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    if os.environ.get("USER_CACHE_BACKEND", "memory") == "redis":
+        backend = RedisCacheBackend(os.environ.get("USER_CACHE_URL", "redis://localhost:6379/0"), ttl_seconds)
+    else:
+        backend = MemoryCacheBackend(ttl_seconds, int(os.environ.get("USER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+    return UserCache(backend)
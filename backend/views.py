@@ -0,0 +1,44 @@
+"""Client-selected list representations: ``view=summary`` and ``fields=``.
+
+Both map straight to a Mongo projection, so fields the client did not ask
+for are never sent by the server, decoded by the driver or serialized. A
+summary or ``fields=`` response does not match the route's full
+``response_model`` and is returned without validation (see fast_json.py).
+"""
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from fast_json import model_projection
+
+VIEWS = ("full", "summary")
+
+
+class ListView:
+    """The full and summary projections of one list route's documents."""
+
+    def __init__(self, model: Type[BaseModel], summary_model: Type[BaseModel], summary_projection: Optional[dict] = None):
+        self.fields = frozenset(model.model_fields)
+        self.full = model_projection(model)
+        self.summary = summary_projection or model_projection(summary_model)
+
+    def projection(self, view: str = "full", fields: Optional[str] = None) -> Tuple[dict, bool]:
+        """Projection for the request and whether it is partial (not the full model).
+
+        ``fields`` is a comma-separated list of top-level fields and takes
+        precedence over ``view``; ``id`` is always included.
+        """
+        if fields:
+            requested = {field.strip() for field in fields.split(",") if field.strip()}
+            unknown = sorted(requested - self.fields)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+            projection = {field: 1 for field in requested | {"id"}}
+            projection["_id"] = 0
+            return projection, True
+        if view not in VIEWS:
+            raise HTTPException(status_code=400, detail=f"view must be one of: {', '.join(VIEWS)}")
+        if view == "summary":
+            return self.summary, True
+        return self.full, False
@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 
 class CreatorFundAPITester:
@@ -260,14 +261,35 @@ class CreatorFundAPITester:
             "Distribute Profits",
             "POST",
             "profits/distribute",
-            200,
+            202,
             data={
                 "channel_id": self.test_channel_id,
                 "total_profit": 10000.0
             },
             token=self.creator_token
         )
-        return success
+        if not success:
+            return False
+        # Payouts run as a background job; wait for it before checking profit history
+        return self.wait_for_job(response["id"])
+
+    def wait_for_job(self, job_id, timeout=60):
+        """Poll GET jobs/{id} until the job completes or fails"""
+        headers = {'Authorization': f'Bearer {self.creator_token}'}
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = requests.get(f"{self.base_url}/jobs/{job_id}", headers=headers, timeout=10).json()
+            if job.get("status") == "completed":
+                print(f"   Job {job_id} completed: {job.get('result')}")
+                return True
+            if job.get("status") == "failed":
+                print(f"❌ Job {job_id} failed: {job.get('error')}")
+                self.failed_tests.append({"test": "Distribute Profits job", "error": job.get("error")})
+                return False
+            time.sleep(1)
+        print(f"❌ Job {job_id} did not finish within {timeout}s")
+        self.failed_tests.append({"test": "Distribute Profits job", "error": "timed out"})
+        return False
 
     def test_get_profit_history(self):
         """Test getting profit history"""
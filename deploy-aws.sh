@@ -86,7 +86,9 @@ Type=simple
 User=ubuntu
 WorkingDirectory=/home/ubuntu/app/backend
 Environment="PATH=/home/ubuntu/app/backend/venv/bin"
-ExecStart=/home/ubuntu/app/backend/venv/bin/uvicorn server:app --host 0.0.0.0 --port 8000
+ExecStart=/home/ubuntu/app/backend/venv/bin/python serve.py --port 8000
+KillSignal=SIGTERM
+TimeoutStopSec=45
 Restart=always
 RestartSec=10
 
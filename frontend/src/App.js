@@ -13,6 +13,14 @@ import { Toaster } from './components/ui/sonner';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000';
 export const API = `${BACKEND_URL}/api`;
 
+// Uploaded covers are served as resized thumbnails; older channels may still hold a plain URL
+export const coverImageUrl = (channel, width) => {
+  if (channel.cover_image_key) {
+    return `${API}/images/${channel.cover_image_key.split('.')[0]}-w${width}.webp`;
+  }
+  return channel.cover_image || null;
+};
+
 export const authAxios = axios.create({
   baseURL: API,
 });
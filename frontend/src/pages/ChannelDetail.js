@@ -1,18 +1,41 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { authAxios } from '../App';
+import { API, authAxios, coverImageUrl } from '../App';
 import { toast } from 'sonner';
 import { Button } from '../components/ui/button';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from '../components/ui/dialog';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { ArrowLeft, Users, TrendingUp, DollarSign, Share2 } from 'lucide-react';
 
+const JOB_POLL_INTERVAL_MS = 1000;
+// Stop waiting after this long; the job keeps running on the server
+const JOB_WAIT_TIMEOUT_MS = 120000;
+const TOP_INVESTORS = 20;
+// Live events refetch the investor and profit lists at most this often
+const LIVE_REFRESH_DELAY_MS = 5000;
+// Events published while the stream was down are lost, so refetch after a reconnect and,
+// in case an event never arrives, on a slow timer as well
+const LIVE_FALLBACK_REFRESH_MS = 60000;
+
+const waitForJob = async (jobId) => {
+  const deadline = Date.now() + JOB_WAIT_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const res = await authAxios.get(`/jobs/${jobId}`);
+    if (res.data.status === 'completed' || res.data.status === 'failed') {
+      return res.data;
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+  throw new Error('Profit distribution is still running; check back later');
+};
+
 function ChannelDetail({ user, setUser }) {
   const { id } = useParams();
   const navigate = useNavigate();
   const [channel, setChannel] = useState(null);
   const [team, setTeam] = useState([]);
   const [investors, setInvestors] = useState([]);
+  const [stats, setStats] = useState(null);
   const [profits, setProfits] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showInvestModal, setShowInvestModal] = useState(false);
@@ -24,19 +47,61 @@ function ChannelDetail({ user, setUser }) {
     loadChannelData();
   }, [id]);
 
+  // Funding totals are pushed as they change instead of polled
+  useEffect(() => {
+    const source = new EventSource(`${API}/channels/${id}/stream`);
+    let refreshTimer = null;
+    const scheduleRefresh = () => {
+      if (!refreshTimer) {
+        refreshTimer = setTimeout(() => {
+          refreshTimer = null;
+          fetchChannelData().catch(() => {});
+        }, LIVE_REFRESH_DELAY_MS);
+      }
+    };
+
+    source.addEventListener('funding', (e) => {
+      const { total_raised } = JSON.parse(e.data);
+      setChannel((prev) => (prev ? { ...prev, total_raised } : prev));
+    });
+    source.addEventListener('investment', scheduleRefresh);
+    source.addEventListener('distribution', scheduleRefresh);
+    // Sent when this client fell behind and missed events
+    source.addEventListener('resync', scheduleRefresh);
+    let connected = false;
+    source.addEventListener('open', () => {
+      if (connected) {
+        scheduleRefresh();
+      }
+      connected = true;
+    });
+    const fallbackTimer = setInterval(() => {
+      fetchChannelData().catch(() => {});
+    }, LIVE_FALLBACK_REFRESH_MS);
+
+    return () => {
+      clearTimeout(refreshTimer);
+      clearInterval(fallbackTimer);
+      source.close();
+    };
+  }, [id]);
+
+  const fetchChannelData = async () => {
+    const [overviewRes, profitsRes] = await Promise.all([
+      authAxios.get(`/channels/${id}/overview`, { params: { investors: TOP_INVESTORS } }),
+      authAxios.get(`/profits/${id}`),
+    ]);
+
+    setChannel(overviewRes.data.channel);
+    setTeam(overviewRes.data.team);
+    setInvestors(overviewRes.data.top_investors);
+    setStats(overviewRes.data.stats);
+    setProfits(profitsRes.data);
+  };
+
   const loadChannelData = async () => {
     try {
-      const [channelRes, teamRes, investorsRes, profitsRes] = await Promise.all([
-        authAxios.get(`/channels/${id}`),
-        authAxios.get(`/channels/${id}/team`),
-        authAxios.get(`/channels/${id}/investors`),
-        authAxios.get(`/profits/${id}`),
-      ]);
-
-      setChannel(channelRes.data);
-      setTeam(teamRes.data);
-      setInvestors(investorsRes.data);
-      setProfits(profitsRes.data);
+      await fetchChannelData();
     } catch (error) {
       toast.error('Failed to load channel data');
       navigate('/dashboard');
@@ -98,11 +163,17 @@ function ChannelDetail({ user, setUser }) {
     const formData = new FormData(e.target);
 
     try {
-      await authAxios.post('/profits/distribute', {
+      const jobRes = await authAxios.post('/profits/distribute', {
         channel_id: id,
         total_profit: parseFloat(formData.get('total_profit')),
       });
 
+      // Payouts run as a background job; wait for it to finish
+      const job = await waitForJob(jobRes.data.id);
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to distribute profits');
+      }
+
       // Refresh user data
       const userRes = await authAxios.get('/auth/me');
       setUser(userRes.data);
@@ -111,7 +182,7 @@ function ChannelDetail({ user, setUser }) {
       setShowProfitModal(false);
       loadChannelData();
     } catch (error) {
-      toast.error(error.response?.data?.detail || 'Failed to distribute profits');
+      toast.error(error.response?.data?.detail || error.message || 'Failed to distribute profits');
     } finally {
       setActionLoading(false);
     }
@@ -170,12 +241,12 @@ function ChannelDetail({ user, setUser }) {
           <div
             className="h-64 gradient-bg-primary flex items-center justify-center"
             style={{
-              backgroundImage: channel.cover_image ? `url(${channel.cover_image})` : undefined,
+              backgroundImage: coverImageUrl(channel, 1280) ? `url(${coverImageUrl(channel, 1280)})` : undefined,
               backgroundSize: 'cover',
               backgroundPosition: 'center',
             }}
           >
-            {!channel.cover_image && <span className="text-6xl font-bold text-white">{channel.name[0]}</span>}
+            {!coverImageUrl(channel, 1280) && <span className="text-6xl font-bold text-white">{channel.name[0]}</span>}
           </div>
 
           <div className="p-8">
@@ -249,7 +320,7 @@ function ChannelDetail({ user, setUser }) {
               </div>
               <div className="stat-card">
                 <p className="text-sm text-gray-600 mb-1">Total Investors</p>
-                <p className="text-2xl font-bold">{investors.length}</p>
+                <p className="text-2xl font-bold">{stats.investor_count}</p>
               </div>
               <div className="stat-card">
                 <p className="text-sm text-gray-600 mb-1">Team Members</p>
@@ -263,7 +334,7 @@ function ChannelDetail({ user, setUser }) {
         <Tabs defaultValue="team" className="w-full">
           <TabsList className="grid w-full grid-cols-3 mb-8">
             <TabsTrigger data-testid="team-tab" value="team">Team ({team.length})</TabsTrigger>
-            <TabsTrigger data-testid="investors-tab" value="investors">Investors ({investors.length})</TabsTrigger>
+            <TabsTrigger data-testid="investors-tab" value="investors">Investors ({stats.investor_count})</TabsTrigger>
             <TabsTrigger data-testid="profits-tab" value="profits">Profit History ({profits.length})</TabsTrigger>
           </TabsList>
 
@@ -303,12 +374,12 @@ function ChannelDetail({ user, setUser }) {
             ) : (
               <div data-testid="investors-list" className="grid md:grid-cols-2 gap-6">
                 {investors.map((investor) => (
-                  <div key={investor.id} className="stat-card hover-lift">
+                  <div key={investor.investor_id} className="stat-card hover-lift">
                     <div className="flex items-center justify-between mb-3">
                       <div>
                         <h3 className="font-bold text-lg">{investor.investor_name}</h3>
                         <p className="text-sm text-gray-600">
-                          {new Date(investor.investment_date).toLocaleDateString()}
+                          {new Date(investor.last_investment_date).toLocaleDateString()}
                         </p>
                       </div>
                     </div>
@@ -15,13 +15,24 @@ function CreateChannel({ user }) {
     const formData = new FormData(e.target);
 
     try {
+      // Upload the cover first; the channel only stores the returned key
+      let coverImageKey = null;
+      const coverFile = formData.get('cover_file');
+      if (coverFile && coverFile.size > 0) {
+        const upload = new FormData();
+        upload.append('file', coverFile);
+        const uploadRes = await authAxios.post('/images', upload);
+        coverImageKey = uploadRes.data.key;
+      }
+
       const res = await authAxios.post('/channels', {
         name: formData.get('name'),
         description: formData.get('description'),
         category: formData.get('category'),
         goal_amount: parseFloat(formData.get('goal_amount')),
         equity_percentage: parseFloat(formData.get('equity_percentage')),
-        cover_image: formData.get('cover_image') || null,
+        cover_image: coverImageKey ? null : formData.get('cover_image') || null,
+        cover_image_key: coverImageKey,
       });
 
       toast.success('Channel created successfully!');
@@ -138,7 +149,18 @@ function CreateChannel({ user }) {
             </div>
 
             <div>
-              <label className="block text-sm font-semibold mb-3 text-gray-300">Cover Image URL (optional)</label>
+              <label className="block text-sm font-semibold mb-3 text-gray-300">Cover Image (optional)</label>
+              <input
+                data-testid="channel-cover-file"
+                type="file"
+                name="cover_file"
+                accept="image/jpeg,image/png,image/gif,image/webp"
+                className="input-field"
+              />
+            </div>
+
+            <div>
+              <label className="block text-sm font-semibold mb-3 text-gray-300">Or Cover Image URL</label>
               <input
                 data-testid="channel-cover"
                 type="url"
@@ -1,23 +1,75 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { authAxios } from '../App';
+import { API, authAxios, coverImageUrl } from '../App';
 import { toast } from 'sonner';
 import { Button } from '../components/ui/button';
 import { Wallet, TrendingUp, Users, Plus, LogOut, Zap, Sparkles, ArrowRight } from 'lucide-react';
 
+const PAGE_SIZE = 24;
+const SEARCH_DEBOUNCE_MS = 300;
+const CATEGORIES = ['YouTube', 'Podcast', 'Music', 'Art', 'Gaming', 'Education', 'Technology', 'Lifestyle'];
+
 function Dashboard({ user, setUser }) {
   const navigate = useNavigate();
   const [channels, setChannels] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState({ channel_count: 0, total_raised: 0 });
+  const [search, setSearch] = useState('');
+  const [filters, setFilters] = useState({ q: '', category: '', sort: 'newest' });
 
   useEffect(() => {
-    loadChannels();
+    loadStats();
+  }, []);
+
+  // Funding progress of the listed channels is pushed as investments land
+  useEffect(() => {
+    const source = new EventSource(`${API}/channels/stream`);
+    source.addEventListener('funding', (e) => {
+      const { channel_id, total_raised } = JSON.parse(e.data);
+      setChannels((prev) => prev.map((c) => (c.id === channel_id ? { ...c, total_raised } : c)));
+    });
+    return () => source.close();
   }, []);
 
+  // Refetch from the first page whenever the search or filters change
+  useEffect(() => {
+    loadChannels();
+  }, [filters]);
+
+  useEffect(() => {
+    const q = search.trim();
+    const timer = setTimeout(() => {
+      // The API needs at least two characters to search
+      setFilters((prev) => (prev.q === q || q.length === 1 ? prev : { ...prev, q }));
+    }, SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  const fetchChannelPage = async (cursor) => {
+    const params = { limit: PAGE_SIZE, sort: filters.sort, view: 'summary' };
+    if (filters.q) params.q = filters.q;
+    if (filters.category) params.category = filters.category;
+    if (cursor) params.cursor = cursor;
+    const res = await authAxios.get('/channels', { params });
+    setNextCursor(res.headers['x-next-cursor'] || null);
+    return res.data;
+  };
+
+  const loadStats = async () => {
+    try {
+      const res = await authAxios.get('/stats');
+      setStats(res.data);
+    } catch (error) {
+      toast.error('Failed to load stats');
+    }
+  };
+
   const loadChannels = async () => {
+    setLoading(true);
     try {
-      const res = await authAxios.get('/channels');
-      setChannels(res.data);
+      setChannels(await fetchChannelPage(null));
     } catch (error) {
       toast.error('Failed to load channels');
     } finally {
@@ -25,6 +77,18 @@ function Dashboard({ user, setUser }) {
     }
   };
 
+  const loadMoreChannels = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchChannelPage(nextCursor);
+      setChannels((prev) => [...prev, ...page]);
+    } catch (error) {
+      toast.error('Failed to load more channels');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleLogout = () => {
     localStorage.removeItem('token');
     setUser(null);
@@ -144,7 +208,7 @@ function Dashboard({ user, setUser }) {
                 <TrendingUp className="text-pink-400" size={32} />
               </div>
             </div>
-            <h3 className="text-4xl font-bold mb-2 gradient-text">{channels.length}</h3>
+            <h3 className="text-4xl font-bold mb-2 gradient-text">{stats.channel_count}</h3>
             <p className="text-gray-400 text-sm font-medium">Active Channels</p>
           </div>
 
@@ -155,7 +219,7 @@ function Dashboard({ user, setUser }) {
               </div>
             </div>
             <h3 className="text-4xl font-bold mb-2 gradient-text">
-              ₹{channels.reduce((sum, ch) => sum + (ch.total_raised || 0), 0).toLocaleString()}
+              ₹{stats.total_raised.toLocaleString()}
             </h3>
             <p className="text-gray-400 text-sm font-medium">Total Raised</p>
           </div>
@@ -168,6 +232,37 @@ function Dashboard({ user, setUser }) {
               <h2 className="text-4xl font-bold gradient-text glow-text mb-2">Explore Channels</h2>
               <p className="text-gray-400">Discover and invest in rising creators</p>
             </div>
+            <div className="flex gap-3">
+              <input
+                data-testid="channel-search"
+                type="search"
+                value={search}
+                onChange={(e) => setSearch(e.target.value)}
+                placeholder="Search channels"
+                className="input-field"
+              />
+              <select
+                data-testid="channel-category-filter"
+                value={filters.category}
+                onChange={(e) => setFilters((prev) => ({ ...prev, category: e.target.value }))}
+                className="input-field"
+              >
+                <option value="">All categories</option>
+                {CATEGORIES.map((category) => (
+                  <option key={category} value={category}>{category}</option>
+                ))}
+              </select>
+              <select
+                data-testid="channel-sort"
+                value={filters.sort}
+                onChange={(e) => setFilters((prev) => ({ ...prev, sort: e.target.value }))}
+                className="input-field"
+              >
+                <option value="newest">Newest</option>
+                <option value="most_funded">Most funded</option>
+                <option value="closest_to_goal">Closest to goal</option>
+              </select>
+            </div>
           </div>
           
           {loading ? (
@@ -178,7 +273,9 @@ function Dashboard({ user, setUser }) {
           ) : channels.length === 0 ? (
             <div className="text-center py-20 glass-effect rounded-3xl">
               <Sparkles size={64} className="mx-auto mb-4 text-purple-400" />
-              <p className="text-xl text-gray-300">No channels yet. Be the first to create one!</p>
+              <p className="text-xl text-gray-300">
+                {filters.q || filters.category ? 'No channels match your search.' : 'No channels yet. Be the first to create one!'}
+              </p>
             </div>
           ) : (
             <div data-testid="channels-grid" className="grid md:grid-cols-2 lg:grid-cols-3 gap-8">
@@ -188,17 +285,17 @@ function Dashboard({ user, setUser }) {
                   data-testid={`channel-card-${channel.id}`}
                   className="channel-card group"
                   onClick={() => navigate(`/channel/${channel.id}`)}
-                  style={{ animationDelay: `${index * 0.1}s` }}
+                  style={{ animationDelay: `${(index % PAGE_SIZE) * 0.1}s` }}
                 >
                   <div
                     className="h-48 gradient-bg-primary flex items-center justify-center relative overflow-hidden"
                     style={{
-                      backgroundImage: channel.cover_image ? `url(${channel.cover_image})` : undefined,
+                      backgroundImage: coverImageUrl(channel, 480) ? `url(${coverImageUrl(channel, 480)})` : undefined,
                       backgroundSize: 'cover',
                       backgroundPosition: 'center',
                     }}
                   >
-                    {!channel.cover_image && (
+                    {!coverImageUrl(channel, 480) && (
                       <span className="text-5xl font-bold text-white group-hover:scale-110 transition-transform duration-500">{channel.name[0]}</span>
                     )}
                   </div>
@@ -234,6 +331,18 @@ function Dashboard({ user, setUser }) {
               ))}
             </div>
           )}
+          {nextCursor && (
+            <div className="text-center mt-12">
+              <Button
+                data-testid="load-more-channels-btn"
+                onClick={loadMoreChannels}
+                disabled={loadingMore}
+                className="btn-secondary"
+              >
+                {loadingMore ? 'Loading...' : 'Load more channels'}
+              </Button>
+            </div>
+          )}
         </div>
       </div>
     </div>
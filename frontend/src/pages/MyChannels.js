@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { authAxios } from '../App';
+import { authAxios, coverImageUrl } from '../App';
 import { toast } from 'sonner';
 import { Button } from '../components/ui/button';
 import { ArrowLeft, Plus } from 'lucide-react';
@@ -16,7 +16,7 @@ function MyChannels({ user }) {
 
   const loadChannels = async () => {
     try {
-      const res = await authAxios.get('/channels/my/created');
+      const res = await authAxios.get('/channels/my/created', { params: { view: 'summary' } });
       setChannels(res.data);
     } catch (error) {
       toast.error('Failed to load channels');
@@ -77,12 +77,12 @@ function MyChannels({ user }) {
                 <div
                   className="h-40 gradient-bg-primary flex items-center justify-center"
                   style={{
-                    backgroundImage: channel.cover_image ? `url(${channel.cover_image})` : undefined,
+                    backgroundImage: coverImageUrl(channel, 480) ? `url(${coverImageUrl(channel, 480)})` : undefined,
                     backgroundSize: 'cover',
                     backgroundPosition: 'center',
                   }}
                 >
-                  {!channel.cover_image && <span className="text-4xl font-bold text-white">{channel.name[0]}</span>}
+                  {!coverImageUrl(channel, 480) && <span className="text-4xl font-bold text-white">{channel.name[0]}</span>}
                 </div>
                 <div className="p-5">
                   <div className="flex items-start justify-between mb-3">
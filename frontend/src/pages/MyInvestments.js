@@ -8,6 +8,7 @@ import { ArrowLeft, TrendingUp } from 'lucide-react';
 function MyInvestments({ user }) {
   const navigate = useNavigate();
   const [investments, setInvestments] = useState([]);
+  const [portfolio, setPortfolio] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -16,8 +17,13 @@ function MyInvestments({ user }) {
 
   const loadInvestments = async () => {
     try {
-      const res = await authAxios.get('/investments/my');
+      // Totals come from the server-side portfolio, not from summing one page of rows
+      const [res, portfolioRes] = await Promise.all([
+        authAxios.get('/investments/my', { params: { view: 'summary' } }),
+        authAxios.get('/investments/my/portfolio', { params: { limit: 1 } }),
+      ]);
       setInvestments(res.data);
+      setPortfolio(portfolioRes.data);
     } catch (error) {
       toast.error('Failed to load investments');
     } finally {
@@ -25,8 +31,9 @@ function MyInvestments({ user }) {
     }
   };
 
-  const totalInvested = investments.reduce((sum, inv) => sum + inv.amount, 0);
-  const totalEquity = investments.reduce((sum, inv) => sum + inv.equity_percentage, 0);
+  const totalInvested = portfolio?.total_invested ?? 0;
+  const totalEquity = portfolio?.total_equity_percentage ?? 0;
+  const totalPayouts = portfolio?.total_payouts ?? 0;
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-purple-50 via-pink-50 to-orange-50">
@@ -42,19 +49,24 @@ function MyInvestments({ user }) {
 
       <div className="max-w-7xl mx-auto px-6 py-12">
         {/* Stats */}
-        <div className="grid md:grid-cols-3 gap-6 mb-12">
+        <div className="grid md:grid-cols-4 gap-6 mb-12">
           <div className="stat-card">
             <p className="text-sm text-gray-600 mb-2">Total Invested</p>
             <p data-testid="total-invested" className="text-3xl font-bold gradient-text">₹{totalInvested.toLocaleString()}</p>
           </div>
           <div className="stat-card">
-            <p className="text-sm text-gray-600 mb-2">Active Investments</p>
-            <p className="text-3xl font-bold">{investments.length}</p>
+            <p className="text-sm text-gray-600 mb-2">Channels Backed</p>
+            <p className="text-3xl font-bold">{portfolio?.channel_count ?? 0}</p>
           </div>
           <div className="stat-card">
             <p className="text-sm text-gray-600 mb-2">Total Equity Held</p>
             <p className="text-3xl font-bold text-purple-600">{totalEquity.toFixed(2)}%</p>
           </div>
+          <div className="stat-card">
+            <p className="text-sm text-gray-600 mb-2">Payouts Received</p>
+            <p data-testid="total-payouts" className="text-3xl font-bold text-green-600">₹{totalPayouts.toLocaleString()}</p>
+            <p className="text-sm text-gray-500 mt-1">{((portfolio?.roi ?? 0) * 100).toFixed(1)}% return</p>
+          </div>
         </div>
 
         {/* Investments List */}
@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules import each other flat, as when run from the backend folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
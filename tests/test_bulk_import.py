@@ -0,0 +1,68 @@
+import asyncio
+from pathlib import Path
+
+from mongomock_motor import AsyncMongoMockClient
+
+import indexes
+from bulk_import import BatchRejects, InvestmentImporter, Rejects, UserImporter
+from passwords import PasswordHasher
+
+
+def test_investment_rows_that_would_overdraw_are_rejected():
+    async def scenario():
+        client = AsyncMongoMockClient()
+        db = client["test"]
+        for collection, models in indexes.INDEXES.items():
+            await db[collection].create_indexes(models)
+        await db.users.insert_one({"id": "u1", "email": "i@x.com", "name": "I", "user_type": "investor", "balance": 1500.0})
+        await db.channels.insert_one({
+            "id": "c1", "name": "Channel", "equity_percentage": 10.0, "goal_amount": 100000.0, "total_raised": 0.0,
+        })
+        importer = InvestmentImporter(db, Path("investments.csv"), client)
+        batch = [
+            (number, {"channel_id": "c1", "amount": str(amount), "investor_email": "i@x.com"})
+            for number, amount in enumerate([600, 700, 500, 800], 1)
+        ]
+        rejects = BatchRejects(Rejects(None))
+        inserted, duplicates = await importer.write(batch, rejects)
+        user = await db.users.find_one({"id": "u1"})
+        channel = await db.channels.find_one({"id": "c1"})
+        return inserted, duplicates, rejects.count, user["balance"], channel["total_raised"]
+
+    inserted, duplicates, rejected, balance, total_raised = asyncio.run(scenario())
+    # 600 + 700 fit; 500 and 800 would each overdraw what is left
+    assert (inserted, duplicates, rejected) == (2, 0, 2)
+    assert balance == 200.0
+    assert total_raised == 1300.0
+
+
+def test_user_rows_that_lose_the_insert_leave_no_opening_row():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        for collection, models in indexes.INDEXES.items():
+            await db[collection].create_indexes(models)
+        hasher = PasswordHasher(rounds=4, max_concurrency=1)
+        importer = UserImporter(db, Path("users.csv"), hasher)
+        batch = [
+            (1, {"email": "a@x.com", "password": "pw", "name": "A", "user_type": "investor", "balance": "100"}),
+            (2, {"email": "b@x.com", "password": "pw", "name": "B", "user_type": "investor", "balance": "-5"}),
+        ]
+        await importer.write(batch[:1], BatchRejects(Rejects(None)))
+        # A signs up through the API between the email check and the insert of a replayed batch
+        await db.users.delete_many({})
+        await db.users.insert_one({"id": "api-user", "email": "a@x.com", "name": "A", "user_type": "investor"})
+
+        async def no_users(emails):
+            return {}
+
+        importer._users_by_email = no_users
+        rejects = BatchRejects(Rejects(None))
+        result = await importer.write(batch, rejects)
+        hasher.shutdown()
+        return result, rejects.count, await db.balance_transactions.count_documents({})
+
+    result, rejected, ledger_rows = asyncio.run(scenario())
+    assert result == (0, 1)
+    # The negative balance is rejected by validation
+    assert rejected == 1
+    assert ledger_rows == 0
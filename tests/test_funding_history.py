@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect
+
+import funding_history
+from funding_history import record_distribution_point
+from indexes import INDEXES
+
+DISTRIBUTION = {"id": "d1", "channel_id": "c1", "total_profit": 500.0, "completed_at": "2026-10-18T05:00:00+00:00"}
+
+
+def test_distribution_failing_after_its_writes_is_recorded_once(monkeypatch):
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        await db.funding_history.create_indexes(INDEXES["funding_history"])
+        await db.channels.insert_one({"id": "c1", "total_distributed": 1000.0})
+        await db.profit_distributions.insert_one({**DISTRIBUTION, "status": "completed"})
+
+        guarded_update = funding_history.guarded_update
+
+        async def lost_reply(collection, *args, **kwargs):
+            result = await guarded_update(collection, *args, **kwargs)
+            if collection.name == "funding_history":
+                raise AutoReconnect("primary stepped down")
+            return result
+
+        monkeypatch.setattr(funding_history, "guarded_update", lost_reply)
+        with pytest.raises(AutoReconnect):
+            await record_distribution_point(db, DISTRIBUTION)
+        monkeypatch.setattr(funding_history, "guarded_update", guarded_update)
+        await record_distribution_point(db, DISTRIBUTION)
+        await record_distribution_point(db, DISTRIBUTION)
+        return (
+            await db.channels.find_one({"id": "c1"}, {"_id": 0}),
+            await db.funding_history.find_one({"channel_id": "c1"}, {"_id": 0}),
+        )
+
+    channel, bucket = asyncio.run(scenario())
+    assert channel["total_distributed"] == pytest.approx(1500.0)
+    assert bucket["payouts"] == pytest.approx(500.0)
+    assert bucket["distributions"] == 1
+    assert bucket["total_payouts"] == pytest.approx(1500.0)
+    assert not channel.get("applied_investments") and not bucket.get("applied_investments")
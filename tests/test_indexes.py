@@ -0,0 +1,62 @@
+"""Every route query shape in indexes.QUERY_SHAPES must be served by an index.
+
+``test_query_shapes_have_a_usable_index`` checks index key order offline.
+``test_no_query_shape_collscans`` asks a real server's planner via
+``verify_query_plans`` (the same check as ``python indexes.py --check``); it
+needs TEST_MONGO_URL, e.g. ``TEST_MONGO_URL=mongodb://localhost:27017 pytest``.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import INDEXES, QUERY_SHAPES, ensure_indexes, verify_query_plans
+
+
+def _is_range(value) -> bool:
+    return isinstance(value, dict) and any(key.startswith("$") for key in value)
+
+
+def _index_serves(keys: list, query: dict, sort) -> bool:
+    if "$text" in query:
+        return any(direction == "text" for _, direction in keys)
+    if any(direction == "text" for _, direction in keys):
+        return False
+    equality = {field for field, value in query.items() if not _is_range(value)}
+    ranges = [field for field, value in query.items() if _is_range(value)]
+    if {field for field, _ in keys[:len(equality)]} != equality:
+        return False
+    rest = keys[len(equality):]
+    if sort:
+        if [field for field, _ in rest[:len(sort)]] != [field for field, _ in sort]:
+            return False
+        # An index serves a sort in its own order or fully reversed
+        same = [direction for _, direction in rest[:len(sort)]] == [direction for _, direction in sort]
+        reversed_ = [direction for _, direction in rest[:len(sort)]] == [-direction for _, direction in sort]
+        return same or reversed_
+    return not ranges or (bool(rest) and rest[0][0] in ranges)
+
+
+@pytest.mark.parametrize("collection,query,sort", QUERY_SHAPES, ids=lambda value: str(value))
+def test_query_shapes_have_a_usable_index(collection, query, sort):
+    candidates = [list(model.document["key"].items()) for model in INDEXES.get(collection, [])]
+    assert any(_index_serves(keys, query, sort) for keys in candidates), (
+        f"no index on {collection} serves filter={query} sort={sort}"
+    )
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_MONGO_URL"), reason="set TEST_MONGO_URL to explain against a real server")
+def test_no_query_shape_collscans():
+    async def explain_all():
+        client = AsyncIOMotorClient(os.environ["TEST_MONGO_URL"], serverSelectionTimeoutMS=5000)
+        db = client[f"query_plans_{uuid.uuid4().hex[:8]}"]
+        try:
+            await ensure_indexes(db)
+            return await verify_query_plans(db)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    assert asyncio.run(explain_all()) == []
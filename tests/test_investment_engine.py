@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect
+
+import investment_engine
+from indexes import INDEXES
+from investment_engine import InsufficientBalance, place_investment, repair_investments
+
+CHANNEL = {"id": "c1", "name": "Channel", "goal_amount": 100000.0, "equity_percentage": 10.0}
+
+
+async def _setup(balance: float):
+    client = AsyncMongoMockClient()
+    db = client["test"]
+    await db.users.insert_one({"id": "u1", "name": "Investor", "balance": balance})
+    await db.channels.insert_one({**CHANNEL, "total_raised": 0.0, "funding_progress": 0.0})
+    return client, db
+
+
+def test_concurrent_investments_never_overdraw():
+    async def scenario():
+        client, db = await _setup(10000.0)
+        investor = {"id": "u1", "name": "Investor"}
+        results = await asyncio.gather(
+            *[place_investment(client, db, CHANNEL, investor, 700.0) for _ in range(40)],
+            return_exceptions=True,
+        )
+        placed = [result for result in results if not isinstance(result, BaseException)]
+        assert all(isinstance(result, InsufficientBalance) for result in results if isinstance(result, BaseException))
+        assert len(placed) == 14  # 14 * 700 <= 10000 < 15 * 700
+
+        user = await db.users.find_one({"id": "u1"})
+        channel = await db.channels.find_one({"id": "c1"})
+        debits = await db.balance_transactions.count_documents({"user_id": "u1", "kind": "investment"})
+        assert user["balance"] == pytest.approx(10000.0 - 14 * 700.0)
+        assert user["balance"] >= 0
+        assert channel["total_raised"] == pytest.approx(14 * 700.0)
+        assert debits == 14
+        assert await db.investments.count_documents({"pending_steps.0": {"$exists": True}}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_steps_are_repaired_once(monkeypatch):
+    monkeypatch.setattr(investment_engine, "STEP_RETRY_SECONDS", 0)
+    monkeypatch.setattr(investment_engine, "REPAIR_GRACE_SECONDS", -1)
+
+    async def scenario():
+        client, db = await _setup(1000.0)
+        record_investment = investment_engine.record_investment
+
+        async def unavailable(*args, **kwargs):
+            raise AutoReconnect("primary stepped down")
+
+        monkeypatch.setattr(investment_engine, "record_investment", unavailable)
+        investment_doc, totals = await place_investment(client, db, CHANNEL, {"id": "u1", "name": "Investor"}, 600.0)
+        assert "pending_steps" not in investment_doc
+        assert totals["total_raised"] == pytest.approx(600.0)
+        stored = await db.investments.find_one({"id": investment_doc["id"]})
+        assert stored["pending_steps"] == ["equity"]
+
+        monkeypatch.setattr(investment_engine, "record_investment", record_investment)
+        assert await repair_investments(db) == {"repaired": 1}
+        assert await repair_investments(db) == {"repaired": 0}
+        position = await db.equity_positions.find_one({"channel_id": "c1", "investor_id": "u1"})
+        channel = await db.channels.find_one({"id": "c1"})
+        assert position["amount"] == pytest.approx(600.0)
+        assert channel["total_raised"] == pytest.approx(600.0)
+
+    asyncio.run(scenario())
+
+
+def test_steps_failing_after_they_applied_are_not_applied_twice(monkeypatch):
+    monkeypatch.setattr(investment_engine, "STEP_RETRY_SECONDS", 0)
+    monkeypatch.setattr(investment_engine, "REPAIR_GRACE_SECONDS", -1)
+
+    async def scenario():
+        client, db = await _setup(1000.0)
+        # A replayed ledger row or summary upsert is recognised by these unique keys
+        for name in ("balance_transactions", "equity_positions", "channel_stats", "platform_stats"):
+            await db[name].create_indexes(INDEXES[name])
+        apply_step = investment_engine._apply_step
+        release_step = investment_engine._release_step
+        failed = set()
+
+        async def applied_then_lost(db, channel, investment_doc, step):
+            # The write lands but the reply is lost, so the caller cannot tell it was applied
+            totals = await apply_step(db, channel, investment_doc, step)
+            if step not in failed:
+                failed.add(step)
+                raise AutoReconnect("connection reset")
+            return totals
+
+        async def unavailable(*args, **kwargs):
+            raise AutoReconnect("primary stepped down")
+
+        monkeypatch.setattr(investment_engine, "_apply_step", applied_then_lost)
+        monkeypatch.setattr(investment_engine, "_release_step", unavailable)
+        investment_doc, _ = await place_investment(client, db, CHANNEL, {"id": "u1", "name": "Investor"}, 600.0)
+        stored = await db.investments.find_one({"id": investment_doc["id"]})
+        assert stored["pending_steps"] == ["equity", "release:total_raised"]
+
+        monkeypatch.setattr(investment_engine, "_release_step", release_step)
+        assert await repair_investments(db) == {"repaired": 1}
+        assert await repair_investments(db) == {"repaired": 0}
+
+        channel = await db.channels.find_one({"id": "c1"})
+        position = await db.equity_positions.find_one({"channel_id": "c1", "investor_id": "u1"})
+        stats = await db.channel_stats.find_one({"channel_id": "c1"})
+        platform = await db.platform_stats.find_one({})
+        assert channel["total_raised"] == pytest.approx(600.0)
+        assert position["amount"] == pytest.approx(600.0)
+        assert stats["total_raised"] == pytest.approx(600.0)
+        assert stats["investor_count"] == 1
+        assert platform["investment_count"] == 1
+        assert await db.balance_transactions.count_documents({"user_id": "u1"}) == 1
+        for doc in (channel, position, stats, platform):
+            assert doc["applied_investments"] == []
+        assert (await db.investments.find_one({"id": investment_doc["id"]}))["pending_steps"] == []
+
+    asyncio.run(scenario())
+
+
+def test_batch_falls_back_to_single_steps_when_some_were_applied():
+    async def scenario():
+        client, db = await _setup(5000.0)
+        for name in ("balance_transactions", "equity_positions", "channel_stats", "platform_stats"):
+            await db[name].create_indexes(INDEXES[name])
+        investor = {"id": "u1", "name": "Investor"}
+        docs = [investment_engine.build_investment_doc(CHANNEL, investor, amount) for amount in (500.0, 700.0, 900.0)]
+        await db.investments.insert_many([investment_engine._with_pending_steps(doc) for doc in docs])
+        # A repair run applied one investment's channel total, then stopped before releasing it
+        await investment_engine._apply_step(db, CHANNEL, docs[0], "total_raised")
+
+        await investment_engine._finish_batch(db, {"c1": CHANNEL}, docs)
+        channel = await db.channels.find_one({"id": "c1"})
+        stats = await db.channel_stats.find_one({"channel_id": "c1"})
+        assert channel["total_raised"] == pytest.approx(2100.0)
+        assert stats["total_raised"] == pytest.approx(2100.0)
+        assert stats["investor_count"] == 1
+        assert channel["applied_investments"] == []
+        assert await db.investments.count_documents({"pending_steps.0": {"$exists": True}}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_batch_debits_once_and_skips_existing_ids():
+    async def scenario():
+        client, db = await _setup(2000.0)
+        await db.investments.create_indexes(INDEXES["investments"])
+        investor = {"id": "u1", "name": "Investor"}
+        docs = [investment_engine.build_investment_doc(CHANNEL, investor, amount) for amount in (500.0, 700.0)]
+        await db.investments.insert_one({**docs[1]})
+        placed = await investment_engine.apply_investments(client, db, {"c1": CHANNEL}, [dict(doc) for doc in docs])
+        with pytest.raises(InsufficientBalance):
+            await investment_engine.apply_investments(client, db, {"c1": CHANNEL}, [
+                investment_engine.build_investment_doc(CHANNEL, investor, 1600.0),
+            ])
+        user = await db.users.find_one({"id": "u1"})
+        channel = await db.channels.find_one({"id": "c1"})
+        return placed, docs, user, channel
+
+    placed, docs, user, channel = asyncio.run(scenario())
+    assert [doc["id"] for doc in placed] == [docs[0]["id"]]
+    assert user["balance"] == pytest.approx(1500.0)
+    assert channel["total_raised"] == pytest.approx(500.0)
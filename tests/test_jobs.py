@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+import jobs
+from jobs import JobQueue
+
+
+def test_heartbeat_renews_the_lease_while_a_handler_runs(monkeypatch):
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.02)
+
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        queue = JobQueue(db, concurrency=1)
+        leases = []
+
+        @queue.handler("slow")
+        async def slow(job, report_progress):
+            # Never reports progress; only the heartbeat keeps the lease
+            for _ in range(5):
+                await asyncio.sleep(0.03)
+                leases.append((await db.jobs.find_one({"id": job["id"]}))["lease_expires_at"])
+            return {"ok": True}
+
+        await queue.enqueue("slow", {}, owner_id="system", job_id="j1")
+        job = await queue._claim()
+        await queue._run(job)
+        assert len(set(leases)) > 1
+        assert leases == sorted(leases)
+        finished = await queue.get("j1")
+        assert finished["status"] == "completed"
+        # A date, not an ISO string, so the TTL index can expire it
+        assert isinstance(finished["finished_at"], datetime)
+
+    asyncio.run(scenario())
+
+
+def test_job_lost_on_its_last_attempt_is_failed_not_reclaimed():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        queue = JobQueue(db, concurrency=1)
+        expired = "2000-01-01T00:00:00+00:00"
+        for job_id, attempts in (("last", jobs.MAX_ATTEMPTS), ("retry", 1)):
+            await queue.enqueue("crashy", {}, owner_id="system", job_id=job_id)
+            await db.jobs.update_one({"id": job_id}, {"$set": {
+                "status": "running", "attempts": attempts, "lease_expires_at": expired,
+            }})
+
+        job = await queue._claim()
+        assert job["id"] == "retry"
+        assert await queue._claim() is None
+        await queue._fail_abandoned()
+        assert (await queue.get("last"))["status"] == "failed"
+        assert (await queue.get("retry"))["status"] == "running"
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from indexes import INDEXES
+from portfolio import backfill_legacy_payouts, live_portfolio
+
+
+def test_payouts_count_only_investor_shares_of_completed_distributions():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        await db.channels.insert_one({"id": "c1", "name": "Channel", "category": "tech", "status": "active"})
+        await db.equity_positions.insert_one({
+            "channel_id": "c1", "investor_id": "u1", "amount": 1000.0, "equity_percentage": 1.0,
+            "investment_count": 1, "first_investment_date": "2026-01-01", "last_investment_date": "2026-01-01",
+        })
+        await db.profit_distributions.insert_many([
+            {"id": "d1", "channel_id": "c1", "status": "completed"},
+            {"id": "d2", "channel_id": "c1", "status": "pending"},
+        ])
+        # u1 is an investor and a team member of the same channel
+        await db.profit_payouts.insert_many([
+            {"distribution_id": "d1", "channel_id": "c1", "user_id": "u1", "type": "investor", "amount": 90.0},
+            {"distribution_id": "d1", "channel_id": "c1", "user_id": "u1", "type": "team", "amount": 10.0},
+            {"distribution_id": "d2", "channel_id": "c1", "user_id": "u1", "type": "investor", "amount": 50.0},
+        ])
+        return await live_portfolio(db, "u1")
+
+    portfolio = asyncio.run(scenario())
+    assert portfolio["total_payouts"] == pytest.approx(90.0)
+    assert portfolio["roi"] == pytest.approx(0.09)
+
+
+def test_backfilled_legacy_distributions_count_once():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        await db.profit_payouts.create_indexes(INDEXES["profit_payouts"])
+        await db.channels.insert_one({"id": "c1", "name": "Channel", "category": "tech", "status": "active"})
+        await db.equity_positions.insert_one({
+            "channel_id": "c1", "investor_id": "u1", "amount": 1000.0, "equity_percentage": 1.0,
+            "investment_count": 1, "first_investment_date": "2026-01-01", "last_investment_date": "2026-01-01",
+        })
+        # Made before the payout engine: inline payouts, no status
+        await db.profit_distributions.insert_one({"id": "d0", "channel_id": "c1", "distributions": [
+            {"user_id": "u1", "user_name": "Investor", "amount": 40.0, "type": "investor", "percentage": 1.0},
+            {"user_id": "u2", "user_name": "Creator", "amount": 60.0, "type": "creator", "percentage": 0},
+        ]})
+        before = await live_portfolio(db, "u1")
+        first = await backfill_legacy_payouts(db)
+        # An interrupted run left the status unset; the rerun skips the copied rows
+        await db.profit_distributions.update_one({"id": "d0"}, {"$unset": {"status": ""}})
+        second = await backfill_legacy_payouts(db)
+        return before, first, second, await live_portfolio(db, "u1")
+
+    before, first, second, after = asyncio.run(scenario())
+    assert before["total_payouts"] == 0.0
+    assert first == {"distributions": 1, "payouts": 2}
+    assert second == {"distributions": 1, "payouts": 0}
+    assert after["total_payouts"] == pytest.approx(40.0)
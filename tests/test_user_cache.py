@@ -0,0 +1,36 @@
+import asyncio
+
+from user_cache import MemoryCacheBackend, UserCache
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = UserCache(MemoryCacheBackend())
+
+    async def scenario():
+        async def stale_loader(user_id):
+            # A write lands and invalidates while this load is in flight
+            await cache.invalidate(user_id)
+            return {"id": user_id, "name": "old"}
+
+        await cache.get_user("u1", stale_loader)
+        assert await cache.backend.get("u1") is None
+
+        async def loader(user_id):
+            return {"id": user_id, "name": "new"}
+
+        assert (await cache.get_user("u1", loader))["name"] == "new"
+        assert (await cache.backend.get("u1"))["name"] == "new"
+
+    asyncio.run(scenario())
+
+
+def test_forgotten_generations_still_block_stale_stores():
+    backend = MemoryCacheBackend(max_entries=2)
+
+    async def scenario():
+        generation = await backend.generation("u1")
+        await backend.delete(["u1", "u2", "u3"])  # u1's generation is dropped
+        await backend.set("u1", {"id": "u1"}, generation)
+        assert await backend.get("u1") is None
+
+    asyncio.run(scenario())